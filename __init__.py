@@ -1 +1,26 @@
-from .client import Client
\ No newline at end of file
+"""
+    Client for the tcpproto protocol.
+
+    The clients are imported when they are first used,
+    so importing the package does not pay for asyncio or cryptography.
+"""
+import importlib
+
+_lazy_imports = {
+    "Client": ".client",
+    "AsyncClient": ".asyncclient",
+    "ClientPool": ".pool",
+    "ChunkedTransfer": ".transfer",
+}
+
+__all__ = list(_lazy_imports)
+
+def __getattr__(name: str):
+    if name in _lazy_imports:
+        value = getattr(importlib.import_module(_lazy_imports[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
\ No newline at end of file
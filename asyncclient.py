@@ -0,0 +1,268 @@
+# Imports needed for the client.
+import asyncio
+# Client imports
+from .bases.baseclient import BaseClient
+from .bases.basefile import FileSegment
+from .request import Request
+from .response import Response
+from .parsers import MAX_HEADER_SIZE
+from .session import SessionStore
+from .compression import Decompressor
+from .dedup import UNKNOWN_DIGEST, file_digest, probe_request, with_digest
+from .errors import ConnectionClosedError, DeadlineExceededError
+from .protocol import Parser, Header, FileChunk, BodyChunk, MessageComplete
+
+"""
+    Asyncio client module to connect to the server with.
+"""
+
+class Connection:
+    """
+    A single stream connection to the server
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, max_header_size: int=MAX_HEADER_SIZE):
+        self.reader = reader
+        self.writer = writer
+        self.parser = Parser(max_header_size)
+        # Events which were parsed past the end of the last message.
+        self.events = []
+
+    def close(self):
+        """
+        Close the connection
+        """
+        self.writer.close()
+
+class AsyncClient(BaseClient):
+    """
+    Asyncio client, requests are spread over up to `connections` connections to the server.
+
+    ### Usage:
+        - async with AsyncClient("127.0.0.1", 22392, connections=16) as client:
+        -     responses = await asyncio.gather(*(client.send(request) for request in requests))
+    """
+
+    def __init__(self, host: str, port: int, rsa_file: str="PUBKEY.pem", buffer_size: int=2048, connections: int=1, session: SessionStore=None, hooks: list=None, timeout: float=None):
+        """
+        Initialize the client, connections are opened when they are first needed.
+
+        Private key is not required.
+        If it is not provided, you will not be able to encrypt (client.Lock()) data client-side.
+
+        timeout is the default deadline of a request in seconds, None waits forever.
+        """
+        super().__init__(host, port, rsa_file, buffer_size, session, hooks, timeout)
+        self.connections = connections
+        # None is a free slot for a connection which has not been opened yet.
+        self._idle = asyncio.Queue()
+        for _ in range(connections):
+            self._idle.put_nowait(None)
+        self._open = set()
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.Close()
+
+    async def connect(self):
+        """
+        Open the first connection, to fail early when the server is unreachable
+        """
+        connection = await self._acquire()
+        self._release(connection)
+
+    async def send(self, request: Request, timeout: float=None) -> Response:
+        """
+        Send a request to the server.
+        The server will return a response.
+
+        timeout is the deadline of the request in seconds, by default the timeout of the client.
+        Raises DeadlineExceededError when it is missed, the connection it used is closed.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        if timeout is None:
+            return await self._send_cached(request)
+        try:
+            return await asyncio.wait_for(self._send_cached(request), timeout)
+        except asyncio.TimeoutError as e:
+            if isinstance(e, DeadlineExceededError):
+                raise
+            raise DeadlineExceededError(f"Deadline exceeded for {request.command}", "request") from e
+
+    async def _send_cached(self, request: Request) -> Response:
+        """
+        AsyncClient.send without the deadline
+        """
+        cache = self.cache
+        if cache is None:
+            return await self._send(request)
+        key, resp = cache.lookup(request)
+        if resp is not None:
+            return resp
+        resp = await self._send(request)
+        cache.store(key, request, resp)
+        return resp
+
+    async def _send(self, request: Request) -> Response:
+        """
+        AsyncClient.send without the response cache
+        """
+        if self.dedup is not None and request.file and request.file.has_file and "FILE_DIGEST" not in request.headers:
+            return await self._send_deduplicated(request)
+        prepared = self.prepare(request)
+        try:
+            return await self._exchange(prepared)
+        finally:
+            self.release(prepared, request)
+
+    async def _exchange(self, request: Request) -> Response:
+        """
+        Write a prepared request on a free connection and read its response
+        """
+        buffers = request.buffers()
+        connection = await self._acquire()
+        try:
+            await self.send_buffers(connection, buffers)
+            resp = await self.receive(connection)
+        except BaseException:
+            # The connection is in an unknown state, open a new one for the next request.
+            self._discard(connection)
+            connection = None
+            raise
+        finally:
+            self._release(connection)
+        return resp
+
+    async def _send_deduplicated(self, request: Request) -> Response:
+        """
+        AsyncClient.send for a request with a file, the file is only sent when the server does not have it yet
+        """
+        digest = file_digest(request.file, self.dedup)
+        if await self._probe(probe_request(request.file, digest)):
+            resp = await self._send(with_digest(request, digest, False))
+            if resp.headers.get("ERROR") != UNKNOWN_DIGEST:
+                return resp
+        return await self._send(with_digest(request, digest, True))
+
+    async def _probe(self, probe: Request) -> bool:
+        """
+        Send a PROBE request, whether the server has the file.
+        The probe does not take the client vault, it stays with the request it was locked for.
+        """
+        probe.cookies, probe.vault = self.session.snapshot()
+        resp = await self._exchange(probe)
+        return resp.headers.get("PRESENT") == "true"
+
+    async def send_buffers(self, connection: Connection, buffers: list):
+        """
+        Write all buffers to a connection, streamed files are written with loop.sendfile
+        """
+        writer = connection.writer
+        views = []
+        for buffer in buffers:
+            if isinstance(buffer, FileSegment):
+                writer.writelines(views)
+                views = []
+                await writer.drain()
+                loop = asyncio.get_running_loop()
+                await loop.sendfile(writer.transport, buffer.fileobj, buffer.offset, buffer.count)
+            else:
+                views.append(buffer)
+        writer.writelines(views)
+        await writer.drain()
+
+    async def receive(self, connection: Connection) -> Response:
+        """
+        Receive a response from the server on a connection
+        """
+        headers = None
+        file_data = None
+        content = bytearray()
+        file_decompressor = None
+        content_decompressor = None
+        while True:
+            if not connection.events:
+                data = await connection.reader.read(self.buffer_size)
+                if not data:
+                    raise ConnectionClosedError("Connection closed while receiving the response")
+                connection.events = connection.parser.feed(data)
+            events = connection.events
+            for index, event in enumerate(events):
+                if isinstance(event, Header):
+                    headers = event.headers
+                    self.session.update(headers)
+                    # Several files are compressed one by one, they are decompressed once split.
+                    if "FILE_ENCODING" in headers and "FILE_COUNT" not in headers:
+                        file_decompressor = Decompressor(headers["FILE_ENCODING"], self.max_decompressed_size)
+                    if "CONTENT_ENCODING" in headers:
+                        content_decompressor = Decompressor(headers["CONTENT_ENCODING"], self.max_decompressed_size)
+                elif isinstance(event, FileChunk):
+                    if file_data is None:
+                        file_data = bytearray()
+                    if file_decompressor is not None:
+                        file_data += file_decompressor.decompress(event.data)
+                    else:
+                        file_data += event.data
+                elif isinstance(event, BodyChunk):
+                    if content_decompressor is not None:
+                        content += content_decompressor.decompress(event.data)
+                    else:
+                        content += event.data
+                elif isinstance(event, MessageComplete):
+                    connection.events = events[index + 1:]
+                    if file_decompressor is not None and file_data is not None:
+                        file_data += file_decompressor.flush()
+                    if content_decompressor is not None:
+                        content += content_decompressor.flush()
+                    return self.build_response(headers, content, file_data)
+            connection.events = []
+
+    async def _acquire(self) -> Connection:
+        """
+        Wait for a free connection, opening it if needed
+        """
+        connection = await self._idle.get()
+        if connection is None:
+            try:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.connect_timeout)
+            except asyncio.TimeoutError as e:
+                self._idle.put_nowait(None)
+                raise DeadlineExceededError(f"Timed out connecting to {self.host}:{self.port}", "connect") from e
+            except BaseException:
+                self._idle.put_nowait(None)
+                raise
+            connection = Connection(reader, writer, self.max_header_size)
+            self._open.add(connection)
+        return connection
+
+    def _release(self, connection: Connection):
+        """
+        Hand a connection back for the next request
+        """
+        self._idle.put_nowait(connection)
+
+    def _discard(self, connection: Connection):
+        """
+        Close a connection which can not be reused
+        """
+        self._open.discard(connection)
+        connection.close()
+
+    async def Close(self):
+        """
+        Close all connections
+        """
+        for connection in list(self._open):
+            self._discard(connection)
+            try:
+                await connection.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        # Closed connections are reopened when the client is used again.
+        self._idle = asyncio.Queue()
+        for _ in range(self.connections):
+            self._idle.put_nowait(None)
@@ -0,0 +1,204 @@
+import time
+# Client imports
+from ..request import Request
+from ..response import Response
+from ..files import File
+from ..parsers import parse_files, MAX_HEADER_SIZE
+from ..crypto import key_path, load_public_key, encrypt_vault, CiphertextCache, SessionKey
+from ..session import SessionStore
+from ..compression import DEFAULT_THRESHOLD, MAX_DECOMPRESSED_SIZE, encode_request, close_encoded, decompress_files
+from ..instrumentation import PhaseEvent
+
+class BaseClient:
+    """
+    Session handling shared by the blocking and the asyncio client.
+
+    The cookies, vault and client vault are kept in a SessionStore,
+    clients given the same store share one session.
+    Requests and responses get a snapshot of the cookies and vault.
+    """
+    # Encrypt client vault values in a thread pool.
+    vault_parallel: bool = False
+    # Reuse the ciphertext of client vault values which did not change.
+    cache_ciphertexts: bool = False
+    # Seal the client vault with an AES-GCM session key wrapped once with RSA, instead of one RSA operation per value.
+    hybrid_vault: bool = False
+    # Largest header block accepted from the server, in bytes.
+    max_header_size: int = MAX_HEADER_SIZE
+    # Codec to compress requests with when the request does not choose one, None sends them raw.
+    compression: str = None
+    # Content and files smaller than this are not compressed, in bytes.
+    compress_threshold: int = DEFAULT_THRESHOLD
+    # Largest size the compressed content or files of a response may decompress to, in bytes.
+    max_decompressed_size: int = MAX_DECOMPRESSED_SIZE
+    # ResponseCache for idempotent commands, None sends every request.
+    cache = None
+    # DigestCache to probe for files the server already has before uploading them, None always uploads.
+    dedup = None
+    # Seconds to wait for the connection to open, None uses the timeout of the client.
+    connect_timeout: float = None
+
+    def __init__(self, host: str, port: int, rsa_file: str="PUBKEY.pem", buffer_size: int=2048, session: SessionStore=None, hooks: list=None, timeout: float=None):
+        """
+        Initialize the client
+
+        Private key is not required. 
+        If it is not provided, you will not be able to encrypt (client.Lock()) data client-side.
+
+        timeout is the default deadline of a request in seconds, None waits forever.
+        """
+        self.host = host
+        self.port = port
+        self.buffer_size = buffer_size
+        self.timeout = timeout
+        self.session = SessionStore() if session is None else session
+        # Instrumentation hooks, None when there are none so the timing is skipped.
+        self.hooks = list(hooks) if hooks else None
+        self.ciphertexts = CiphertextCache()
+        # SessionKey of the hybrid client vault, created when it is first needed.
+        self._session_key = None
+        try:
+            self.rsa_key = load_public_key(key_path(rsa_file))
+        except:
+            pass
+
+    def __dict__(self) -> dict:
+        """
+        Client as dictionary
+        """
+        return {
+            "host": self.host,
+            "port": self.port,
+            "cookies": self.cookies,
+            "vault": self.vault
+        }
+
+    @property
+    def cookies(self) -> dict:
+        return self.session.cookies
+
+    @property
+    def vault(self) -> dict:
+        return self.session.vault
+
+    @property
+    def client_vault(self) -> dict:
+        return self.session.client_vault
+
+    def prepare(self, request: Request) -> Request:
+        """
+        Create the copy of a request which is sent, with the session added.
+        The client vault is encrypted and reset.
+        When compression is used, the copy is compressed.
+
+        The caller's request is left unchanged, so it can be sent again or shared between threads,
+        only the header block it was last sent with is kept on it.
+        """
+        return self._prepare(request)[0]
+
+    def _prepare(self, request: Request) -> tuple:
+        """
+        BaseClient.prepare
+        :return: (prepared request, the client vault taken from the session)
+        """
+        cookies, vault, client_vault = self.session.take()
+        headers = request.headers
+        if hasattr(self, "rsa_key") and client_vault:
+            cache = self.ciphertexts if self.cache_ciphertexts else None
+            if self.hooks is not None:
+                start = time.perf_counter()
+            headers = dict(headers)
+            if self.hybrid_vault:
+                session_key = self.session_key()
+                headers["CLIENT_VAULT_KEY"] = session_key.wrapped
+                headers["CLIENT_VAULT"] = session_key.seal(client_vault)
+            else:
+                encrypted = encrypt_vault(self.rsa_key, client_vault, self.vault_parallel, cache)
+                for key, value in encrypted.items():
+                    headers["CLIENT_VAULT-"+key] = value
+            if self.hooks is not None:
+                self.emit("vault_encrypt", request.command, start, time.perf_counter(), len(client_vault))
+        prepared = type(request)(
+            headers=headers,
+            content=request.content,
+            file=request.file,
+            cookies=cookies,
+            command=request.command,
+            vault=vault,
+            compression=request.compression,
+            files=request.files,
+        )
+        compression = request.compression if request.compression is not None else self.compression
+        if compression:
+            prepared = encode_request(prepared, compression, self.compress_threshold)
+        if headers is request.headers:
+            # Only the session was added, so the header block is the same while the session is.
+            # It is checked against its key before it is reused, and kept on the caller's request for the next send.
+            prepared._headers_cache = request._headers_cache
+            prepared.generate_headers()
+            request._headers_cache = prepared._headers_cache
+        return prepared, client_vault
+
+    def release(self, prepared: Request, request: Request):
+        """
+        Close the temporary files of a prepared request once it was sent, the files of the caller's request stay open
+        """
+        if prepared is not request:
+            close_encoded(prepared, request)
+
+    def session_key(self) -> SessionKey:
+        """
+        The SessionKey of the hybrid client vault, a new one once it was used too often
+        """
+        session_key = self._session_key
+        if session_key is None or session_key.expired:
+            session_key = self._session_key = SessionKey(self.rsa_key)
+        return session_key
+
+    def build_response(self, headers: dict, content: bytearray, file_data: bytearray=None, file: File=None) -> Response:
+        """
+        Create the response from a received message, its content and file are already decompressed.
+        :param file_data: the file, or the files section of a message with several files
+        :param file: the file when it was written to a file sink
+        """
+        resp = Response()
+        if "FILE_COUNT" in headers:
+            resp.files, _ = parse_files(headers, file_data or b"")
+            if "FILE_ENCODING" in headers:
+                decompress_files(headers["FILE_ENCODING"], resp.files, self.max_decompressed_size)
+        elif file is not None:
+            resp.file = file
+        elif file_data is not None:
+            resp.file = File(filename=headers["FILE_NAME"], data=bytes(file_data), border=headers["FILE_BOUNDARY"])
+        resp.headers = headers
+        resp.content = content
+        resp.cookies, resp.vault = self.session.snapshot()
+        return resp
+
+    def add_hook(self, hook):
+        """
+        Add an instrumentation hook, a callable taking a PhaseEvent.
+        See the instrumentation module for the phases.
+        """
+        if self.hooks is None:
+            self.hooks = []
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        """
+        Remove an instrumentation hook
+        """
+        self.hooks.remove(hook)
+        if not self.hooks:
+            self.hooks = None
+
+    def emit(self, phase: str, command: str, start: float, end: float, size: int=0):
+        """
+        Pass a finished phase to the hooks
+        """
+        event = PhaseEvent(phase, command, start, end, size)
+        for hook in self.hooks:
+            hook(event)
+
+    def Lock(self, key, value):
+        self.session.lock(key, value)
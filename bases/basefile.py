@@ -1,15 +1,55 @@
+import mmap
 import os
 
+class FileSegment:
+    """
+    A range of an open file, sent from disk instead of being read into memory.
+    """
+
+    def __init__(self, fileobj, offset: int, count: int):
+        self.fileobj = fileobj
+        self.offset = offset
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def chunks(self, chunk_size: int=1 << 20):
+        """
+        Read the range in chunks through a memory map, for when socket.sendfile can not be used
+        """
+        if not self.count:
+            return
+        with mmap.mmap(self.fileobj.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            end = self.offset + self.count
+            for start in range(self.offset, end, chunk_size):
+                yield mapped[start:min(start + chunk_size, end)]
+
+    def read(self) -> bytes:
+        """
+        Read the whole range into memory
+        """
+        return b"".join(self.chunks())
+
 class BaseFile:
     """Represents a file object sent over the network via the tcpproto protocol."""
-    filename = ""
-    data = b""
-    border = ""
-    has_file = False
+    __slots__ = ("filename", "data", "border", "has_file", "fileobj", "_owns_file", "_offset", "_size")
+
+    filename:   str
+    data:       bytes
+    border:     str
+    has_file:   bool
+    # Open binary file the data is streamed from, see BaseFile.stream
+    fileobj:    object
 
     def __init__(self, filename: str=None, data: bytes=None, border: str=None):
         self.filename = filename
         self.data = data
+        self.has_file = False
+        self.fileobj = None
+        self._owns_file = False
+        self._offset = 0
+        self._size = 0
         if self.filename and not border:
             self.border = self.generate_border()
         else:
@@ -21,7 +61,7 @@ class BaseFile:
         """
         File representation
         """
-        return f"{self.__class__.__name__}(filename={self.filename}, border={self.border}, data={not not self.data}, has_file={self.has_file})"
+        return f"{self.__class__.__name__}(filename={self.filename}, border={self.border}, data={not not self.data or self.fileobj is not None}, has_file={self.has_file})"
 
     def __dict__(self) -> dict:
         """
@@ -38,20 +78,57 @@ class BaseFile:
         """
         File content -> prepend to the request content
         """
-        return self.starting_border + self.data + self.ending_border
+        return b"".join((self.starting_border, self.read_data(), self.ending_border))
+
+    def buffers(self) -> list:
+        """
+        File content as a list of buffers, the data is not copied.
+        An empty streamed file has no segment, sendfile does not take a count of 0.
+        """
+        if self.fileobj is not None:
+            if not self._size:
+                return [self.starting_border, self.ending_border]
+            return [self.starting_border, self.segment(), self.ending_border]
+        return [self.starting_border, memoryview(self.data), self.ending_border]
+
+    def read_data(self) -> bytes:
+        """
+        The file data, read from disk when the file is streamed
+        """
+        if self.fileobj is not None:
+            return self.segment().read()
+        return self.data
 
-    def generate_border(self) -> bytes:
+    def segment(self) -> FileSegment:
+        """
+        The range of the file streamed from, see BaseFile.stream
+        """
+        return FileSegment(self.fileobj, self._offset, self._size)
+
+    def generate_border(self) -> str:
         """
         Generate the file border
         """
-        return bytes("FILE_BORDER-" + self.filename + "-FILE_BORDER")
+        return "FILE_BORDER-" + self.filename + "-FILE_BORDER"
 
     def size(self) -> int:
         """
         File size
         """
+        if self.fileobj is not None:
+            return self._size
+        if self.data is None:
+            return 0
         return len(self.data)
 
+    def framed_size(self) -> int:
+        """
+        File size including the borders, without generating the file content
+        """
+        border_size = len(self.border.encode())
+        # --border-- and ----border----
+        return border_size * 2 + 12 + self.size()
+
     @property
     def starting_border(self) -> bytes:
         """
@@ -82,11 +159,61 @@ class BaseFile:
         self.border = self.generate_border()
         return self
     
+    def stream(self, source, filename: str=None, offset: int=0, count: int=None):
+        """
+        Stream the file from disk instead of reading it into memory.
+        The source is a path, a file descriptor or a binary file object.
+        offset and count select a range of the source, by default all of it.
+
+        The file is sent with socket.sendfile, the data is never held in memory.
+        """
+        if isinstance(source, int):
+            fileobj = os.fdopen(source, "rb", closefd=False)
+            owns_file = True
+        elif isinstance(source, (str, os.PathLike)):
+            fileobj = open(source, "rb")
+            owns_file = True
+            if filename is None:
+                filename = os.path.basename(os.fspath(source))
+        else:
+            fileobj = source
+            owns_file = False
+            if filename is None:
+                filename = os.path.basename(str(getattr(source, "name", "file")))
+        try:
+            size = os.fstat(fileobj.fileno()).st_size
+        except BaseException:
+            if owns_file:
+                fileobj.close()
+            raise
+        offset = min(offset, size)
+        self._offset = offset
+        self._size = size - offset if count is None else min(count, size - offset)
+        self.fileobj = fileobj
+        self._owns_file = owns_file
+        self.filename = filename or "file"
+        self.data = None
+        self.has_file = True
+        self.border = self.generate_border()
+        return self
+
+    def close(self):
+        """
+        Close the file opened by BaseFile.stream
+        """
+        if self.fileobj is not None and self._owns_file:
+            self.fileobj.close()
+        self.fileobj = None
+
     def write(self, path: str):
         """
         Write the file to a path
         """
         path = os.path.join(path, self.filename)
         with open(path, "wb") as file:
-            file.write(self.data)
+            if self.fileobj is not None:
+                for chunk in self.segment().chunks():
+                    file.write(chunk)
+            else:
+                file.write(self.data)
         file.close()
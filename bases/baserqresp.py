@@ -1,12 +1,25 @@
 from ..files import File
+from .basefile import FileSegment
 
 class BaseRqResp:
-    headers:    dict    = {}
-    content:    bytes   = b""
-    file:       File    = None
-    cookies:    dict    = {}
-    command:    str     = ""
-    vault:      dict     = {}
+    """
+    Base of the request and response.
+
+    Instances have __slots__ and their own dictionaries,
+    the cookies and vault a client adds are snapshots which are never changed afterwards.
+    """
+    __slots__ = ("headers", "content", "file", "files", "cookies", "command", "vault", "compression", "_headers_cache")
+
+    headers:    dict
+    content:    bytes
+    file:       File
+    # Several files in one message, sent with FILE_COUNT and indexed headers instead of file.
+    files:      list
+    cookies:    dict
+    command:    str
+    vault:      dict
+    # Codec to compress the content and file with, see the compression module.
+    compression: str
 
     def __dict__(self) -> dict:
         """
@@ -16,69 +29,150 @@ class BaseRqResp:
             "command": self.command,
             "headers": self.headers,
             "content": self.content,
-            "file": dict(self.file),
+            "file": self.file.__dict__() if self.file else None,
+            "files": [file.__dict__() for file in self.files],
             "cookies": self.cookies,
             "vault": self.vault
         }
 
-    def __init__(self, headers: dict={}, content: bytes=b"", file: File=None, cookies: dict={}, command: str="", vault: dict={}):
+    def __init__(self, headers: dict=None, content: bytes=b"", file: File=None, cookies: dict=None, command: str="", vault: dict=None, compression: str=None, files: list=None):
         """
         Initialize the data
         """
-        self.headers = headers
+        self.headers = {} if headers is None else headers
         self.content = content
         self.file = file
-        self.cookies = cookies
+        self.files = [] if files is None else files
+        self.cookies = {} if cookies is None else cookies
         self.command = command
-        self.vault = vault
+        self.vault = {} if vault is None else vault
+        self.compression = compression
+        self._headers_cache = None
+        self._check_files()
+
+    def _check_files(self):
+        """
+        A message has either one file or several files
+        :raises ValueError: file and files are both set
+        """
+        if self.file is not None and self.files:
+            raise ValueError("file and files cannot both be set, add the file to files")
 
     @property
     def content_length(self) -> int:
         """
         data content length
         """
+        if self.files:
+            return len(self.content) + sum(file.framed_size() for file in self.files if file.has_file)
         if self.file:
             if self.file.has_file:
-                return len(self.content) + len(self.file.generate())
+                return len(self.content) + self.file.framed_size()
         return len(self.content)
 
     def generate(self) -> bytes:
         """
         Generate the data
         """
-        if self.file:
+        return b"".join(
+            buffer.read() if isinstance(buffer, FileSegment) else buffer
+            for buffer in self.buffers()
+        )
+
+    def buffers(self) -> list:
+        """
+        Generate the data as a list of buffers to be written in order.
+        The file data and content are not copied,
+        a streamed file is included as a FileSegment.
+        """
+        buffers = [self.generate_headers()]
+        if self.files:
+            for file in self.files:
+                if file.has_file:
+                    buffers.extend(file.buffers())
+        elif self.file:
             if self.file.has_file:
-                return self.generate_headers() + self.file.generate() + self.content
-        return self.generate_headers() + self.content
+                buffers.extend(self.file.buffers())
+        if self.content:
+            buffers.append(memoryview(self.content))
+        return buffers
 
     def generate_headers(self) -> bytes:
         """
         Generate the data headers
-        """
-        def add_header(key: str, value) -> bytes:
-            return f"{key}:{value}\r\n"
 
-        headers = ""
-        headers += add_header("CONTENT_LENGTH", str(self.content_length))
-        headers += add_header("COMMAND", self.command)
+        The encoded header block is cached,
+        it is only generated again when the headers it is made of have changed.
+        """
+        self._check_files()
+        key = self._headers_key()
+        cached = self._headers_cache
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        headers = self._generate_headers()
+        self._headers_cache = (key, headers)
+        return headers
 
-        if self.file:
+    def _headers_key(self) -> tuple:
+        """
+        Everything the header block is generated from, the file data and content are only included by their size
+        """
+        file = None
+        if self.files:
+            file = tuple((file.filename, file.size(), file.border) for file in self.files if file.has_file)
+        elif self.file:
             if self.file.has_file:
-                headers += add_header("FILE_NAME", self.file.filename)
-                headers += add_header("FILE_SIZE", str(self.file.size()))
-                headers += add_header("FILE_BOUNDARY", self.file.border)
-                headers += add_header("HAS_FILE", "true" if self.file.has_file else "false")
+                file = (self.file.filename, self.file.size(), self.file.border)
+        return (
+            self.content_length,
+            self.command,
+            file,
+            tuple(self.headers.items()),
+            tuple(self.cookies.items()),
+            tuple(self.vault.items()),
+        )
 
+    def _generate_headers(self) -> bytes:
+        """
+        Encode the data headers
+        """
+        lines = [
+            f"CONTENT_LENGTH:{self.content_length}",
+            f"COMMAND:{self.command}",
+        ]
 
-        for key, value in self.headers.items():
-            headers += add_header(key, value)
+        if self.files:
+            lines.extend(self._generate_file_headers())
+        elif self.file:
+            if self.file.has_file:
+                lines.append(f"FILE_NAME:{self.file.filename}")
+                lines.append(f"FILE_SIZE:{self.file.size()}")
+                lines.append(f"FILE_BOUNDARY:{self.file.border}")
+                lines.append("HAS_FILE:true")
 
-        for key, value in self.cookies.items():
-            headers += add_header(f"REMEMBER-{key}", value)
+        lines.extend([f"{key}:{value}" for key, value in self.headers.items()])
+        lines.extend([f"REMEMBER-{key}:{value}" for key, value in self.cookies.items()])
+        lines.extend([f"VAULT-{key}:{value}" for key, value in self.vault.items()])
 
-        for key, value in self.vault.items():
-            headers += add_header(f"VAULT-{key}", value)
+        lines.append("\r\n")
+        return "\r\n".join(lines).encode()
+    
 
-        headers += "\r\n"
-        return headers.encode()
-    
\ No newline at end of file
+    def _generate_file_headers(self) -> list:
+        """
+        Header lines for several files: FILE_COUNT, the indexed FILE_NAME_, FILE_SIZE_ and FILE_BOUNDARY_
+        and FILE_OFFSETS, where the data of each file starts in the body
+        """
+        lines = []
+        offsets = []
+        position = 0
+        for index, file in enumerate(file for file in self.files if file.has_file):
+            border_size = len(file.border.encode())
+            lines.append(f"FILE_NAME_{index}:{file.filename}")
+            lines.append(f"FILE_SIZE_{index}:{file.size()}")
+            lines.append(f"FILE_BOUNDARY_{index}:{file.border}")
+            offsets.append(str(position + border_size + 4))
+            position += file.framed_size()
+        lines.append(f"FILE_COUNT:{len(offsets)}")
+        lines.append(f"FILE_OFFSETS:{','.join(offsets)}")
+        return lines
@@ -0,0 +1,73 @@
+"""
+    Import time benchmark.
+
+    Measures in fresh interpreters how long importing the package takes,
+    and what the first use of the client costs with and without an RSA key.
+    The cryptography import is measured separately, before lazy imports the package always paid for it.
+
+    Usage: python -m <package>.benchmarks.import_time [--runs 10] [--output results.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PACKAGE = __package__.rsplit(".", 1)[0]
+# Directory the package is imported from.
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CASES = {
+    "import package": f"import {PACKAGE}",
+    "import Client": f"from {PACKAGE} import Client",
+    "import AsyncClient": f"from {PACKAGE} import AsyncClient",
+    "import cryptography (old eager cost)": (
+        "import cryptography.hazmat.backends, cryptography.hazmat.primitives.serialization, "
+        "cryptography.hazmat.primitives.hashes, cryptography.hazmat.primitives.asymmetric.padding"
+    ),
+}
+
+def measure(statement: str) -> dict:
+    """
+    Run a statement in a fresh interpreter
+    :return: dict seconds taken and whether cryptography got imported
+    """
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        f"{statement}\n"
+        "elapsed = time.perf_counter() - start\n"
+        "print(elapsed, 'cryptography' in sys.modules)\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True
+    ).stdout.split()
+    return {"seconds": float(output[0]), "cryptography": output[1] == "True"}
+
+def run(runs: int) -> dict:
+    results = {}
+    for name, statement in CASES.items():
+        samples = [measure(statement) for _ in range(runs)]
+        seconds = [sample["seconds"] for sample in samples]
+        results[name] = {
+            "median_ms": statistics.median(seconds) * 1000,
+            "min_ms": min(seconds) * 1000,
+            "cryptography_imported": samples[0]["cryptography"],
+        }
+    return results
+
+def main(argv: list=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+    results = run(args.runs)
+    for name, result in results.items():
+        print(f"{name:40} median {result['median_ms']:8.2f} ms  min {result['min_ms']:8.2f} ms  cryptography: {result['cryptography_imported']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+    Send/receive benchmark against the loopback stand-in server.
+
+    Every case runs in a fresh process, so its peak RSS is its own.
+    Reported per case: requests/sec, p50/p99 latency, peak RSS,
+    bytes allocated by Python per request (traced with tracemalloc in a separate run)
+    and bytes on the wire per request, as seen by the server.
+
+    Usage: python -m <package>.benchmarks.throughput [--sizes 1K,64K,1M,16M] [--headers 0,100] [--output results.json]
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import statistics
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+# Client imports
+from .. import Client
+from ..loopback import LoopbackServer
+from ..request import Request
+from ..files import File
+
+UNITS = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+# Stop sending more requests of a case once this many payload bytes were sent.
+BYTES_BUDGET = 1 << 30
+
+def parse_size(size: str) -> int:
+    """
+    Parse a size like 64K, 16M or 1G
+    """
+    size = size.strip().upper()
+    if size[-1] in UNITS:
+        return int(size[:-1]) * UNITS[size[-1]]
+    return int(size)
+
+def payload(size: int) -> bytes:
+    """
+    Text-like payload, so compression has something to do
+    """
+    pattern = b'{"key": 1234, "value": "tcpproto benchmark payload"}, '
+    return (pattern * (size // len(pattern) + 1))[:size]
+
+def build_request(case: dict, data: bytes) -> Request:
+    headers = {f"X-BENCH-{index}": "value" for index in range(case["headers"])}
+    if case["file"]:
+        return Request(headers=headers, file=File(filename="payload.bin", data=data), command="ECHO")
+    return Request(headers=headers, content=data, command="ECHO")
+
+def run_case(address: tuple, case: dict, requests: int, compression: str=None) -> dict:
+    """
+    Run a case, in a fresh process
+    """
+    client = Client(*address, buffer_size=1 << 16)
+    client.compression = compression
+    data = payload(case["size"])
+    requests = max(3, min(requests, BYTES_BUDGET // max(case["size"], 1)))
+    # Warm up the connection.
+    client.send(build_request(case, data))
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(requests):
+        start = time.perf_counter()
+        client.send(build_request(case, data))
+        latencies.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    client.send(build_request(case, data))
+    _, allocated = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    client.Close()
+
+    latencies.sort()
+    return dict(case,
+        requests=requests,
+        requests_per_second=requests / elapsed,
+        p50_ms=latencies[len(latencies) // 2] * 1000,
+        p99_ms=latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        mean_ms=statistics.mean(latencies) * 1000,
+        peak_rss_kb=peak_rss_kb(),
+        allocated_bytes_per_request=allocated,
+    )
+
+def peak_rss_kb() -> int:
+    """
+    Peak resident set size of this process, None where the resource module is unavailable
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes.
+    return peak // 1024 if platform.system() == "Darwin" else peak
+
+def cases(sizes: list, header_counts: list) -> list:
+    return [
+        {"name": f"{'file' if file else 'content'}-{size}B-{headers}h", "size": size, "headers": headers, "file": file}
+        for size in sizes
+        for headers in header_counts
+        for file in (False, True)
+    ]
+
+def run(sizes: list, header_counts: list, requests: int, compression: str=None) -> dict:
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with LoopbackServer() as server:
+        for case in cases(sizes, header_counts):
+            received, sent = server.bytes_received, server.bytes_sent
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(run_case, server.address, case, requests, compression).result()
+            # Warm up, timed and traced requests.
+            total = result["requests"] + 2
+            result["request_wire_bytes"] = (server.bytes_received - received) // total
+            result["response_wire_bytes"] = (server.bytes_sent - sent) // total
+            results.append(result)
+            print(
+                f"{result['name']:28} {result['requests_per_second']:10.1f} req/s"
+                f"  p50 {result['p50_ms']:9.3f} ms  p99 {result['p99_ms']:9.3f} ms"
+                f"  rss {result['peak_rss_kb']} KB  alloc {result['allocated_bytes_per_request']} B"
+            )
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "compression": compression,
+        "time": time.time(),
+        "cases": results,
+    }
+
+def main(argv: list=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1K,64K,1M,16M", help="payload sizes, up to 1G")
+    parser.add_argument("--headers", default="0,100", help="numbers of extra headers")
+    parser.add_argument("--requests", type=int, default=200, help="requests per case, fewer for large payloads")
+    parser.add_argument("--compression", help="codec to compress requests with")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+    results = run(
+        [parse_size(size) for size in args.sizes.split(",")],
+        [int(count) for count in args.headers.split(",")],
+        args.requests,
+        args.compression,
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+if __name__ == "__main__":
+    main()
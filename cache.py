@@ -0,0 +1,223 @@
+"""
+    Client-side cache of responses to idempotent commands.
+
+    ### Usage:
+        - client.cache = ResponseCache(max_entries=1024, max_bytes=64 << 20, ttl=30)
+        - client.send(Request(command="GET", headers={"KEY": "a"}))  # Sent
+        - client.send(Request(command="GET", headers={"KEY": "a"}))  # From the cache
+        - client.send(Request(command="SET", headers={"KEY": "a"}))  # Forgets the responses for KEY a
+
+    Requests are cached by command, content and the values of key_headers.
+    Requests with files are never cached.
+    Every hit is a new Response, the content and file data it shares with the cache are immutable bytes.
+
+    ### Server headers:
+        - CACHE_CONTROL: "no-store" to not cache the response, "max-age=<seconds>" to override the TTL,
+          a max-age which is not a number is treated like no-store
+        - INVALIDATE: comma separated tags to forget, "*" to forget everything
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+# Client imports
+from .request import Request
+from .response import Response
+from .files import File
+
+class ResponseCache:
+    """
+    LRU cache of responses, bounded by entry count and total bytes, with a TTL per entry
+    """
+
+    def __init__(self, max_entries: int=1024, max_bytes: int=64 << 20, ttl: float=60.0,
+                 commands: tuple=("GET",), key_headers: tuple=("KEY",), tag_header: str="KEY",
+                 invalidate_commands: tuple=("SET", "DELETE")):
+        """
+        :param commands: commands whose responses are cached
+        :param key_headers: request headers which are part of the cache key
+        :param tag_header: request header an entry is tagged with, invalidation is by tag
+        :param invalidate_commands: commands which forget the entries tagged with their tag_header,
+            or all entries when they have none
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.commands = frozenset(command.upper() for command in commands)
+        self.key_headers = tuple(key_headers)
+        self.tag_header = tag_header
+        self.invalidate_commands = frozenset(command.upper() for command in invalidate_commands)
+        self._lock = threading.Lock()
+        # key -> (response, expires, size, tag), the least recently used entry first.
+        self._entries = OrderedDict()
+        # tag -> keys
+        self._tags = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(self, request: Request) -> tuple:
+        """
+        Cache key of a request, None when its response is not cached
+        """
+        command = request.command.upper()
+        if command not in self.commands or request.files or (request.file is not None and request.file.has_file):
+            return None
+        headers = request.headers
+        return (command, bytes(request.content), tuple(headers.get(name) for name in self.key_headers))
+
+    def lookup(self, request: Request) -> tuple:
+        """
+        Find the cached response to a request
+        :return: (key, response) response is None on a miss, key is None when the request is not cached
+        """
+        key = self.key(request)
+        if key is None:
+            return None, None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return key, copy_response(entry[0])
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+        return key, None
+
+    def store(self, key: tuple, request: Request, response: Response):
+        """
+        Cache the response to a request looked up with key, and apply the invalidations it causes
+        """
+        headers = response.headers
+        command = request.command.upper()
+        if command in self.invalidate_commands:
+            self.invalidate(request.headers.get(self.tag_header))
+        if "INVALIDATE" in headers:
+            for tag in headers["INVALIDATE"].split(","):
+                self.invalidate(None if tag.strip() == "*" else tag.strip())
+        if key is None or "ERROR" in headers:
+            return
+        ttl = self.ttl
+        control = headers.get("CACHE_CONTROL", "")
+        if control:
+            if "no-store" in control:
+                return
+            for directive in control.split(","):
+                name, _, value = directive.strip().partition("=")
+                if name == "max-age":
+                    try:
+                        ttl = float(value)
+                    except ValueError:
+                        # The server meant a lifetime we cannot read, do not guess one.
+                        return
+                    if not math.isfinite(ttl):
+                        return
+        size = response_size(response)
+        if size > self.max_bytes or ttl <= 0:
+            return
+        tag = request.headers.get(self.tag_header)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (copy_response(response, freeze=True), time.monotonic() + ttl, size, tag)
+            self._tags.setdefault(tag, set()).add(key)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, tag: str=None):
+        """
+        Forget the entries with a tag, or all entries when tag is None
+        """
+        with self._lock:
+            if tag is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                self._tags.clear()
+                self.bytes = 0
+                return
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self):
+        self.invalidate(None)
+
+    def _remove(self, key: tuple):
+        """
+        Remove an entry, the lock must be held
+        """
+        _, _, size, tag = self._entries.pop(key)
+        self.bytes -= size
+        keys = self._tags.get(tag)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+    def stats(self) -> dict:
+        """
+        Hit and miss counters, for tuning the cache
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+def copy_response(response: Response, freeze: bool=False) -> Response:
+    """
+    Copy of a response with its own headers and files list.
+    With freeze, the content and file data are copied to immutable bytes, for storing in the cache.
+    """
+    content = response.content
+    file = response.file
+    files = response.files
+    if freeze:
+        content = bytes(content)
+        file = freeze_file(file)
+        files = [freeze_file(part) for part in files]
+    return Response(
+        headers=dict(response.headers),
+        content=content,
+        file=file,
+        cookies=response.cookies,
+        command=response.command,
+        vault=response.vault,
+        files=list(files),
+    )
+
+def freeze_file(file: File) -> File:
+    """
+    Copy of a file with its data as immutable bytes
+    """
+    if file is None or not file.has_file or file.fileobj is not None:
+        return file
+    return File(filename=file.filename, data=bytes(file.data), border=file.border)
+
+def response_size(response: Response) -> int:
+    """
+    Approximate memory held by a cached response, in bytes
+    """
+    size = len(response.content)
+    file = response.file
+    if file is not None and file.has_file:
+        size += file.size()
+    for file in response.files:
+        size += file.size()
+    for key, value in response.headers.items():
+        size += len(key) + len(str(value))
+    return size
@@ -1,158 +1,578 @@
 # Imports needed for the client.
-import base64
-import socket
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import (
-    hashes,
-    serialization 
-)
-from cryptography.hazmat.primitives.asymmetric import padding
 import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
 # Client imports
+from .bases.baseclient import BaseClient
+from .bases.basefile import FileSegment
 from .request import Request
 from .response import Response
 from .files import File
-from .logger import Logger
-from .parsers import parse_header,parse_file
+from .session import SessionStore
+from .compression import Decompressor, DecompressWriter
+from .dedup import UNKNOWN_DIGEST, file_digest, probe_request, with_digest
+from .errors import ConnectionClosedError, DeadlineExceededError
+from .protocol import Parser, Header, FileChunk, BodyChunk, MessageComplete, HEADER, BODY, BUFFERED
 
 """
     Client module to connect to the server with.
 """
 
-class Client():
-    cookies: dict = {}
-    vault: dict = {}
-    client_vault: dict = {}
+# Maximum number of buffers passed to a single sendmsg call.
+IOV_MAX = 1024
+
+class Client(BaseClient):
 
-    def __init__(self, host: str, port: int, rsa_file: str="PUBKEY.pem", buffer_size: int=2048):
+    def __init__(self, host: str, port: int, rsa_file: str="PUBKEY.pem", buffer_size: int=2048, session: SessionStore=None, hooks: list=None, timeout: float=None):
         """
         Initialize the client
 
         Private key is not required. 
         If it is not provided, you will not be able to encrypt (client.Lock()) data client-side.
+
+        The client may be shared between threads, requests on the connection are serialized.
+        Pass the same session to several clients to share cookies and vault between them.
+
+        timeout is the default deadline of a request in seconds, it also bounds connecting.
+        A request which fails, or misses its deadline, closes the connection
+        and the next request opens a new one.
         """
-        self.host = host
-        self.port = port
+        super().__init__(host, port, rsa_file, buffer_size, session, hooks, timeout)
+        self._lock = threading.RLock()
+        # Deadline of the current exchange, a time.monotonic() value, and the phase it is in.
+        self._deadline = None
+        self._phase = None
+        # Timestamps for the instrumentation hooks.
+        self._first_byte_at = None
+        self._received_at = None
+        self.connect()
+
+    def connect(self):
+        """
+        Open the connection to the server
+        """
+        if self.hooks is not None:
+            start = time.perf_counter()
+        timeout = self.timeout if self.connect_timeout is None else self.connect_timeout
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.sock.connect((self.host, self.port))
-        self.buffer_size = buffer_size
+        # Requests with a streamed file are written in several parts, do not let Nagle hold them back.
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         try:
-            os.chdir(os.path.dirname(os.path.abspath(__file__)))
-            with open(".\\"+ rsa_file, "rb") as f:
-                fdata = f.read()
-                self.rsa_key = serialization.load_pem_public_key(fdata, backend=default_backend())
-        except:
-            pass
+            self.sock.settimeout(timeout)
+            self.sock.connect((self.host, self.port))
+            self.sock.settimeout(None)
+        except socket.timeout as e:
+            self.sock.close()
+            raise DeadlineExceededError(f"Timed out connecting to {self.host}:{self.port}", "connect") from e
+        except BaseException:
+            self.sock.close()
+            raise
+        if self.hooks is not None:
+            self.emit("connect", "", start, time.perf_counter())
+        # The framing of the responses, and the events parsed past the end of the last one.
+        self._parser = Parser(self.max_header_size)
+        self._events = []
+        # Every response is received into this buffer, the events are views of it.
+        # It is only reused once the events of the previous read were consumed.
+        self._rbuf = bytearray(max(self.buffer_size, 1 << 16))
+        self._rview = memoryview(self._rbuf)
+        # The connection was closed after a failed exchange.
+        self._broken = False
 
-    def __dict__(self) -> dict:
+    def reconnect(self):
         """
-        Client as dictionary
+        Close the connection and open a new one
         """
-        return {
-            "host": self.host,
-            "port": self.port,
-            "cookies": self.cookies,
-            "vault": self.vault
-        }
+        self.Close()
+        self.connect()
 
-    def send(self, request: Request) -> Response:
+    def is_alive(self) -> bool:
+        """
+        Check without blocking if the connection is still usable.
+        A connection closed by the server, or with unexpected data waiting, is not.
+        """
+        if self.sock.fileno() == -1 or self._events or self._parser.pending:
+            return False
+        try:
+            self.sock.setblocking(False)
+            try:
+                self.sock.recv(1, socket.MSG_PEEK)
+            finally:
+                self.sock.setblocking(True)
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        return False
+
+    def send(self, request: Request, file_sink=None, timeout: float=None) -> Response:
         """
         Send a request to the server. 
         The server will return a response.
+
+        When file_sink (a path or a writable binary file object) is given,
+        a file in the response is written to it as it arrives instead of being kept in memory,
+        see Client.sink_file for the file of the response.
+        timeout is the deadline of the request in seconds, by default the timeout of the client.
+        Raises DeadlineExceededError when it is missed.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        cache = self.cache
+        if cache is None:
+            return self._send(request, file_sink, deadline)
+        key, resp = cache.lookup(request) if file_sink is None else (None, None)
+        if resp is not None:
+            return resp
+        resp = self._send(request, file_sink, deadline)
+        cache.store(key, request, resp)
+        return resp
+
+    def _send(self, request: Request, file_sink=None, deadline: float=None) -> Response:
+        """
+        Client.send without the response cache
+        """
+        if self.dedup is not None and request.file and request.file.has_file and "FILE_DIGEST" not in request.headers:
+            return self._send_deduplicated(request, file_sink, deadline)
+        if self.hooks is not None:
+            return self._send_instrumented(request, file_sink, deadline)
+        prepared, client_vault = self._prepare(request)
+        try:
+            with self._lock, self._exchange(deadline, client_vault):
+                # Send the request
+                self.send_buffers(prepared.buffers())
+                resp = self.receive(file_sink)
+        finally:
+            self.release(prepared, request)
+        return resp
+
+    def _send_deduplicated(self, request: Request, file_sink=None, deadline: float=None) -> Response:
         """
-        request.vault = self.vault
-        request.cookies = self.cookies
-        if hasattr(self, "rsa_key"):
-            for key, value in self.client_vault.items():
-                # Encrypt the client vault
-                value = self.rsa_key.encrypt(value.encode(), 
-                    padding.OAEP(
-                        # Server uses sha512 to hash the key
-                        mgf=padding.MGF1(algorithm=hashes.SHA512()), 
-                        algorithm=hashes.SHA512(), 
-                        label=None
-                    )
-                )
-                # Encode the encrypted data to base64
-                value = base64.b64encode(value)
-                request.headers["CLIENT_VAULT-"+key] = value.decode()
-        # Reset the client vault
-        self.client_vault = {}
-        # Send the request
-        self.sock.send(request.generate())
-        resp = self.receive()
+        Client.send for a request with a file, the file is only sent when the server does not have it yet
+        """
+        digest = file_digest(request.file, self.dedup)
+        if self._probe(probe_request(request.file, digest), deadline):
+            resp = self._send(with_digest(request, digest, False), file_sink, deadline)
+            if resp.headers.get("ERROR") != UNKNOWN_DIGEST:
+                return resp
+        return self._send(with_digest(request, digest, True), file_sink, deadline)
+
+    def _probe(self, probe: Request, deadline: float=None) -> bool:
+        """
+        Send a PROBE request, whether the server has the file.
+        The probe does not take the client vault, it stays with the request it was locked for.
+        """
+        probe.cookies, probe.vault = self.session.snapshot()
+        with self._lock, self._exchange(deadline):
+            self.send_buffers(probe.buffers())
+            resp = self.receive()
+        return resp.headers.get("PRESENT") == "true"
+
+    def _send_instrumented(self, request: Request, file_sink=None, deadline: float=None) -> Response:
+        """
+        Client.send, passing the time spent in each phase to the hooks
+        """
+        clock = time.perf_counter
+        prepared, client_vault = self._prepare(request)
+        command = prepared.command
+        try:
+            with self._lock, self._exchange(deadline, client_vault):
+                start = clock()
+                buffers = prepared.buffers()
+                end = clock()
+                self.emit("headers", command, start, end, len(buffers[0]))
+
+                start = end
+                self.send_buffers(buffers)
+                written = clock()
+                self.emit("write", command, start, written, sum(len(buffer) for buffer in buffers))
+
+                self._first_byte_at = None
+                self._received_at = None
+                resp = self.receive(file_sink)
+                end = clock()
+        finally:
+            self.release(prepared, request)
+        first_byte = self._first_byte_at or written
+        received = self._received_at or end
+        self.emit("first_byte", command, written, first_byte)
+        self.emit("receive", command, written, received, int(resp.headers.get("CONTENT_LENGTH", 0)))
+        self.emit("parse_file", command, received, end)
         return resp
 
+    def send_many(self, requests: list, timeout: float=None) -> list:
+        """
+        Pipeline requests over the connection.
+        All requests are written back to back, then the responses are read in order,
+        so the whole batch costs a single round trip.
+
+        The session is added to all requests before the first response arrives,
+        cookies and vault changes from the responses are applied in arrival order.
+        timeout is the deadline of the whole batch in seconds, by default the timeout of the client.
+
+        With a response cache, the requests before the first one which invalidates entries
+        are answered from it when they can be, and only the others are sent.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        cache = self.cache
+        keys = [None] * len(requests)
+        responses = [None] * len(requests)
+        if cache is not None:
+            lookup = True
+            for index, request in enumerate(requests):
+                # Requests after an invalidating one may depend on what it changes.
+                if request.command.upper() in cache.invalidate_commands:
+                    lookup = False
+                if lookup:
+                    keys[index], responses[index] = cache.lookup(request)
+                else:
+                    keys[index] = cache.key(request)
+        pending = [index for index, resp in enumerate(responses) if resp is None]
+        if not pending:
+            return responses
+        buffers = []
+        prepared = []
+        for index in pending:
+            prepared.append(self.prepare(requests[index]))
+            buffers.extend(prepared[-1].buffers())
+        # Write from a thread, so a server answering before it read all requests can not deadlock us.
+        errors = []
+        def write():
+            try:
+                self.send_buffers(buffers)
+            except BaseException as e:
+                errors.append(e)
+        try:
+            with self._lock, self._exchange(deadline):
+                writer = threading.Thread(target=write, daemon=True)
+                writer.start()
+                try:
+                    for index in pending:
+                        responses[index] = self.receive()
+                except BaseException:
+                    # The connection is out of sync, make sure the writer does not block on it.
+                    try:
+                        self.sock.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        # Already disconnected, keep the error which broke the exchange.
+                        pass
+                    raise
+                finally:
+                    writer.join()
+                if errors:
+                    raise errors[0]
+        finally:
+            for index, request in zip(pending, prepared):
+                self.release(request, requests[index])
+        if cache is not None:
+            for index in pending:
+                cache.store(keys[index], requests[index], responses[index])
+        return responses
+
+    def pipeline(self) -> "Pipeline":
+        """
+        Queue requests to be sent with send_many
+
+        ### Usage:
+            - with client.pipeline() as pipe:
+            -     pipe.send(Request(command="GET", content=b"a"))
+            -     pipe.send(Request(command="GET", content=b"b"))
+            - responses = pipe.responses
+        """
+        return Pipeline(self)
+
+    @contextmanager
+    def _exchange(self, deadline: float=None, client_vault: dict=None):
+        """
+        Run a request and its response, the lock must be held.
+
+        Every blocking socket call waits at most until the deadline.
+        Any error leaves the connection out of sync, so it is closed and the next request opens a new one.
+        When the connection fails, the client vault taken for the request is put back into the session,
+        so it is sent with the next request instead of being lost.
+        """
+        if self._broken:
+            self.reconnect()
+        self._deadline = deadline
+        try:
+            yield
+        except DeadlineExceededError:
+            self._abort()
+            raise
+        except socket.timeout as e:
+            self._abort()
+            raise DeadlineExceededError(f"Deadline exceeded while {self._phase}", self._phase) from e
+        except ConnectionError:
+            self._abort()
+            if client_vault:
+                self.session.restore(client_vault)
+            raise
+        except BaseException:
+            self._abort()
+            raise
+        finally:
+            if deadline is not None:
+                self._deadline = None
+                if not self._broken:
+                    self.sock.settimeout(None)
+
+    def _arm(self, phase: str):
+        """
+        Limit the next blocking socket call to the time left until the deadline
+        """
+        if self._deadline is None:
+            return
+        self._phase = phase
+        remaining = self._deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceededError(f"Deadline exceeded while {phase}", phase)
+        self.sock.settimeout(remaining)
+
+    def _abort(self):
+        """
+        Close a connection which is out of sync
+        """
+        self._broken = True
+        self.Close()
+
+    def send_buffers(self, buffers: list):
+        """
+        Write all buffers to the socket with scatter/gather IO, without joining them.
+        Partially sent buffers are resumed until everything is written.
+        Streamed files are written with socket.sendfile.
+        """
+        views = []
+        for buffer in buffers:
+            if isinstance(buffer, FileSegment):
+                self._sendmsg(views)
+                views = []
+                self.send_segment(buffer)
+            elif len(buffer):
+                views.append(memoryview(buffer))
+        self._sendmsg(views)
+
+    def _sendmsg(self, views: list):
+        """
+        Write a list of memoryviews with sendmsg
+        """
+        if not hasattr(self.sock, "sendmsg"):
+            for view in views:
+                self._arm("write")
+                self.sock.sendall(view)
+            return
+        index = 0
+        while index < len(views):
+            self._arm("write")
+            sent = self.sock.sendmsg(views[index:index + IOV_MAX])
+            # Skip the buffers which were written completely.
+            while sent and sent >= len(views[index]):
+                sent -= len(views[index])
+                index += 1
+            if sent:
+                views[index] = views[index][sent:]
+
+    def send_segment(self, segment: FileSegment):
+        """
+        Write a range of a file, zero-copy with sendfile where the platform supports it
+        """
+        if hasattr(os, "sendfile"):
+            self._arm("write")
+            self.sock.sendfile(segment.fileobj, segment.offset, segment.count)
+            return
+        for chunk in segment.chunks():
+            self._arm("write")
+            self.sock.sendall(chunk)
+
     def Close(self):
         """
         Close the connection
         """
         self.sock.close()
 
-    def receive(self) -> Response:
+    def receive(self, file_sink=None) -> Response:
         """
-        Receive a response from the server
+        Receive a response from the server.
+
+        The bytes are received into the buffer of the connection and fed to its Parser,
+        events parsed past the end of the response are kept for the next one.
+        Once only content is left, the rest of it is received straight into the content.
+        :param file_sink: path or writable binary file object to stream a received file to
         """
-        headers, content = self.rcv_header()
-        content_length = int(headers["CONTENT_LENGTH"])
-        content += self.rcv_content(content_length, content)
+        headers = None
+        file_data = None
+        content = bytearray()
+        sink = None
+        opened = None
+        # Where the file starts in a file object sink, None when the sink can not tell.
+        start = None
+        file_decompressor = None
+        content_decompressor = None
+        # The limit may have been changed on the client since it connected.
+        self._parser.max_header_size = self.max_header_size
+        try:
+            while True:
+                if not self._events:
+                    parser = self._parser
+                    if parser.state == BODY and content_decompressor is None:
+                        filled = len(content)
+                        content += bytes(parser.remaining)
+                        with memoryview(content) as view:
+                            while parser.remaining:
+                                received = self._recv_into(view[filled:])
+                                filled += received
+                                self._events = parser.advance(received)
+                    else:
+                        self._events = parser.feed(self._rview[:self._recv_into(self._rview)])
+                events, self._events = self._events, []
+                for index, event in enumerate(events):
+                    if isinstance(event, Header):
+                        headers = event.headers
+                        self.session.update(headers)
+                        if file_sink is not None and headers.get("HAS_FILE", "false").lower() == "true" and "FILE_COUNT" not in headers:
+                            if isinstance(file_sink, (str, os.PathLike)):
+                                sink = opened = open(file_sink, "wb")
+                            else:
+                                sink = file_sink
+                                start = sink_position(file_sink)
+                            sink = self.file_writer(headers, sink)
+                        elif headers.get("HAS_FILE", "false").lower() == "true" or "FILE_COUNT" in headers:
+                            file_data = bytearray()
+                            # Several files are compressed one by one, they are decompressed once split.
+                            if "FILE_ENCODING" in headers and "FILE_COUNT" not in headers:
+                                file_decompressor = Decompressor(headers["FILE_ENCODING"], self.max_decompressed_size)
+                        if "CONTENT_ENCODING" in headers:
+                            content_decompressor = Decompressor(headers["CONTENT_ENCODING"], self.max_decompressed_size)
+                    elif isinstance(event, FileChunk):
+                        if sink is not None:
+                            sink.write(event.data)
+                        elif file_decompressor is not None:
+                            file_data += file_decompressor.decompress(event.data)
+                        else:
+                            file_data += event.data
+                    elif isinstance(event, BodyChunk):
+                        if content_decompressor is not None:
+                            content += content_decompressor.decompress(event.data)
+                        else:
+                            content += event.data
+                    elif isinstance(event, MessageComplete):
+                        self._events = events[index + 1:]
+                        if self.hooks is not None:
+                            self._received_at = time.perf_counter()
+                        if file_decompressor is not None and file_data is not None:
+                            file_data += file_decompressor.flush()
+                        if content_decompressor is not None:
+                            content += content_decompressor.flush()
+                        if sink is None:
+                            return self.build_response(headers, content, file_data)
+                        sink.flush()
+                        return self.build_response(headers, content, file=self.sink_file(headers, file_sink, start))
+        finally:
+            if opened is not None:
+                opened.close()
 
-        resp = Response()
-        file, content = parse_file(headers, content)
-        if file:
-            resp.file = file
+    def _recv_into(self, view: memoryview) -> int:
+        """
+        Receive the next bytes of a response into view
+        :return: int The number of bytes received
+        """
+        self._arm("receive")
+        received = self.sock.recv_into(view)
+        if not received:
+            state = self._parser.state
+            part = "header" if state == HEADER else "content" if state in (BODY, BUFFERED) else "file"
+            raise ConnectionClosedError(f"Connection closed while receiving the {part}")
+        if self.hooks is not None and self._first_byte_at is None:
+            self._first_byte_at = time.perf_counter()
+        return received
+
+    def file_writer(self, headers: dict, sink):
+        """
+        The object a received file is written to, decompressing it when it was compressed
+        """
+        if "FILE_ENCODING" in headers:
+            return DecompressWriter(headers["FILE_ENCODING"], sink, self.max_decompressed_size)
+        return sink
+
+    def sink_file(self, headers: dict, file_sink, start: int=None) -> File:
+        """
+        The response file for a file sink.
+        A readable file object sink with a file descriptor is streamed from, from start to its current position,
+        it stays owned by the caller.
+        For a path, or any other sink, the file only has its name and has_file is False,
+        the data is in the sink. No file is opened for the response.
+        :param start: position of the sink before the file was written to it
+        """
+        file = File(filename=headers["FILE_NAME"], border=headers["FILE_BOUNDARY"])
+        if isinstance(file_sink, (str, os.PathLike)) or start is None:
+            return file
+        end = sink_position(file_sink)
+        try:
+            if end is None or not file_sink.readable():
+                return file
+            file.stream(file_sink, filename=headers["FILE_NAME"], offset=start, count=end - start)
+        except (AttributeError, OSError):
+            return file
+        file.border = headers["FILE_BOUNDARY"]
+        return file
 
-        resp.headers = headers
-        resp.content = content
-        resp.cookies = self.cookies
-        resp.vault = self.vault
-        return resp
 
 
-    def rcv_header(self, data: bytes=b""):
-        """
-        :param data: The data that has been received so far
-        :return: [dict, bytes] Headers, content 
-        """
-        chunk = self.sock.recv(self.buffer_size)
-        data += chunk
-        if b"\r\n\r\n" in data:
-            headers, content = parse_header(data)
-            keys = list(headers.keys())
-            for key in keys:
-                if key.startswith("REMEMBER-"):
-                    self.cookies[key[9:]] = headers[key]
-                    del headers[key]
-                elif key.startswith("VAULT-"):
-                    self.vault[key[6:]] = headers[key]
-                    del headers[key]
-                elif key.startswith("CLIENT_VAULT-"):
-                    self.client_vault[key[13:]] = headers[key]
-                    del headers[key]
-                elif key.startswith("FORGET-"):
-                    del self.cookies[headers[key]]
-                    del self.vault[headers[key]]
-                    del headers[key]
-            return headers, content
-        else:
-            return self.rcv_header(data)
-
-    def rcv_content(self, content_length: int, data: bytes=b"") -> bytes:
-        while len(data) < content_length:
-            data += self.sock.recv(self.buffer_size)
-        return data[content_length:]
-
-    def Lock(self, key, value):
-        self.client_vault[key] = value
+def sink_position(file_sink) -> int:
+    """
+    Current position of a file object sink, None when it has none
+    """
+    try:
+        return file_sink.tell()
+    except (AttributeError, OSError):
+        return None
+
+class Pipeline:
+    """
+    Requests queued to be sent back to back over one connection
+    """
+
+    def __init__(self, client: Client):
+        self.client = client
+        self.requests = []
+        self.responses = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None and self.requests:
+            self.execute()
+
+    def send(self, request: Request) -> "Pipeline":
+        """
+        Queue a request
+        """
+        self.requests.append(request)
+        return self
+
+    def execute(self) -> list:
+        """
+        Send the queued requests
+        :return: list The responses, in the order of the requests
+        """
+        requests, self.requests = self.requests, []
+        self.responses = self.client.send_many(requests)
+        return self.responses
 
 
 if __name__ == "__main__":
+    from .logger import Logger
     file = File(filename="test.txt", data=b"Hello World!", border="FILE_BOUDNAKSFDJBADFS")
     request = Request(file=file, content=b"sdfsdf Worfsdfsdfsdfld!", command="SET")
     request.headers["Content-Type"] = "text/plain"
     client = Client("127.0.0.1", 22392, "PUBKEY.pem", 4096)
     resp = client.send(request)
-    logger = Logger("debug")
+    logger = Logger("debug", background=False)
     logger.Test("Response 1:")
     print(resp.headers)
     print(resp.cookies)
@@ -0,0 +1,218 @@
+"""
+    Optional compression of the content and file of a message.
+
+    Compression is signalled with the CONTENT_ENCODING and FILE_ENCODING headers,
+    CONTENT_LENGTH and FILE_SIZE are the sizes of the compressed data on the wire.
+    A request which uses compression also sends ACCEPT_ENCODING,
+    the codecs the client can decompress, so the server may compress the response.
+
+    zlib is always available, bz2 and lzma are registered when Python was built with them.
+    Other codecs can be added with register_codec.
+"""
+import tempfile
+import zlib
+from .errors import DecompressedTooLargeError
+
+# Payloads smaller than this are sent uncompressed, in bytes.
+DEFAULT_THRESHOLD = 1024
+# Largest size received data may decompress to, in bytes.
+MAX_DECOMPRESSED_SIZE = 1 << 30
+
+CODECS = {}
+
+def register_codec(name: str, compressor, decompressor):
+    """
+    Register a codec
+    :param compressor: callable returning an object with compress(data) and flush()
+    :param decompressor: callable returning an object with decompress(data), and optionally flush()
+    """
+    CODECS[name] = (compressor, decompressor)
+
+def _bz2_compressor():
+    import bz2
+    return bz2.BZ2Compressor()
+
+def _bz2_decompressor():
+    import bz2
+    return bz2.BZ2Decompressor()
+
+def _lzma_compressor():
+    import lzma
+    return lzma.LZMACompressor()
+
+def _lzma_decompressor():
+    import lzma
+    return lzma.LZMADecompressor()
+
+register_codec("zlib", zlib.compressobj, zlib.decompressobj)
+try:
+    import _bz2
+    register_codec("bz2", _bz2_compressor, _bz2_decompressor)
+except ImportError:
+    pass
+try:
+    import _lzma
+    register_codec("lzma", _lzma_compressor, _lzma_decompressor)
+except ImportError:
+    pass
+
+def codec(name: str) -> tuple:
+    """
+    Get a registered codec
+    :return: (compressor, decompressor)
+    """
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown compression codec: {name}")
+
+def compress(name: str, data: bytes) -> bytes:
+    """
+    Compress data in memory
+    """
+    compressor = codec(name)[0]()
+    return compressor.compress(data) + compressor.flush()
+
+def compress_segment(name: str, segment, chunk_size: int=1 << 20):
+    """
+    Compress a streamed file range into a temporary file, chunk by chunk
+    :return: file object The compressed data, rewound
+    """
+    compressor = codec(name)[0]()
+    output = tempfile.TemporaryFile()
+    for chunk in segment.chunks(chunk_size):
+        output.write(compressor.compress(chunk))
+    output.write(compressor.flush())
+    output.flush()
+    output.seek(0)
+    return output
+
+class Decompressor:
+    """
+    Incremental decompression of data as it is received.
+
+    With max_size, DecompressedTooLargeError is raised as soon as the output grows past it.
+    The zlib, bz2 and lzma decompressors are asked for at most one byte more than is left,
+    so a decompression bomb never expands in memory. Other codecs are checked after each chunk.
+    """
+
+    def __init__(self, name: str, max_size: int=None):
+        self._decompressor = codec(name)[1]()
+        self.max_size = max_size
+        # Bytes of output so far.
+        self.size = 0
+        # Whether decompress takes a max_length, like the decompressors of zlib, bz2 and lzma.
+        self._bounded = hasattr(self._decompressor, "unconsumed_tail") or hasattr(self._decompressor, "needs_input")
+
+    def decompress(self, data: bytes) -> bytes:
+        if self.max_size is not None and self._bounded:
+            data = self._decompressor.decompress(data, self.max_size - self.size + 1)
+        else:
+            data = self._decompressor.decompress(data)
+        return self._count(data)
+
+    def flush(self) -> bytes:
+        if hasattr(self._decompressor, "flush"):
+            return self._count(self._decompressor.flush())
+        return b""
+
+    def _count(self, data: bytes) -> bytes:
+        self.size += len(data)
+        if self.max_size is not None and self.size > self.max_size:
+            raise DecompressedTooLargeError(f"Data decompresses to more than {self.max_size} bytes")
+        return data
+
+def decompress(name: str, data: bytes, max_size: int=None) -> bytes:
+    """
+    Decompress data in memory
+    """
+    decompressor = Decompressor(name, max_size)
+    return decompressor.decompress(data) + decompressor.flush()
+
+def decompress_files(name: str, files: list, max_size: int=None):
+    """
+    Decompress the files of a message with several files, every file is compressed on its own
+    :param max_size: largest size of all files together
+    """
+    for file in files:
+        file.data = decompress(name, file.data, max_size)
+        if max_size is not None:
+            max_size -= len(file.data)
+
+class DecompressWriter:
+    """
+    Wraps a writable file, data written to it is decompressed on the way through
+    """
+
+    def __init__(self, name: str, sink, max_size: int=None):
+        self.sink = sink
+        self._decompressor = Decompressor(name, max_size)
+
+    def write(self, data: bytes) -> int:
+        self.sink.write(self._decompressor.decompress(data))
+        return len(data)
+
+    def flush(self):
+        """
+        Write the remaining decompressed data
+        """
+        self.sink.write(self._decompressor.flush())
+        self.sink.flush()
+
+def close_encoded(encoded, request):
+    """
+    Close the temporary files encode_request created for the compressed copy of a request, once it was sent
+    """
+    originals = [request.file, *request.files]
+    for file in [encoded.file, *encoded.files]:
+        if file is not None and not any(file is original for original in originals):
+            file.close()
+
+def encode_request(request, name: str, threshold: int=DEFAULT_THRESHOLD):
+    """
+    Create a copy of a request with its content and file compressed.
+    Parts smaller than threshold are left uncompressed.
+    :return: Request The compressed request
+    """
+    codec(name)
+    headers = dict(request.headers)
+    headers["ACCEPT_ENCODING"] = ",".join(CODECS)
+    content = request.content
+    if len(content) >= threshold:
+        content = compress(name, content)
+        headers["CONTENT_ENCODING"] = name
+    files = request.files
+    if files and sum(part.size() for part in files if part.has_file) >= threshold:
+        # All files are compressed, FILE_ENCODING applies to each of them.
+        files = [compress_file(name, part) for part in files]
+        headers["FILE_ENCODING"] = name
+    file = request.file
+    if not files and file and file.has_file and file.size() >= threshold:
+        file = compress_file(name, file)
+        headers["FILE_ENCODING"] = name
+    return type(request)(
+        headers=headers,
+        content=content,
+        file=file,
+        cookies=request.cookies,
+        command=request.command,
+        vault=request.vault,
+        files=files,
+    )
+
+def compress_file(name: str, file):
+    """
+    Create a compressed copy of a file, a streamed file is compressed into a temporary file
+    """
+    if not file.has_file:
+        return file
+    compressed = type(file)(filename=file.filename, border=file.border)
+    if file.fileobj is not None:
+        compressed.stream(compress_segment(name, file.segment()), filename=file.filename)
+        # The temporary file is closed together with the compressed file.
+        compressed._owns_file = True
+        compressed.border = file.border
+    else:
+        compressed.data = compress(name, file.data)
+        compressed.has_file = True
+    return compressed
@@ -0,0 +1,189 @@
+"""
+    RSA helpers for the client vault.
+
+    Public keys are loaded once per process and file version,
+    the OAEP padding is built once and reused for every encryption.
+    The cryptography package is only imported once a key is actually loaded.
+
+    ### Client vault encodings:
+        - One CLIENT_VAULT-<key> header per value, RSA-OAEP encrypted with the public key of the server.
+        - Hybrid: a SessionKey (AES-256-GCM) is wrapped once with RSA and sent as CLIENT_VAULT_KEY,
+            all values are sealed with it into a single CLIENT_VAULT header.
+            The CLIENT_VAULT header is base64 of the 12 byte nonce and the AES-GCM ciphertext of the vault as JSON.
+"""
+import base64
+import json
+import os
+import threading
+
+# Associated data of the sealed client vault.
+VAULT_AAD = b"CLIENT_VAULT"
+
+# Default directory to look for key files in, the directory of the package.
+KEY_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_keys = {}
+_keys_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+_oaep_padding = None
+
+def oaep_padding():
+    """
+    The OAEP padding used for the client vault, built on first use
+    """
+    global _oaep_padding
+    if _oaep_padding is None:
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import padding
+        # Server uses sha512 to hash the key
+        _oaep_padding = padding.OAEP(
+            mgf=padding.MGF1(algorithm=hashes.SHA512()),
+            algorithm=hashes.SHA512(),
+            label=None
+        )
+    return _oaep_padding
+
+def key_path(rsa_file: str) -> str:
+    """
+    Resolve a key file, relative paths are looked up in the package directory
+    """
+    return os.path.join(KEY_DIR, rsa_file)
+
+def load_public_key(path: str):
+    """
+    Load a PEM public key, cached by path and modification time
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    cache_key = (path, stat.st_mtime_ns, stat.st_size)
+    with _keys_lock:
+        key = _keys.get(cache_key)
+    if key is not None:
+        return key
+    from cryptography.hazmat.primitives import serialization
+    with open(path, "rb") as f:
+        key = serialization.load_pem_public_key(f.read())
+    with _keys_lock:
+        # Forget older versions of the same file.
+        for cached in [cached for cached in _keys if cached[0] == path]:
+            del _keys[cached]
+        _keys[cache_key] = key
+    return key
+
+def encrypt(rsa_key, value: str) -> str:
+    """
+    Encrypt a value with RSA-OAEP and encode it to base64
+    """
+    return base64.b64encode(rsa_key.encrypt(value.encode(), oaep_padding())).decode()
+
+def executor():
+    """
+    The thread pool shared by all clients for encrypting vault values
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _executor = ThreadPoolExecutor(thread_name_prefix="vault")
+        return _executor
+
+class CiphertextCache:
+    """
+    Remembers the ciphertext of vault values, so unchanged values are not encrypted again.
+
+    The server accepts any valid ciphertext of a value,
+    sending the same ciphertext again only tells an observer the value did not change.
+    """
+
+    def __init__(self, max_size: int=1024):
+        self.max_size = max_size
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, value: str) -> str:
+        with self._lock:
+            return self._entries.get((key, value))
+
+    def set(self, key: str, value: str, ciphertext: str):
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                # Drop the oldest entry.
+                del self._entries[next(iter(self._entries))]
+            self._entries[(key, value)] = ciphertext
+
+def encrypt_vault(rsa_key, client_vault: dict, parallel: bool=False, cache: CiphertextCache=None) -> dict:
+    """
+    Encrypt all values of a client vault
+    :param parallel: encrypt in the shared thread pool when more than one value needs encrypting
+    :param cache: reuse the ciphertexts of values which were encrypted before
+    :return: dict key -> base64 ciphertext
+    """
+    encrypted = {}
+    pending = []
+    for key, value in client_vault.items():
+        ciphertext = cache.get(key, value) if cache is not None else None
+        if ciphertext is None:
+            pending.append((key, value))
+        else:
+            encrypted[key] = ciphertext
+    if parallel and len(pending) > 1:
+        values = executor().map(lambda item: encrypt(rsa_key, item[1]), pending)
+    else:
+        values = (encrypt(rsa_key, value) for _, value in pending)
+    for (key, value), ciphertext in zip(pending, values):
+        encrypted[key] = ciphertext
+        if cache is not None:
+            cache.set(key, value, ciphertext)
+    # Keep the order of the client vault.
+    return {key: encrypted[key] for key in client_vault}
+
+class SessionKey:
+    """
+    AES-256-GCM key for the client vault, wrapped with the RSA key of the server once.
+    Sealing a vault costs no RSA operation and has no limit on the size of the values.
+    """
+    # Nonces are random, use a new key long before two of them could collide.
+    max_uses = 1 << 32
+
+    def __init__(self, rsa_key):
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        key = AESGCM.generate_key(bit_length=256)
+        self._aead = AESGCM(key)
+        # CLIENT_VAULT_KEY header
+        self.wrapped = base64.b64encode(rsa_key.encrypt(key, oaep_padding())).decode()
+        self.uses = 0
+
+    @property
+    def expired(self) -> bool:
+        return self.uses >= self.max_uses
+
+    def seal(self, client_vault: dict) -> str:
+        """
+        Encrypt all values of a client vault
+        :return: str The CLIENT_VAULT header
+        """
+        self.uses += 1
+        nonce = os.urandom(12)
+        data = json.dumps(client_vault, separators=(",", ":")).encode()
+        return base64.b64encode(nonce + self._aead.encrypt(nonce, data, VAULT_AAD)).decode()
+
+def decrypt(private_key, value: str) -> str:
+    """
+    Decrypt a CLIENT_VAULT-<key> value, for servers holding the private key
+    """
+    return private_key.decrypt(base64.b64decode(value), oaep_padding()).decode()
+
+def unwrap_session_key(private_key, wrapped: str) -> bytes:
+    """
+    Decrypt a CLIENT_VAULT_KEY header, for servers holding the private key
+    """
+    return private_key.decrypt(base64.b64decode(wrapped), oaep_padding())
+
+def open_vault(key: bytes, sealed: str) -> dict:
+    """
+    Decrypt a CLIENT_VAULT header with the unwrapped session key
+    """
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    data = base64.b64decode(sealed)
+    return json.loads(AESGCM(key).decrypt(data[:12], data[12:], VAULT_AAD))
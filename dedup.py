@@ -0,0 +1,128 @@
+"""
+    Content-addressed deduplication of uploaded files.
+
+    Before a request with a file is sent, the file is hashed and a PROBE request
+    with its FILE_DIGEST and FILE_SIZE asks the server whether it already has the content.
+    When it has, the request is sent without the file, the server takes it from its store by digest.
+    Otherwise the request is sent with the file and its FILE_DIGEST, so the server can store it.
+
+    ### Usage:
+        - client.dedup = DigestCache()
+        - client.send(Request(command="SET", file=File().stream("libfoo.so")))  # Uploaded
+        - client.send(Request(command="SET", file=File().stream("libfoo.so")))  # Probe only
+
+    ### Commands:
+        - PROBE: FILE_DIGEST and FILE_SIZE headers, answered with PRESENT:true or PRESENT:false
+        - Requests without a file but with FILE_DIGEST, FILE_NAME and FILE_SIZE headers
+            refer to content the server has. It answers with ERROR:Unknown FILE_DIGEST when it has not,
+            and the client sends the request again with the file.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+# Client imports
+from .request import Request
+from .files import File
+
+ALGORITHM = "sha256"
+UNKNOWN_DIGEST = "Unknown FILE_DIGEST"
+
+class DigestCache:
+    """
+    Digests of files on disk, keyed by path, modification time and size,
+    so files which did not change are not hashed again
+    """
+
+    def __init__(self, max_size: int=4096):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple) -> str:
+        with self._lock:
+            digest = self._entries.get(key)
+            if digest is not None:
+                self._entries.move_to_end(key)
+            return digest
+
+    def put(self, key: tuple, digest: str):
+        with self._lock:
+            self._entries[key] = digest
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+def digest_key(file: File) -> tuple:
+    """
+    DigestCache key of a file streamed from a named file on disk, None for other files
+    """
+    if file.fileobj is None:
+        return None
+    name = getattr(file.fileobj, "name", None)
+    if not isinstance(name, (str, bytes)):
+        return None
+    stat = os.fstat(file.fileobj.fileno())
+    segment = file.segment()
+    return (os.path.abspath(name), stat.st_mtime_ns, stat.st_size, segment.offset, segment.count)
+
+def file_digest(file: File, cache: DigestCache=None) -> str:
+    """
+    Digest of the data of a file as "<algorithm>:<hex>".
+    Streamed files are hashed chunk by chunk as they are read.
+    """
+    key = digest_key(file) if cache is not None else None
+    if key is not None:
+        digest = cache.get(key)
+        if digest is not None:
+            return digest
+    hasher = hashlib.new(ALGORITHM)
+    if file.fileobj is not None:
+        for chunk in file.segment().chunks():
+            hasher.update(chunk)
+    else:
+        hasher.update(file.data)
+    digest = f"{ALGORITHM}:{hasher.hexdigest()}"
+    if key is not None:
+        cache.put(key, digest)
+    return digest
+
+def verify_digest(digest: str, data: bytes) -> bool:
+    """
+    Check data against a FILE_DIGEST
+    """
+    algorithm, _, expected = digest.partition(":")
+    try:
+        return hashlib.new(algorithm, data).hexdigest() == expected
+    except ValueError:
+        return False
+
+def probe_request(file: File, digest: str) -> Request:
+    """
+    The PROBE request asking the server whether it has a file
+    """
+    return Request(headers={"FILE_DIGEST": digest, "FILE_SIZE": str(file.size())}, command="PROBE")
+
+def with_digest(request: Request, digest: str, include_file: bool) -> Request:
+    """
+    Copy of a request carrying the FILE_DIGEST of its file, without the file unless include_file is True
+    """
+    file = request.file
+    headers = dict(request.headers)
+    headers["FILE_DIGEST"] = digest
+    if not include_file:
+        headers["FILE_NAME"] = file.filename
+        headers["FILE_SIZE"] = str(file.size())
+        file = None
+    return type(request)(
+        headers=headers,
+        content=request.content,
+        file=file,
+        cookies=request.cookies,
+        command=request.command,
+        vault=request.vault,
+        compression=request.compression,
+    )
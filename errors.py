@@ -0,0 +1,49 @@
+"""
+    Exceptions raised by the client.
+"""
+
+class ProtocolError(Exception):
+    """
+    The data received does not follow the tcpproto framing
+    """
+    pass
+
+class HeaderTooLargeError(ProtocolError):
+    """
+    The header block is larger than the configured maximum header size
+    """
+    pass
+
+class DecompressedTooLargeError(ProtocolError):
+    """
+    Compressed data decompresses to more than the configured maximum size
+    """
+    pass
+
+class ConnectionClosedError(ProtocolError, ConnectionError):
+    """
+    The connection was closed in the middle of a message
+    """
+    pass
+
+class DeadlineExceededError(TimeoutError):
+    """
+    A request did not finish before its deadline
+    """
+
+    def __init__(self, message: str, phase: str):
+        super().__init__(message)
+        # connect, write or receive
+        self.phase = phase
+
+class TransferError(Exception):
+    """
+    Chunks of a chunked transfer could not be sent,
+    send again with the same transfer_id to resume it
+    """
+
+    def __init__(self, message: str, transfer_id: str, failed: list):
+        super().__init__(message)
+        self.transfer_id = transfer_id
+        # Offsets of the chunks which were not sent
+        self.failed = failed
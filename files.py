@@ -9,6 +9,6 @@ class File (BaseFile):
     """
     File to add to the data
     """
-    pass
+    __slots__ = ()
     
 
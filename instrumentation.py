@@ -0,0 +1,173 @@
+"""
+    Per-request instrumentation of the client.
+
+    A hook is any callable taking a PhaseEvent, add it with client.add_hook(hook).
+    Clients without hooks skip all timing, so instrumentation costs nothing when unused.
+
+    ### Phases of Client.send:
+        - connect: opening the connection
+        - vault_encrypt: RSA encryption of the client vault
+        - headers: generating the header block and the buffers to send
+        - write: writing the request to the socket, bytes is the request size
+        - first_byte: from the end of the write until the first byte of the response
+        - receive: receiving the whole response, bytes is the CONTENT_LENGTH
+        - parse_file: splitting the file from the content and building the response
+
+    ### Usage:
+        - metrics = MetricsCollector()
+        - client.add_hook(metrics)
+        - print(metrics.prometheus())
+"""
+import bisect
+import json
+import threading
+import time
+
+# Upper bounds of the histogram buckets, in seconds.
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+class PhaseEvent:
+    """
+    A phase of a request has finished
+    """
+    __slots__ = ("phase", "command", "start", "end", "bytes")
+
+    def __init__(self, phase: str, command: str, start: float, end: float, bytes: int=0):
+        self.phase = phase
+        self.command = command
+        # time.perf_counter() timestamps
+        self.start = start
+        self.end = end
+        self.bytes = bytes
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(phase={self.phase}, command={self.command}, duration={self.duration:.6f}, bytes={self.bytes})"
+
+class Histogram:
+    """
+    Histogram with fixed buckets
+    """
+
+    def __init__(self, buckets: tuple=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # The last count is for values above the largest bucket.
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other: "Histogram"):
+        """
+        Add the observations of a histogram with the same buckets
+        """
+        if other.buckets != self.buckets:
+            raise ValueError("Histograms have different buckets")
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile, as the upper bound of the bucket it falls in
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                break
+        if index < len(self.buckets):
+            return self.buckets[index]
+        return float("inf")
+
+    def to_dict(self) -> dict:
+        return {"buckets": list(self.buckets), "counts": list(self.counts), "count": self.count, "sum": self.sum}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Histogram":
+        histogram = cls(data["buckets"])
+        histogram.counts = list(data["counts"])
+        histogram.count = data["count"]
+        histogram.sum = data["sum"]
+        return histogram
+
+class MetricsCollector:
+    """
+    Hook keeping a duration histogram and a byte count per (command, phase)
+    """
+
+    def __init__(self, buckets: tuple=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}
+        self.bytes = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event: PhaseEvent):
+        key = (event.command, event.phase)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+                self.bytes[key] = 0
+            histogram.observe(event.duration)
+            self.bytes[key] += event.bytes
+
+    def snapshot(self) -> dict:
+        """
+        The metrics as a JSON serializable dictionary
+        """
+        with self._lock:
+            return {
+                "time": time.time(),
+                "phases": [
+                    dict(histogram.to_dict(), command=command, phase=phase, bytes=self.bytes[(command, phase)])
+                    for (command, phase), histogram in self.histograms.items()
+                ],
+            }
+
+    def json(self) -> str:
+        return json.dumps(self.snapshot())
+
+    def prometheus(self, prefix: str="tcpproto_client") -> str:
+        """
+        The metrics in the Prometheus text exposition format
+        """
+        lines = [
+            f"# HELP {prefix}_phase_seconds Time spent in each phase of a request.",
+            f"# TYPE {prefix}_phase_seconds histogram",
+        ]
+        byte_lines = [
+            f"# HELP {prefix}_phase_bytes_total Bytes transferred in each phase of a request.",
+            f"# TYPE {prefix}_phase_bytes_total counter",
+        ]
+        with self._lock:
+            for (command, phase), histogram in sorted(self.histograms.items()):
+                labels = f'command="{escape(command)}",phase="{phase}"'
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{prefix}_phase_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_phase_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"{prefix}_phase_seconds_sum{{{labels}}} {histogram.sum}")
+                lines.append(f"{prefix}_phase_seconds_count{{{labels}}} {histogram.count}")
+                byte_lines.append(f"{prefix}_phase_bytes_total{{{labels}}} {self.bytes[(command, phase)]}")
+        return "\n".join(lines + byte_lines) + "\n"
+
+def escape(value: str) -> str:
+    """
+    Escape a Prometheus label value
+    """
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
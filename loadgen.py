@@ -0,0 +1,272 @@
+"""
+    Load generator for tcpproto servers.
+
+    Spawns worker processes, each running several Client connections from their own threads,
+    which replay a mix of GET and SET requests in closed loop, or at a target rate.
+    The per-worker latency histograms are merged into one report.
+
+    In open loop (--rate), latency is measured from the time a request was due,
+    so a stalled server shows up as latency instead of as fewer requests.
+
+    Usage: python -m <package>.loadgen [--host 127.0.0.1 --port 22392] [--processes 4] [--connections 8]
+           [--duration 10] [--rate 0] [--mix GET=80,SET=20] [--content-size 1K] [--file-size 0] [--output report.json]
+    Without --port, a loopback stand-in server is started and used.
+    Connections which could not be opened and failed requests are counted as errors,
+    the exit status is 1 when no request succeeded.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+# Client imports
+from .client import Client
+from .request import Request
+from .files import File
+from .loopback import LoopbackServer
+from .instrumentation import Histogram
+from .benchmarks.throughput import parse_size, payload
+
+def latency_buckets(low: float=50e-6, high: float=30.0, factor: float=1.25) -> tuple:
+    """
+    Log-spaced histogram buckets, fine enough to read the tail latencies from
+    """
+    buckets = []
+    bound = low
+    while bound < high:
+        buckets.append(round(bound, 9))
+        bound *= factor
+    buckets.append(high)
+    return tuple(buckets)
+
+BUCKETS = latency_buckets()
+
+def parse_mix(mix: str) -> list:
+    """
+    Parse a request mix like GET=80,SET=20
+    :return: list of (command, weight)
+    """
+    commands = []
+    for item in mix.split(","):
+        command, _, weight = item.partition("=")
+        commands.append((command.strip().upper(), float(weight or 1)))
+    return commands
+
+class Worker:
+    """
+    The connections of one worker process
+    """
+
+    def __init__(self, config: dict, index: int):
+        self.config = config
+        self.index = index
+        self.content = payload(config["content_size"])
+        self.file_data = payload(config["file_size"])
+        commands = parse_mix(config["mix"])
+        self.commands = [command for command, _ in commands]
+        self.weights = [weight for _, weight in commands]
+        self.lock = threading.Lock()
+        self.histograms = {command: Histogram(BUCKETS) for command in self.commands}
+        self.errors = {}
+        # Requests answered without an ERROR header.
+        self.succeeded = 0
+
+    def request(self, command: str, rng: random.Random) -> Request:
+        headers = {"KEY": f"key-{rng.randrange(self.config['keys'])}"}
+        if command != "SET":
+            return Request(headers=headers, command=command)
+        file = File(filename="load.bin", data=self.file_data) if self.file_data else None
+        return Request(headers=headers, content=self.content, file=file, command=command)
+
+    def run_connection(self, connection: int, start: float, end: float):
+        """
+        Send requests over one connection until end
+        """
+        config = self.config
+        rng = random.Random(self.index * 100003 + connection)
+        # Per connection share of the target rate, 0 for closed loop.
+        interval = 1.0 / config["rate_per_connection"] if config["rate_per_connection"] else 0.0
+        histograms = {command: Histogram(BUCKETS) for command in self.commands}
+        errors = {}
+        succeeded = 0
+        # Spread the connections over the first interval.
+        due = start + rng.random() * interval
+        client = None
+        try:
+            client = Client(config["host"], config["port"], buffer_size=1 << 16, timeout=config["timeout"])
+            while True:
+                now = time.monotonic()
+                if interval:
+                    if due > now:
+                        time.sleep(due - now)
+                    sent_at = due
+                    due += interval
+                else:
+                    sent_at = now
+                if sent_at >= end:
+                    break
+                command = rng.choices(self.commands, self.weights)[0]
+                try:
+                    response = client.send(self.request(command, rng))
+                    if "ERROR" in response.headers:
+                        errors[command] = errors.get(command, 0) + 1
+                    else:
+                        succeeded += 1
+                except Exception as e:
+                    # The client reconnects on the next request.
+                    name = type(e).__name__
+                    errors[name] = errors.get(name, 0) + 1
+                histograms[command].observe(time.monotonic() - sent_at)
+        except Exception as e:
+            # The connection could not be opened.
+            name = type(e).__name__
+            errors[name] = errors.get(name, 0) + 1
+        finally:
+            if client is not None:
+                client.Close()
+            with self.lock:
+                for command, histogram in histograms.items():
+                    self.histograms[command].merge(histogram)
+                for name, count in errors.items():
+                    self.errors[name] = self.errors.get(name, 0) + count
+                self.succeeded += succeeded
+
+    def run(self) -> dict:
+        start = time.monotonic() + 0.1
+        end = start + self.config["duration"]
+        threads = [
+            threading.Thread(target=self.run_connection, args=(connection, start, end), daemon=True)
+            for connection in range(self.config["connections"])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {
+            "histograms": {command: histogram.to_dict() for command, histogram in self.histograms.items()},
+            "errors": self.errors,
+            "succeeded": self.succeeded,
+        }
+
+def run_worker(config: dict, index: int) -> dict:
+    """
+    Run a worker, in a worker process
+    """
+    return Worker(config, index).run()
+
+def merge(results: list) -> tuple:
+    """
+    Merge the results of the workers
+    :return: (histograms, errors, succeeded) histograms and errors per command, the number of requests which succeeded
+    """
+    histograms = {}
+    errors = {}
+    succeeded = 0
+    for result in results:
+        for command, data in result["histograms"].items():
+            histogram = Histogram.from_dict(data)
+            if command in histograms:
+                histograms[command].merge(histogram)
+            else:
+                histograms[command] = histogram
+        for name, count in result["errors"].items():
+            errors[name] = errors.get(name, 0) + count
+        succeeded += result["succeeded"]
+    return histograms, errors, succeeded
+
+def report(histograms: dict, errors: dict, duration: float, succeeded: int) -> dict:
+    commands = {}
+    total = Histogram(BUCKETS)
+    for command, histogram in sorted(histograms.items()):
+        total.merge(histogram)
+        commands[command] = summary(histogram, duration)
+    return {
+        "duration": duration,
+        "total": summary(total, duration),
+        "commands": commands,
+        "errors": errors,
+        "succeeded": succeeded,
+    }
+
+def summary(histogram: Histogram, duration: float) -> dict:
+    return {
+        "requests": histogram.count,
+        "requests_per_second": histogram.count / duration if duration else 0.0,
+        "mean_ms": histogram.sum / histogram.count * 1000 if histogram.count else 0.0,
+        "p50_ms": histogram.quantile(0.5) * 1000,
+        "p90_ms": histogram.quantile(0.9) * 1000,
+        "p99_ms": histogram.quantile(0.99) * 1000,
+        "p999_ms": histogram.quantile(0.999) * 1000,
+    }
+
+def run(config: dict) -> dict:
+    """
+    Run the workers and merge their histograms
+    """
+    connections = config["processes"] * config["connections"]
+    config = dict(config, rate_per_connection=config["rate"] / connections if config["rate"] else 0.0)
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=config["processes"], mp_context=context) as executor:
+        futures = [executor.submit(run_worker, config, index) for index in range(config["processes"])]
+        results = [future.result() for future in futures]
+    histograms, errors, succeeded = merge(results)
+    return report(histograms, errors, config["duration"], succeeded)
+
+def print_report(result: dict):
+    print(f"{'command':10} {'requests':>10} {'req/s':>10} {'mean ms':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'p99.9 ms':>9}")
+    for command, row in list(result["commands"].items()) + [("total", result["total"])]:
+        print(
+            f"{command:10} {row['requests']:10} {row['requests_per_second']:10.1f} {row['mean_ms']:9.3f}"
+            f" {row['p50_ms']:9.3f} {row['p90_ms']:9.3f} {row['p99_ms']:9.3f} {row['p999_ms']:9.3f}"
+        )
+    if result["errors"]:
+        print("errors:", ", ".join(f"{name}={count}" for name, count in sorted(result["errors"].items())))
+    if not result["succeeded"]:
+        print("no request succeeded", file=sys.stderr)
+
+def main(argv: list=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="port of the server, a loopback server is started when omitted")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--connections", type=int, default=4, help="connections per worker process")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to send requests for")
+    parser.add_argument("--rate", type=float, default=0.0, help="target requests/sec over all connections, 0 for closed loop")
+    parser.add_argument("--mix", default="GET=80,SET=20", help="commands and their weights")
+    parser.add_argument("--keys", type=int, default=1000, help="number of distinct KEY headers")
+    parser.add_argument("--content-size", default="1K", help="content size of SET requests")
+    parser.add_argument("--file-size", default="0", help="file size of SET requests, 0 for no file")
+    parser.add_argument("--timeout", type=float, default=10.0, help="deadline of a request in seconds")
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    args = parser.parse_args(argv)
+    config = {
+        "host": args.host,
+        "port": args.port,
+        "processes": args.processes,
+        "connections": args.connections,
+        "duration": args.duration,
+        "rate": args.rate,
+        "mix": args.mix,
+        "keys": args.keys,
+        "content_size": parse_size(args.content_size),
+        "file_size": parse_size(args.file_size),
+        "timeout": args.timeout,
+    }
+    if args.port is None:
+        with LoopbackServer() as server:
+            config["host"], config["port"] = server.address
+            result = run(config)
+    else:
+        result = run(config)
+    print_report(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=4)
+    return result
+
+if __name__ == "__main__":
+    sys.exit(0 if main()["succeeded"] else 1)
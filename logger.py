@@ -1,6 +1,18 @@
+import atexit
 import datetime
+import json
+import os
+import queue
+import threading
+import time
 import traceback
 import sys
+import weakref
+
+LEVELS = {"test": 0, "debug": 1, "info": 2, "warning": 3, "error": 4}
+
+# Loggers with a running writer thread, flushed when the interpreter exits.
+_running = weakref.WeakSet()
 
 class Logger:
     """
@@ -11,14 +23,19 @@ class Logger:
             - if a string is passed, it will be treated as a file path.
         - Colored messages (Only if stdout is sys.stdout)
         - Different log levels (test, debug, info, warning, error)
+        - Lazy formatting, logger.Debug("Sent %d bytes", size) is only formatted when the level passes
+        - Writing from a background thread in batches, logging does not wait for stdout
+        - Size or time based rotation of log files
+        - JSON lines instead of text
 
     ### Usage:
         - logger = Logger(loglevel="debug", stdout="logfile.txt") # Or any other stdout like sys.stdout
-        - logger.Test("This is a test message")  
+        - logger.Test("This is a test message")
         - logger.Debug("This is a debug message")
         - logger.Info("This is an info message")
         - logger.Warning("This is a warning message")
         - logger.Error("This is an error message")
+        - logger.flush() # Wait until the messages are written
 
     ### Special functions:
     ##### logger.Except(func, exceptions=[Exception], *args, **kwargs)
@@ -45,19 +62,36 @@ class Logger:
     test = "\033[35m"
     stdout = sys.stdout
     use_color = True
+    # Most messages written at once by the writer thread.
+    batch_size = 256
 
-    def __init__(self, loglevel=0, stdout=sys.stdout, use_color: bool=True):
-        """loglevel: 0 = test, 1 = debug, 2 = info, 3 = warning, 4 = error"""
+    def __init__(self, loglevel=0, stdout=sys.stdout, use_color: bool=True, json_lines: bool=False,
+                 max_bytes: int=0, rotate_interval: float=0, backup_count: int=5, background: bool=True):
+        """
+        loglevel: 0 = test, 1 = debug, 2 = info, 3 = warning, 4 = error
+        :param json_lines: write every message as a JSON object on its own line
+        :param max_bytes: rotate a log file once it grows past this size, 0 to never rotate on size
+        :param rotate_interval: rotate a log file every this many seconds, 0 to never rotate on time
+        :param backup_count: number of rotated files to keep, as <path>.1 to <path>.<backup_count>
+        :param background: write from a background thread, False to write before the log call returns
+        """
         if isinstance(loglevel, int):
             self.__loglevel = loglevel
         else:
             if isinstance(loglevel, str):
                 self.__loglevel = self.getlevelfromstr(loglevel)
         if isinstance(stdout, str):
-            self.stdout = open(stdout, "a")
+            self.stdout = RotatingFile(stdout, max_bytes, rotate_interval, backup_count)
         else:
             self.stdout = stdout
         self.use_color = use_color
+        self.json_lines = json_lines
+        self.background = background
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        # (second, formatted) of the last timestamp formatted.
+        self._timestamp = (None, "")
 
     def __write(self, msg: str):
         self.stdout.write(msg + "\n")
@@ -65,37 +99,136 @@ class Logger:
     def getlevelfromstr(self, loglevel: str):
         """Converts a string to a loglevel"""
         if isinstance(loglevel, str):
-            match loglevel.lower():
-                case "error":
-                    loglevel = 4
-                case "warning":
-                    loglevel = 3
-                case "info":
-                    loglevel = 2
-                case "debug":
-                    loglevel = 1
-                case "test":
-                    loglevel = 0
-                case _:
-                    loglevel = 0
-            return loglevel
+            return LEVELS.get(loglevel.lower(), 0)
         else:
             raise TypeError("loglevel must be a string to call getlevelfromstr")
 
-    def craft(self, msg, loglevel: str, prefix: str="", suffix: str=""):
+    def timestamp(self, created: float) -> str:
+        """Formats a time.time() value, once per second"""
+        second = int(created)
+        cached_second, formatted = self._timestamp
+        if second != cached_second:
+            formatted = datetime.datetime.fromtimestamp(second).strftime("%Y-%m-%d %H:%M:%S")
+            self._timestamp = (second, formatted)
+        return formatted
+
+    def craft(self, msg, loglevel: str, prefix: str="", suffix: str="", created: float=None):
         """Crafts a (maybe colored) message with a prefix and suffix"""
-        nowtime = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         # Get the color
-        if not hasattr(self, loglevel.lower()):
+        if loglevel.lower() not in LEVELS:
             raise AttributeError("Invalid loglevel")
+        nowtime = self.timestamp(time.time() if created is None else created)
+        if self.json_lines:
+            return json.dumps({"time": nowtime, "created": created, "level": loglevel.upper(), "message": f"{prefix}{msg}{suffix}"})
         # If stdout is not sys.stdout, we don't want to color the output.
         if sys.stdout != self.stdout or not self.use_color:
             return f"{prefix}[{nowtime} {loglevel.upper()}] {msg}{suffix}"
         return f"{getattr(self, loglevel.lower())}{prefix}[{nowtime} {loglevel.upper()}] {msg}{suffix}{self.reset}"
 
-    def log(self, msg, loglevel: str, prefix: str="", suffix: str=""):
-        if self.getlevelfromstr(loglevel.lower()) >= self.__loglevel:
-            self.__write(self.craft(msg, loglevel, prefix=prefix, suffix=suffix))
+    def log(self, msg, loglevel: str, *args, prefix: str="", suffix: str=""):
+        """
+        Log a message, formatted as msg % args only when the level passes.
+        msg may also be a callable, called with args to build the message.
+        The message is formatted before log returns, later changes to args are not logged.
+        """
+        if LEVELS.get(loglevel.lower(), 0) < self.__loglevel:
+            return
+        record = (time.time(), self.format_message(msg, args), loglevel, prefix, suffix)
+        if not self.background:
+            self.__write(self.render(record))
+            return
+        if self._thread is None:
+            self.start()
+        self._queue.put(record)
+
+    def format_message(self, msg, args: tuple) -> str:
+        """Formats msg with args, in the thread which logs it"""
+        try:
+            if callable(msg):
+                return str(msg(*args))
+            if args:
+                return msg % args
+            return str(msg)
+        except Exception as e:
+            return f"Could not format log message {msg!r}: {e!r}"
+
+    def render(self, record: tuple) -> str:
+        """Crafts the line of a queued message"""
+        created, msg, loglevel, prefix, suffix = record
+        return self.craft(msg, loglevel, prefix=prefix, suffix=suffix, created=created)
+
+    def start(self):
+        """Starts the writer thread, done by the first log call"""
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.__writer, name="Logger", daemon=True)
+                self._thread.start()
+                _running.add(self)
+
+    def __writer(self):
+        get = self._queue.get
+        get_nowait = self._queue.get_nowait
+        while True:
+            batch = [get()]
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(get_nowait())
+            except queue.Empty:
+                pass
+            lines = []
+            waiters = []
+            stop = False
+            for record in batch:
+                if record is None:
+                    stop = True
+                elif isinstance(record, threading.Event):
+                    waiters.append(record)
+                else:
+                    try:
+                        lines.append(self.render(record))
+                    except Exception as e:
+                        lines.append(self.craft(f"Could not write log message {record[1]!r}: {e!r}", "error"))
+            try:
+                if lines:
+                    self.__write("\n".join(lines))
+                self.stdout.flush()
+            except (OSError, ValueError):
+                # stdout was closed, the messages are lost.
+                pass
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                return
+
+    def flush(self, timeout: float=None):
+        """Waits until the messages logged so far are written"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        """Writes the queued messages, stops the writer thread and closes a log file opened by the logger"""
+        with self._thread_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join()
+        _running.discard(self)
+        if isinstance(self.stdout, RotatingFile):
+            self.stdout.close()
+
+    def exception_message(self, func, excepted: Exception) -> str:
+        """Builds the message logged by Except"""
+        return (
+            f"""Function raised an exception:\n""" +
+            f"""  Function: {getattr(func, "__name__", func)}\n""" +
+            f"""  Exception: {excepted.__class__.__name__}\n""" +
+            f"""  Args: {excepted.args}\n""" +
+            f"""  Traceback:    V-V-V-V-V-V-V\n\n""" +
+            "\n".join(traceback.format_tb(excepted.__traceback__))
+        )
 
     def Except(self, func, exceptions=[Exception], *args, **kwargs):
         """
@@ -103,41 +236,29 @@ class Logger:
         Either returns the value of the function or the value of the exception
 
         Raises exception if the exception is not in the exceptions list.
-        Returns: (Exception|Data), OK 
+        Returns: (Exception|Data), OK
         """
-        excepted: Exception = None
         try:
-            retval = func(*args, **kwargs)
+            return func(*args, **kwargs), True
         except Exception as e:
-            flag = False
-            for exception in exceptions:
-                if isinstance(e, exception):
-                    flag = True
-                    excepted = e
-                    break
-            if not flag:
-                raise e
-        else:
-            return retval, True
-        finally:
+            if not isinstance(e, tuple(exceptions)):
+                raise
+            # The traceback is only formatted when errors are logged.
             self.log(
-                f"""Function raised an exception:\n""" + 
-                f"""  Function: {func.__name__}\n""" + 
-                f"""  Exception: {excepted.__class__.__name__}\n""" + 
-                f"""  Args: {excepted.args}\n""" + 
-                f"""  Traceback:    V-V-V-V-V-V-V\n\n""" + 
-                "\n".join(traceback.format_tb(excepted.__traceback__)),
-                loglevel="error", 
+                self.exception_message,
+                "error",
+                func,
+                e,
                 prefix="-" * 40 + "\n",
-                suffix="\n" + "-" * 40
+                suffix="\n" + "-" * 40,
             )
-            return excepted, False
-        
+            return e, False
+
     def ExceptWithSolve(self, func, exceptions: dict, *args, **kwargs):
         """
         Logs exceptions if any occurred, provides a way to run code based on exception thrown.
         Standart exceptions dictionary looks like:
-        
+
         {
             ValueError:{
                 "func": func,
@@ -164,22 +285,71 @@ class Logger:
         else:
             return data
 
-    def Error(self, msg):
+    def Error(self, msg, *args):
         """Used for logging error messages"""
-        self.log(msg, "error")
+        self.log(msg, "error", *args)
 
-    def Warning(self, msg):
+    def Warning(self, msg, *args):
         """Used for logging warning messages, does not nescicarily mean exception"""
-        self.log(msg, "warning")
+        self.log(msg, "warning", *args)
 
-    def Info(self, msg):
+    def Info(self, msg, *args):
         '''Used for logging generic info messages'''
-        self.log(msg, "info")
+        self.log(msg, "info", *args)
 
-    def Debug(self, msg):
+    def Debug(self, msg, *args):
         """Used for logging debug messages"""
-        self.log(msg, "debug")
+        self.log(msg, "debug", *args)
 
-    def Test(self, msg):
+    def Test(self, msg, *args):
         """Used for logging test messages"""
-        self.log(msg, "test")
+        self.log(msg, "test", *args)
+
+class RotatingFile:
+    """
+    Buffered log file, rotated on size or time.
+    Rotated files are renamed to <path>.1, the older ones shift up to <path>.<backup_count>.
+    """
+
+    def __init__(self, path: str, max_bytes: int=0, rotate_interval: float=0, backup_count: int=5):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self.file = open(path, "a")
+        self.size = self.file.tell()
+        self.rotate_at = time.time() + rotate_interval if rotate_interval else None
+
+    def write(self, data: str) -> int:
+        if (self.max_bytes and self.size >= self.max_bytes) or (self.rotate_at is not None and time.time() >= self.rotate_at):
+            self.rotate()
+        written = self.file.write(data)
+        # Close enough for ASCII logs, without encoding every message twice.
+        self.size += written
+        return written
+
+    def rotate(self):
+        self.file.close()
+        if self.backup_count > 0:
+            for index in range(self.backup_count - 1, 0, -1):
+                source = f"{self.path}.{index}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+            self.file = open(self.path, "a")
+        else:
+            self.file = open(self.path, "w")
+        self.size = 0
+        if self.rotate_interval:
+            self.rotate_at = time.time() + self.rotate_interval
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+@atexit.register
+def _flush_loggers():
+    for logger in list(_running):
+        logger.flush(timeout=5)
@@ -0,0 +1,327 @@
+"""
+    Loopback stand-in for a tcpproto server, for tests and benchmarks.
+
+    Speaks the same framing as the real server: CONTENT_LENGTH, HAS_FILE/FILE_BOUNDARY files,
+    the REMEMBER-/VAULT-/FORGET- session headers and CONTENT_ENCODING/FILE_ENCODING compression.
+    Given the private key, it decrypts the client vault, one RSA ciphertext per value or sealed with a session key,
+    into the vault of the request.
+
+    ### Commands:
+        - ECHO: respond with the content and files of the request
+        - SET: store the content and files of the request under the KEY header
+        - GET: respond with the content and files stored under the KEY header
+        - DELETE: forget the content and files stored under the KEY header
+        - SESSION: set the session of the client,
+            every SET-REMEMBER-<key>, SET-VAULT-<key> and SET-FORGET-<n> header of the request
+            is answered with the matching REMEMBER-<key>, VAULT-<key> or FORGET-<n> header.
+        - CHUNK, TRANSFER_STATUS, TRANSFER_COMPLETE: chunked transfers, see the transfer module
+        - PROBE: whether the server has the content with a FILE_DIGEST, see the dedup module
+        - VAULT: respond with the vault of the request, client vault included, as JSON content
+
+    Subclasses add commands by defining command_<COMMAND>(self, request) -> Response methods.
+
+    ### Usage:
+        - with LoopbackServer() as server:
+        -     client = Client(*server.address)
+"""
+import json
+import socket
+import socketserver
+import threading
+import zlib
+# Client imports
+from .request import Request
+from .response import Response
+from .files import File
+from .parsers import parse_session_headers, parse_files
+from .protocol import Parser, Header, FileChunk, BodyChunk, MessageComplete
+from .compression import CODECS, DEFAULT_THRESHOLD, compress, decompress, decompress_files
+from .dedup import UNKNOWN_DIGEST, verify_digest
+from .crypto import decrypt, unwrap_session_key, open_vault
+
+class LoopbackHandler(socketserver.BaseRequestHandler):
+    """
+    Handles the requests on one connection
+    """
+
+    def setup(self):
+        # Responses are written in several parts, do not let Nagle hold them back.
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self):
+        server = self.server
+        parser = Parser()
+        request = None
+        client_vault = None
+        file_data = None
+        content = bytearray()
+        while True:
+            try:
+                data = self.request.recv(server.buffer_size)
+            except OSError:
+                return
+            if not data:
+                return
+            with server.lock:
+                server.bytes_received += len(data)
+            for event in parser.feed(data):
+                if isinstance(event, Header):
+                    request = Request(headers=event.headers, command=event.headers.get("COMMAND", ""))
+                    request.cookies, request.vault, client_vault = parse_session_headers(request.headers, {}, {}, {})
+                elif isinstance(event, FileChunk):
+                    if file_data is None:
+                        file_data = bytearray()
+                    file_data += event.data
+                elif isinstance(event, BodyChunk):
+                    content += event.data
+                elif isinstance(event, MessageComplete):
+                    server.decode_request(request, file_data, content)
+                    error = server.unlock_vault(request, client_vault)
+                    if error is None:
+                        response = server.dispatch(request)
+                    else:
+                        response = Response(headers={"ERROR": error}, command=request.command)
+                    try:
+                        self.send_response(server.encode_response(request, response))
+                    except OSError:
+                        # The client gave up on the response and closed the connection.
+                        return
+                    request = None
+                    file_data = None
+                    content = bytearray()
+
+    def send_response(self, response: Response):
+        sent = 0
+        for buffer in response.buffers():
+            self.request.sendall(buffer)
+            sent += len(buffer)
+        with self.server.lock:
+            self.server.bytes_sent += sent
+
+class LoopbackServer(socketserver.ThreadingTCPServer):
+    """
+    In-process tcpproto stand-in server, serving from a background thread
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str="127.0.0.1", port: int=0, buffer_size: int=1 << 16, compression: str=None, private_key=None):
+        """
+        :param port: 0 picks a free port, see LoopbackServer.address
+        :param compression: codec to compress responses with, when the request accepts it
+        :param private_key: RSA private key to decrypt the client vault with, None ignores the client vault
+        """
+        super().__init__((host, port), LoopbackHandler)
+        self.buffer_size = buffer_size
+        self.compression = compression
+        self.lock = threading.Lock()
+        self.store = {}
+        # Chunked transfers in progress, transfer id -> {offset: data}
+        self.transfers = {}
+        # Uploaded files by FILE_DIGEST
+        self.contents = {}
+        self.private_key = private_key
+        # Unwrapped session keys by CLIENT_VAULT_KEY, so each is decrypted with RSA once.
+        self.session_keys = {}
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def address(self) -> tuple:
+        """
+        (host, port) the server listens on
+        """
+        return self.server_address[:2]
+
+    def start(self):
+        """
+        Serve from a background thread
+        """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop serving and close the listening socket
+        """
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def decode_request(self, request: Request, file_data: bytearray, content: bytearray):
+        """
+        Attach the received file and content to the request, decompressing them
+        """
+        headers = request.headers
+        if "FILE_COUNT" in headers:
+            request.files, _ = parse_files(headers, file_data or b"")
+            if "FILE_ENCODING" in headers:
+                decompress_files(headers["FILE_ENCODING"], request.files)
+        elif file_data is not None:
+            if "FILE_ENCODING" in headers:
+                file_data = decompress(headers["FILE_ENCODING"], file_data)
+            request.file = File(filename=headers["FILE_NAME"], data=bytes(file_data), border=headers["FILE_BOUNDARY"])
+        if "CONTENT_ENCODING" in headers:
+            content = decompress(headers["CONTENT_ENCODING"], content)
+        request.content = bytes(content)
+
+    def encode_response(self, request: Request, response: Response) -> Response:
+        """
+        Compress a response when the server is configured to and the request accepts it
+        """
+        accepted = request.headers.get("ACCEPT_ENCODING", "").split(",")
+        name = self.compression
+        if not name or name not in accepted or name not in CODECS:
+            return response
+        if len(response.content) >= DEFAULT_THRESHOLD:
+            response.content = compress(name, response.content)
+            response.headers["CONTENT_ENCODING"] = name
+        if response.file and response.file.has_file and response.file.size() >= DEFAULT_THRESHOLD:
+            response.file = File(filename=response.file.filename, data=compress(name, response.file.data), border=response.file.border)
+            response.headers["FILE_ENCODING"] = name
+        if response.files and sum(file.size() for file in response.files) >= DEFAULT_THRESHOLD:
+            response.files = [
+                File(filename=file.filename, data=compress(name, file.data), border=file.border)
+                for file in response.files
+            ]
+            response.headers["FILE_ENCODING"] = name
+        return response
+
+    def unlock_vault(self, request: Request, client_vault: dict) -> str:
+        """
+        Decrypt the client vault of a request into its vault
+        :return: str The error, None when there is none
+        """
+        headers = request.headers
+        if self.private_key is None or not (client_vault or "CLIENT_VAULT" in headers):
+            return None
+        try:
+            values = {key: decrypt(self.private_key, value) for key, value in client_vault.items()}
+            if "CLIENT_VAULT" in headers:
+                wrapped = headers.pop("CLIENT_VAULT_KEY", "")
+                with self.lock:
+                    key = self.session_keys.get(wrapped)
+                if key is None:
+                    key = unwrap_session_key(self.private_key, wrapped)
+                    with self.lock:
+                        if len(self.session_keys) >= 1024:
+                            self.session_keys.clear()
+                        self.session_keys[wrapped] = key
+                values.update(open_vault(key, headers.pop("CLIENT_VAULT")))
+        except Exception:
+            return "Invalid client vault"
+        request.vault = dict(request.vault, **values)
+        return None
+
+    def dispatch(self, request: Request) -> Response:
+        """
+        Run the command of a request
+        """
+        handler = getattr(self, "command_" + request.command.upper(), None)
+        if handler is None:
+            return Response(headers={"ERROR": f"Unknown command {request.command}"}, command=request.command)
+        # A PROBE only asks about the digest, it answers for unknown content itself.
+        if "FILE_DIGEST" in request.headers and request.command.upper() != "PROBE":
+            error = self.resolve_digest(request)
+            if error:
+                return Response(headers={"ERROR": error}, command=request.command)
+        return handler(request)
+
+    def resolve_digest(self, request: Request) -> str:
+        """
+        Store the file of a request with a FILE_DIGEST, or attach the stored file to a request without one
+        :return: str The error, None when there is none
+        """
+        headers = request.headers
+        digest = headers["FILE_DIGEST"]
+        if request.file is not None:
+            if not verify_digest(digest, request.file.data):
+                return "FILE_DIGEST does not match"
+            with self.lock:
+                self.contents[digest] = request.file.data
+            return None
+        with self.lock:
+            data = self.contents.get(digest)
+        if data is None or len(data) != int(headers.get("FILE_SIZE", -1)):
+            return UNKNOWN_DIGEST
+        request.file = File(filename=headers.get("FILE_NAME", "file"), data=data)
+        return None
+
+    def command_ECHO(self, request: Request) -> Response:
+        return Response(content=request.content, file=request.file, files=request.files, command=request.command)
+
+    def command_SET(self, request: Request) -> Response:
+        with self.lock:
+            self.store[request.headers.get("KEY", "")] = (request.content, request.file, request.files)
+        return Response(command=request.command)
+
+    def command_GET(self, request: Request) -> Response:
+        with self.lock:
+            content, file, files = self.store.get(request.headers.get("KEY", ""), (b"", None, []))
+        return Response(content=content, file=file, files=files, command=request.command)
+
+    def command_DELETE(self, request: Request) -> Response:
+        with self.lock:
+            self.store.pop(request.headers.get("KEY", ""), None)
+        return Response(command=request.command)
+
+    def command_CHUNK(self, request: Request) -> Response:
+        headers = request.headers
+        data = request.file.data if request.file else b""
+        if zlib.crc32(data) != int(headers.get("CHUNK_CRC32", -1)):
+            return Response(headers={"ERROR": "Checksum mismatch"}, command=request.command)
+        with self.lock:
+            self.transfers.setdefault(headers["TRANSFER_ID"], {})[int(headers["CHUNK_OFFSET"])] = data
+        return Response(command=request.command)
+
+    def command_TRANSFER_STATUS(self, request: Request) -> Response:
+        with self.lock:
+            chunks = self.transfers.get(request.headers.get("TRANSFER_ID", ""), {})
+            received = ",".join(f"{offset}:{len(data)}" for offset, data in sorted(chunks.items()))
+        return Response(headers={"TRANSFER_RECEIVED": received}, command=request.command)
+
+    def command_TRANSFER_COMPLETE(self, request: Request) -> Response:
+        headers = request.headers
+        with self.lock:
+            chunks = self.transfers.get(headers.get("TRANSFER_ID", ""), {})
+            data = bytearray()
+            for offset, chunk in sorted(chunks.items()):
+                if offset != len(data):
+                    return Response(headers={"ERROR": f"Missing data at {len(data)}"}, command=request.command)
+                data += chunk
+            if len(data) != int(headers.get("TRANSFER_SIZE", 0)):
+                return Response(headers={"ERROR": f"Missing data at {len(data)}"}, command=request.command)
+            self.transfers.pop(headers.get("TRANSFER_ID", ""), None)
+            file = File(filename=headers.get("FILE_NAME", "file"), data=bytes(data)) if data else None
+            self.store[headers.get("KEY", "")] = (b"", file, [])
+        return Response(command=request.command)
+
+    def command_PROBE(self, request: Request) -> Response:
+        headers = request.headers
+        with self.lock:
+            data = self.contents.get(headers.get("FILE_DIGEST", ""))
+        present = data is not None and len(data) == int(headers.get("FILE_SIZE", -1))
+        return Response(headers={"PRESENT": "true" if present else "false"}, command=request.command)
+
+    def command_VAULT(self, request: Request) -> Response:
+        return Response(content=json.dumps(request.vault).encode(), command=request.command)
+
+    def command_SESSION(self, request: Request) -> Response:
+        response = Response(command=request.command)
+        for key, value in request.headers.items():
+            if key.startswith("SET-REMEMBER-"):
+                response.cookies[key[13:]] = value
+            elif key.startswith("SET-VAULT-"):
+                response.vault[key[10:]] = value
+            elif key.startswith("SET-FORGET-"):
+                response.headers[key[4:]] = value
+        return response
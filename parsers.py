@@ -2,54 +2,178 @@
     Basic utilities for parsing the requests and responses.
 """
 from .files import File
-import re
+from .errors import ProtocolError
+
+# Default limit for the size of a header block, in bytes.
+MAX_HEADER_SIZE = 64 * 1024
+
+# Keys every message carries, parsed keys are replaced by these shared strings.
+KNOWN_KEYS = {key: key for key in (
+    "CONTENT_LENGTH",
+    "COMMAND",
+    "HAS_FILE",
+    "FILE_NAME",
+    "FILE_SIZE",
+    "FILE_BOUNDARY",
+    "FILE_COUNT",
+    "FILE_OFFSETS",
+)}
 
 def parse_header(data: bytes):
     """
     Function for parsing headers
+
+    The header block is decoded once, each line is split at the first colon only.
     """
     header_dict = {}
     # Split the last \r\n\r\n
     data_list = data.split(b'\r\n\r\n', 1)
     
     if len(data_list) != 2:
-        raise Exception("Invalid header")
+        raise ProtocolError("Invalid header")
     header, content = data_list
-    for line in header.split(b"\r\n"):
-        
-        line_list = line.split(b":")
-        key = line_list[0].decode()
-        value_list = []
-        for item in line_list[1:]:
-            value_list.append(item.decode())
-
-        value = line_list[1:]
-        value = ":".join(value_list)
-        header_dict[key] = value
+    for line in header.decode().split("\r\n"):
+        key, _, value = line.partition(":")
+        header_dict[KNOWN_KEYS.get(key, key)] = value
     return header_dict, content
 
+def header_size(header: dict, key: str) -> int:
+    """
+    A size header such as CONTENT_LENGTH or FILE_SIZE as an int.
+    Raises ProtocolError when it is missing, not a number or negative.
+    """
+    try:
+        size = int(header[key])
+    except (KeyError, ValueError):
+        raise ProtocolError(f"Invalid {key}")
+    if size < 0:
+        raise ProtocolError(f"Invalid {key}")
+    return size
+
 def parse_file(header: dict, content: bytes):
     """
     Function for parsing files
+
+    The file is located by offset from FILE_SIZE and the border lengths,
+    the file data and the rest of the content are each copied once.
     """
     has_file = header.get("HAS_FILE", "false")
     if has_file.lower() == "true":
         # Get the file border
         file_border = header["FILE_BOUNDARY"]
-        # Split the content by the file border
         starting_b = b"--" + file_border.encode() + b"--"
         ending_b = b"----" + file_border.encode() + b"----"
-
-        # regex to get the content in between the borders
-        regex = re.compile(starting_b + b"(.*?)" + ending_b, re.DOTALL)
-        file_content = regex.findall(content)[0]
+        view = memoryview(content)
+        if view[:len(starting_b)] != starting_b:
+            raise ProtocolError("Invalid file border")
+        start = len(starting_b)
+        if "FILE_SIZE" in header:
+            end = start + header_size(header, "FILE_SIZE")
+        else:
+            # Without a size the file ends at the first ending border.
+            end = content.find(ending_b, start)
+            if end == -1:
+                raise ProtocolError("Missing file border")
+        if view[end:end + len(ending_b)] != ending_b:
+            raise ProtocolError("Invalid file border")
         # Create a file object
-        file = File(filename=header["FILE_NAME"], data=file_content, border=file_border)
-        # replace the content with the content without the file
-        content = content.replace(file_content, b"")
-        content = content.replace(ending_b, b"")
-        content = content.replace(starting_b, b"")
+        file = File(filename=header["FILE_NAME"], data=bytes(view[start:end]), border=file_border)
+        # The content is whatever follows the file
+        content = content[end + len(ending_b):]
         return file, content
     else:
         return None, content
-    
\ No newline at end of file
+
+def file_parts(header: dict) -> list:
+    """
+    The parts of a message with several files, from the FILE_COUNT and indexed FILE_ headers
+    :return: list of (filename, size, border, offset) offset is where the data starts in the body
+    """
+    try:
+        count = int(header["FILE_COUNT"])
+        parts = [
+            (header[f"FILE_NAME_{index}"], int(header[f"FILE_SIZE_{index}"]), header[f"FILE_BOUNDARY_{index}"])
+            for index in range(count)
+        ]
+    except (KeyError, ValueError):
+        raise ProtocolError("Invalid file headers")
+    if "FILE_OFFSETS" in header:
+        offsets = [int(offset) for offset in header["FILE_OFFSETS"].split(",") if offset]
+        if len(offsets) != count:
+            raise ProtocolError("FILE_OFFSETS does not match FILE_COUNT")
+    else:
+        offsets = []
+        position = 0
+        for _, size, border in parts:
+            position += len(border.encode()) + 4
+            offsets.append(position)
+            position += size + len(border.encode()) + 8
+    return [part + (offset,) for part, offset in zip(parts, offsets)]
+
+def files_size(header: dict) -> int:
+    """
+    Size of the files section of a message with several files, the files and their borders
+    """
+    parts = file_parts(header)
+    if not parts:
+        return 0
+    _, size, border, offset = parts[-1]
+    return offset + size + len(border.encode()) + 8
+
+def parse_files(header: dict, content: bytes):
+    """
+    Function for parsing the files of a message with several files
+
+    Every file is located with the offset table, the body is not searched.
+    :return: (files, content) The files and the content following them
+    """
+    parts = file_parts(header)
+    view = memoryview(content)
+    files = []
+    end = 0
+    for filename, size, border, offset in parts:
+        starting_b = b"--" + border.encode() + b"--"
+        ending_b = b"----" + border.encode() + b"----"
+        end = offset + size
+        if view[offset - len(starting_b):offset] != starting_b or view[end:end + len(ending_b)] != ending_b:
+            raise ProtocolError("Invalid file border")
+        files.append(File(filename=filename, data=bytes(view[offset:end]), border=border))
+        end += len(ending_b)
+    return files, content[end:]
+
+def parse_session_headers(headers: dict, cookies: dict, vault: dict, client_vault: dict) -> tuple:
+    """
+    Function for applying the REMEMBER-, VAULT-, CLIENT_VAULT- and FORGET- headers
+    to the session dictionaries, the session headers are removed from the headers.
+
+    The session dictionaries are copied before they are changed,
+    so requests and responses holding the previous ones keep an unchanged snapshot.
+    :return: (cookies, vault, client_vault) The new, or unchanged, session dictionaries
+    """
+    copied = set()
+    def writable(name: str, session: dict) -> dict:
+        if name in copied:
+            return session
+        copied.add(name)
+        return dict(session)
+
+    keys = list(headers.keys())
+    for key in keys:
+        if key.startswith("REMEMBER-"):
+            cookies = writable("cookies", cookies)
+            cookies[key[9:]] = headers.pop(key)
+        elif key.startswith("VAULT-"):
+            vault = writable("vault", vault)
+            vault[key[6:]] = headers.pop(key)
+        elif key.startswith("CLIENT_VAULT-"):
+            client_vault = writable("client_vault", client_vault)
+            client_vault[key[13:]] = headers.pop(key)
+        elif key.startswith("FORGET-"):
+            forget = headers.pop(key)
+            if forget in cookies:
+                cookies = writable("cookies", cookies)
+                del cookies[forget]
+            if forget in vault:
+                vault = writable("vault", vault)
+                del vault[forget]
+    return cookies, vault, client_vault
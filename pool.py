@@ -0,0 +1,194 @@
+"""
+    Thread-safe pool of client connections.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+# Client imports
+from .client import Client
+from .request import Request
+from .response import Response
+from .session import SessionStore
+from .errors import ConnectionClosedError
+
+class HostPool:
+    """
+    The connections to a single (host, port)
+    """
+
+    def __init__(self, lock: threading.Lock):
+        # (client, last used) pairs, the most recently used connection is on the right.
+        self.idle = deque()
+        self.size = 0
+        self.available = threading.Condition(lock)
+
+class ClientPool:
+    """
+    Pool of Client connections, per (host, port).
+
+    ### Usage:
+        - pool = ClientPool(max_size=8, idle_timeout=60)
+        - response = pool.send("127.0.0.1", 22392, request)
+        - with pool.connection("127.0.0.1", 22392) as client:
+        -     response = client.send(request)
+
+    ### Supports:
+        - At most max_size connections per (host, port), callers wait for a free connection.
+        - Connections idle for longer than idle_timeout are closed.
+        - Connections are checked before they are handed out, dead ones are replaced.
+        - pool.send reconnects and retries once on BrokenPipeError, ConnectionResetError
+          or ConnectionClosedError (a stale connection closed by the server),
+          the client vault of the request is sent with the retry.
+        - All connections share one session, the cookies and vault set on one are sent on all.
+    """
+    retry_exceptions = (BrokenPipeError, ConnectionResetError, ConnectionClosedError)
+
+    def __init__(self, rsa_file: str="PUBKEY.pem", buffer_size: int=2048, max_size: int=8, idle_timeout: float=60.0, session: SessionStore=None, hooks: list=None, timeout: float=None):
+        self.session = SessionStore() if session is None else session
+        # Instrumentation hooks added to every connection.
+        self.hooks = hooks
+        # Default deadline of the requests on every connection, in seconds.
+        self.timeout = timeout
+        # ResponseCache shared by every connection, None sends every request.
+        self.cache = None
+        # DigestCache shared by every connection, see the dedup module.
+        self.dedup = None
+        self.rsa_file = rsa_file
+        self.buffer_size = buffer_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.Close()
+
+    def _host(self, host: str, port: int) -> HostPool:
+        """
+        Get the pool for a (host, port), the lock must be held
+        """
+        key = (host, port)
+        if key not in self._hosts:
+            self._hosts[key] = HostPool(self._lock)
+        return self._hosts[key]
+
+    def acquire(self, host: str, port: int, timeout: float=None) -> Client:
+        """
+        Get a connection to (host, port), waiting up to timeout seconds when max_size connections are in use.
+        Raises TimeoutError when no connection became available.
+        """
+        with self._lock:
+            pool = self._host(host, port)
+            while True:
+                client = self._pop_idle(pool)
+                if client is not None:
+                    break
+                if pool.size < self.max_size:
+                    # Reserve the slot, connect outside of the lock.
+                    pool.size += 1
+                    break
+                if not pool.available.wait(timeout):
+                    raise TimeoutError(f"No connection to {host}:{port} became available")
+        try:
+            if client is None:
+                client = self.create(host, port)
+            elif not client.is_alive():
+                client.reconnect()
+        except BaseException:
+            self._remove(pool)
+            raise
+        # cache and dedup may have been set since the connection was opened.
+        client.cache = self.cache
+        client.dedup = self.dedup
+        return client
+
+    def create(self, host: str, port: int) -> Client:
+        """
+        Open a new connection
+        """
+        return Client(host, port, self.rsa_file, self.buffer_size, self.session, self.hooks, self.timeout)
+
+    def _pop_idle(self, pool: HostPool) -> Client:
+        """
+        Take the most recently used idle connection, closing expired ones. The lock must be held.
+        """
+        now = time.monotonic()
+        while pool.idle and now - pool.idle[0][1] > self.idle_timeout:
+            client, _ = pool.idle.popleft()
+            client.Close()
+            pool.size -= 1
+        if pool.idle:
+            return pool.idle.pop()[0]
+        return None
+
+    def _remove(self, pool: HostPool):
+        """
+        Give up the slot of a connection which was closed
+        """
+        with self._lock:
+            pool.size -= 1
+            pool.available.notify()
+
+    def release(self, client: Client, discard: bool=False):
+        """
+        Hand a connection back to the pool, or close it when discard is True
+        """
+        with self._lock:
+            pool = self._host(client.host, client.port)
+            if discard:
+                client.Close()
+                pool.size -= 1
+            else:
+                pool.idle.append((client, time.monotonic()))
+            pool.available.notify()
+
+    @contextmanager
+    def connection(self, host: str, port: int, timeout: float=None):
+        """
+        Use a connection from the pool, it is closed instead of reused if an exception is raised
+        """
+        client = self.acquire(host, port, timeout)
+        try:
+            yield client
+        except BaseException:
+            self.release(client, discard=True)
+            raise
+        self.release(client)
+
+    def send(self, host: str, port: int, request: Request, timeout: float=None) -> Response:
+        """
+        Send a request over a pooled connection.
+        When the connection was dropped, it is reopened and the request is sent once more.
+        timeout bounds waiting for a connection and the request together.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.connection(host, port, timeout) as client:
+            try:
+                return client.send(request, timeout=remaining(deadline))
+            except self.retry_exceptions:
+                client.reconnect()
+                return client.send(request, timeout=remaining(deadline))
+
+    def Close(self):
+        """
+        Close all idle connections
+        """
+        with self._lock:
+            for pool in self._hosts.values():
+                while pool.idle:
+                    client, _ = pool.idle.popleft()
+                    client.Close()
+                    pool.size -= 1
+                pool.available.notify_all()
+
+def remaining(deadline: float) -> float:
+    """
+    Seconds left until a time.monotonic() deadline, None when there is none
+    """
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0.0)
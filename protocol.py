@@ -0,0 +1,259 @@
+"""
+    Sans-IO implementation of the tcpproto framing.
+
+    The Parser is fed the bytes received from any transport and returns events.
+    It does no IO, so the blocking, asyncio and selector based clients share it.
+    Messages are encoded by Request.buffers and Response.buffers.
+"""
+from .errors import ProtocolError, HeaderTooLargeError
+from .parsers import parse_header, parse_file, files_size, header_size, MAX_HEADER_SIZE
+
+class Event:
+    """
+    Base class for the events returned by Parser.feed
+    """
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}()"
+
+class Header(Event):
+    """
+    The header block of a message was received
+    """
+    __slots__ = ("headers",)
+
+    def __init__(self, headers: dict):
+        self.headers = headers
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(headers={self.headers})"
+
+class BodyChunk(Event):
+    """
+    Part of the content of a message was received
+
+    data is a memoryview of the bytes that were fed to the parser,
+    copy it when the fed buffer is reused.
+    """
+    __slots__ = ("data",)
+
+    def __init__(self, data: memoryview):
+        self.data = data
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(size={len(self.data)})"
+
+class FileChunk(Event):
+    """
+    Part of the file of a message was received.
+    For a message with several files (FILE_COUNT) the chunks are the whole files section,
+    borders included, split it with parsers.parse_files.
+
+    data is a memoryview of the bytes that were fed to the parser,
+    copy it when the fed buffer is reused.
+    """
+    __slots__ = ("data",)
+
+    def __init__(self, data: memoryview):
+        self.data = data
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(size={len(self.data)})"
+
+class MessageComplete(Event):
+    """
+    The whole message was received
+    """
+    __slots__ = ()
+
+# Parser states
+HEADER = 0
+FILE_START = 1
+FILE_DATA = 2
+FILE_END = 3
+BODY = 4
+BUFFERED = 5
+FILES = 6
+
+class Parser:
+    """
+    Incremental parser for tcpproto messages.
+
+    ### Usage:
+        - parser = Parser()
+        - for event in parser.feed(data):
+        -     ...
+
+    Any number of messages may be fed back to back, the parser resets itself after each MessageComplete.
+    """
+
+    def __init__(self, max_header_size: int=MAX_HEADER_SIZE):
+        self.max_header_size = max_header_size
+        self._buffer = bytearray()
+        self._scanned = 0
+        self.reset()
+
+    @property
+    def pending(self) -> bool:
+        """
+        A message was partly received
+        """
+        return self.state != HEADER or bool(self._buffer)
+
+    @property
+    def remaining(self) -> int:
+        """
+        Bytes of the body of the current message which were not received yet
+        """
+        return self._remaining
+
+    def reset(self):
+        """
+        Prepare the parser for the next message
+        """
+        self.state = HEADER
+        self.headers = None
+        self.file_border = None
+        self._remaining = 0
+        self._file_remaining = 0
+
+    def feed(self, data: bytes) -> list:
+        """
+        Feed received data to the parser
+        :return: list of events
+        """
+        events = []
+        view = memoryview(data)
+        while view or self.state in (BODY, BUFFERED) and not self._remaining:
+            if self.state == HEADER:
+                view = self._feed_header(view, events)
+            elif self.state == FILE_START or self.state == FILE_END:
+                view = self._feed_border(view)
+            elif self.state == FILE_DATA:
+                size = min(len(view), self._file_remaining)
+                events.append(FileChunk(view[:size]))
+                self._file_remaining -= size
+                self._remaining -= size
+                view = view[size:]
+                if not self._file_remaining:
+                    self.state = FILE_END
+            elif self.state == FILES:
+                size = min(len(view), self._file_remaining)
+                events.append(FileChunk(view[:size]))
+                self._file_remaining -= size
+                self._remaining -= size
+                view = view[size:]
+                if not self._file_remaining:
+                    self.state = BODY
+            elif self.state == BODY:
+                size = min(len(view), self._remaining)
+                if size:
+                    events.append(BodyChunk(view[:size]))
+                    self._remaining -= size
+                    view = view[size:]
+                if not self._remaining:
+                    events.append(MessageComplete())
+                    self.reset()
+            elif self.state == BUFFERED:
+                view = self._feed_buffered(view, events)
+        return events
+
+    def advance(self, size: int) -> list:
+        """
+        Account for content the caller received into its own buffer instead of feeding it.
+        Only in the BODY state, for at most the remaining bytes of the body.
+        :return: list of events, MessageComplete once the body is complete
+        """
+        if self.state != BODY or size > self._remaining:
+            raise ValueError("Only the rest of the content can be received outside of the parser")
+        self._remaining -= size
+        if self._remaining:
+            return []
+        self.reset()
+        return [MessageComplete()]
+
+    def _feed_header(self, view: memoryview, events: list) -> memoryview:
+        """
+        Buffer the header block until the terminator is received
+        """
+        buffer = self._buffer
+        buffer += view
+        end = buffer.find(b"\r\n\r\n", max(self._scanned - 3, 0))
+        if end == -1:
+            if len(buffer) > self.max_header_size:
+                raise HeaderTooLargeError(f"Header larger than {self.max_header_size} bytes")
+            self._scanned = len(buffer)
+            return view[len(view):]
+        end += 4
+        if end > self.max_header_size:
+            raise HeaderTooLargeError(f"Header larger than {self.max_header_size} bytes")
+        # Whatever came after the terminator belongs to the body.
+        rest = view[len(view) - (len(buffer) - end):]
+        headers, _ = parse_header(buffer[:end])
+        self._buffer = bytearray()
+        self._scanned = 0
+        self._start_body(headers, events)
+        return rest
+
+    def _start_body(self, headers: dict, events: list):
+        """
+        Work out the layout of the body from the headers
+        """
+        self._remaining = header_size(headers, "CONTENT_LENGTH")
+        self.headers = headers
+        events.append(Header(headers))
+        if "FILE_COUNT" in headers:
+            self._file_remaining = files_size(headers)
+            if self._file_remaining > self._remaining:
+                raise ProtocolError("Files do not fit in CONTENT_LENGTH")
+            self.state = FILES if self._file_remaining else BODY
+        elif headers.get("HAS_FILE", "false").lower() != "true":
+            self.state = BODY
+        elif "FILE_SIZE" in headers:
+            border = headers["FILE_BOUNDARY"].encode()
+            self.file_border = border
+            self._file_remaining = header_size(headers, "FILE_SIZE")
+            self._expected = b"--" + border + b"--"
+            if len(border) * 2 + 12 + self._file_remaining > self._remaining:
+                raise ProtocolError("FILE_SIZE does not fit in CONTENT_LENGTH")
+            self.state = FILE_START
+        else:
+            # Without FILE_SIZE the file can only be found after the whole body is received.
+            self.state = BUFFERED
+
+    def _feed_border(self, view: memoryview) -> memoryview:
+        """
+        Consume the starting or ending border of the file
+        """
+        size = min(len(view), len(self._expected) - len(self._buffer))
+        self._buffer += view[:size]
+        self._remaining -= size
+        if len(self._buffer) == len(self._expected):
+            if self._buffer != self._expected:
+                raise ProtocolError("Invalid file border")
+            self._buffer = bytearray()
+            if self.state == FILE_START:
+                self._expected = b"----" + self.file_border + b"----"
+                self.state = FILE_DATA if self._file_remaining else FILE_END
+            else:
+                self.state = BODY
+        return view[size:]
+
+    def _feed_buffered(self, view: memoryview, events: list) -> memoryview:
+        """
+        Buffer the whole body, then split off the file
+        """
+        size = min(len(view), self._remaining)
+        self._buffer += view[:size]
+        self._remaining -= size
+        if not self._remaining:
+            file, content = parse_file(self.headers, bytes(self._buffer))
+            self._buffer = bytearray()
+            if file:
+                events.append(FileChunk(memoryview(file.data)))
+            if content:
+                events.append(BodyChunk(memoryview(content)))
+            events.append(MessageComplete())
+            self.reset()
+        return view[size:]
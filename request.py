@@ -8,4 +8,4 @@ class Request(BaseRqResp):
     """
     Request class
     """
-    pass
+    __slots__ = ()
@@ -8,4 +8,4 @@ class Response(BaseRqResp):
     """
     Response class
     """
-    pass
+    __slots__ = ()
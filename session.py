@@ -0,0 +1,64 @@
+"""
+    Session storage for the cookies, vault and client vault of a client.
+
+    Clients which are given the same SessionStore share one logical session,
+    subclass SessionStore to keep the session somewhere else.
+"""
+import threading
+from .parsers import parse_session_headers
+
+class SessionStore:
+    """
+    Thread-safe in-memory session.
+
+    The dictionaries are replaced instead of changed in place,
+    so the cookies and vault handed out are snapshots which never change.
+    """
+
+    def __init__(self, cookies: dict=None, vault: dict=None, client_vault: dict=None):
+        self._lock = threading.Lock()
+        self.cookies = {} if cookies is None else cookies
+        self.vault = {} if vault is None else vault
+        self.client_vault = {} if client_vault is None else client_vault
+
+    def snapshot(self) -> tuple:
+        """
+        :return: (cookies, vault) The current cookies and vault
+        """
+        with self._lock:
+            return self.cookies, self.vault
+
+    def take(self) -> tuple:
+        """
+        Get the session for a request and reset the client vault
+        :return: (cookies, vault, client_vault)
+        """
+        with self._lock:
+            client_vault, self.client_vault = self.client_vault, {}
+            return self.cookies, self.vault, client_vault
+
+    def restore(self, client_vault: dict):
+        """
+        Put back a client vault taken for a request which may not have reached the server,
+        values locked since then are kept
+        """
+        with self._lock:
+            self.client_vault = {**client_vault, **self.client_vault}
+
+    def update(self, headers: dict) -> tuple:
+        """
+        Apply the session headers of a response, they are removed from the headers
+        :return: (cookies, vault) The cookies and vault after the update
+        """
+        with self._lock:
+            self.cookies, self.vault, self.client_vault = parse_session_headers(
+                headers, self.cookies, self.vault, self.client_vault
+            )
+            return self.cookies, self.vault
+
+    def lock(self, key: str, value: str):
+        """
+        Add a value to the client vault, it is encrypted and sent with the next request
+        """
+        with self._lock:
+            self.client_vault[key] = value
@@ -0,0 +1,11 @@
+"""
+    Tests of the client, most of them against the loopback stand-in server.
+
+    The checkout is the package, so like the benchmarks the tests run as <package>.tests
+    and the checkout directory must have an importable name:
+        - git clone <url> tcpproto_client
+        - python -m pytest tcpproto_client/tests
+        - python -m unittest discover -s tcpproto_client/tests -t .
+
+    The vault tests are skipped when cryptography is not installed.
+"""
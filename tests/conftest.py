@@ -0,0 +1,15 @@
+"""
+    pytest configuration of the tests, see the tests package for how to run them.
+"""
+import os
+import pytest
+
+if __name__ == "tests.conftest":
+    # The checkout was not imported as a package, the relative imports of the tests would fail.
+    checkout = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    pytest.exit(
+        f"The checkout directory {os.path.basename(checkout)!r} is not an importable package name, "
+        "clone or copy it to a directory named like a Python package (tcpproto_client for example) "
+        "and run python -m pytest <directory>/tests",
+        returncode=4,
+    )
@@ -0,0 +1,115 @@
+"""
+    Fixtures shared by the tests: a loopback server which records its requests and a raw socket server.
+"""
+import contextlib
+import functools
+import importlib.util
+import os
+import shutil
+import socket
+import struct
+import tempfile
+import threading
+import time
+import unittest
+# Client imports
+from ..client import Client
+from ..request import Request
+from ..response import Response
+from ..loopback import LoopbackServer
+
+HAS_CRYPTOGRAPHY = importlib.util.find_spec("cryptography") is not None
+
+@functools.lru_cache(maxsize=None)
+def key_pair() -> tuple:
+    """
+    RSA key pair for the client vault, generated once per test run
+    :return: (private key, public key PEM)
+    """
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.hazmat.primitives import serialization
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return private_key, public_pem
+
+class Server(LoopbackServer):
+    """
+    Loopback server which keeps the requests it dispatched, with a command which takes its time
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.requests = []
+
+    def start(self):
+        # Poll often, so stopping the server does not hold up every test.
+        self._thread = threading.Thread(target=self.serve_forever, args=(0.01,), daemon=True)
+        self._thread.start()
+
+    def dispatch(self, request: Request) -> Response:
+        with self.lock:
+            self.requests.append(request)
+        return super().dispatch(request)
+
+    def command_SLEEP(self, request: Request) -> Response:
+        time.sleep(float(request.headers.get("SECONDS", "0")))
+        return Response(content=b"awake", command=request.command)
+
+def raw_server(test: unittest.TestCase, reply: bytes, reset: bool=False, step: int=None, delay: float=0.0) -> tuple:
+    """
+    Server which answers the first request on one connection with reply, then closes it
+    :param reset: close with a RST instead of a FIN
+    :param step: write the reply step bytes at a time
+    :param delay: seconds to wait before each step
+    :return: (host, port)
+    """
+    listener = socket.create_server(("127.0.0.1", 0))
+    test.addCleanup(listener.close)
+
+    def serve():
+        connection, _ = listener.accept()
+        with connection, contextlib.suppress(ConnectionError):
+            # The client may close the connection before the whole reply was written.
+            connection.recv(1 << 16)
+            if step is None:
+                connection.sendall(reply)
+            else:
+                connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                for start in range(0, len(reply), step):
+                    time.sleep(delay)
+                    connection.sendall(reply[start:start + step])
+            if reset:
+                connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+            else:
+                time.sleep(0.05)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    test.addCleanup(thread.join, 5)
+    return listener.getsockname()[:2]
+
+class LoopbackTest(unittest.TestCase):
+    """
+    Test case with a running Server, a Client connected to it and a temporary directory
+    """
+
+    def setUp(self):
+        self.server = Server()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.client = self.connect()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def connect(self, **kwargs) -> Client:
+        client = Client(*self.server.address, **kwargs)
+        self.addCleanup(client.Close)
+        return client
+
+    def path(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
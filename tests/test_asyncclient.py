@@ -0,0 +1,86 @@
+"""
+    Tests of the asyncio client against the loopback stand-in server.
+"""
+import asyncio
+import unittest
+# Client imports
+from ..asyncclient import AsyncClient
+from ..request import Request
+from ..files import File
+from ..errors import ConnectionClosedError, DeadlineExceededError
+from .support import LoopbackTest, raw_server
+
+class AsyncClientTest(LoopbackTest):
+
+    def run_async(self, coroutine):
+        return asyncio.run(coroutine)
+
+    def test_round_trip(self):
+        files = [File(filename="a.txt", data=b"first"), File(filename="b.txt", data=b"second")]
+
+        async def main():
+            async with AsyncClient(*self.server.address, connections=4) as client:
+                echoes = await asyncio.gather(*(client.send(Request(command="ECHO", content=str(index).encode())) for index in range(20)))
+                single = await client.send(Request(command="ECHO", file=File(filename="a.bin", data=b"data")))
+                multi = await client.send(Request(command="ECHO", files=files))
+            return echoes, single, multi
+
+        echoes, single, multi = self.run_async(main())
+        self.assertEqual([response.content for response in echoes], [str(index).encode() for index in range(20)])
+        self.assertEqual(single.file.data, b"data")
+        self.assertEqual([file.data for file in multi.files], [b"first", b"second"])
+
+    def test_connections(self):
+        async def main():
+            async with AsyncClient(*self.server.address, connections=3) as client:
+                responses = await asyncio.gather(*(client.send(Request(command="SLEEP", headers={"SECONDS": "0.01"})) for _ in range(12)))
+                return responses, len(client._open)
+
+        responses, opened = self.run_async(main())
+        self.assertEqual([response.content for response in responses], [b"awake"] * 12)
+        self.assertEqual(opened, 3)
+
+    def test_compression(self):
+        self.server.compression = "zlib"
+        content = b"compressible " * 1000
+
+        async def main():
+            async with AsyncClient(*self.server.address) as client:
+                client.compression = "zlib"
+                return await client.send(Request(command="ECHO", content=content))
+
+        response = self.run_async(main())
+        self.assertEqual(response.headers["CONTENT_ENCODING"], "zlib")
+        self.assertEqual(bytes(response.content), content)
+
+    def test_empty_streamed_file(self):
+        file = File().stream(self.path("empty.bin", b""))
+        self.addCleanup(file.close)
+
+        async def main():
+            async with AsyncClient(*self.server.address) as client:
+                return await client.send(Request(command="ECHO", content=b"x", file=file))
+
+        self.assertEqual(bytes(self.run_async(main()).content), b"x")
+
+    def test_deadline(self):
+        async def main():
+            async with AsyncClient(*self.server.address) as client:
+                with self.assertRaises(DeadlineExceededError):
+                    await client.send(Request(command="SLEEP", headers={"SECONDS": "0.5"}), timeout=0.1)
+                return await client.send(Request(command="ECHO", content=b"next"))
+
+        self.assertEqual(bytes(self.run_async(main()).content), b"next")
+
+    def test_eof(self):
+        address = raw_server(self, b"CONTENT_LENGTH:10\r\nCOMMAND:GET\r\n\r\nhalf")
+
+        async def main():
+            async with AsyncClient(*address) as client:
+                await client.send(Request(command="GET"))
+
+        with self.assertRaises(ConnectionClosedError):
+            self.run_async(main())
+
+if __name__ == "__main__":
+    unittest.main()
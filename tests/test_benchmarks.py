@@ -0,0 +1,74 @@
+"""
+    Tests of the loopback stand-in server and of the throughput benchmark built on it.
+"""
+import unittest
+# Client imports
+from ..client import Client
+from ..request import Request
+from ..response import Response
+from ..files import File
+from ..benchmarks.throughput import parse_size, payload, cases, run_case
+from . import support
+
+class Server(support.Server):
+
+    def command_UPPER(self, request: Request) -> Response:
+        return Response(content=request.content.upper(), command=request.command)
+
+class LoopbackServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = Server()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.client = Client(*self.server.address)
+        self.addCleanup(self.client.Close)
+
+    def test_store(self):
+        file = File(filename="a.txt", data=b"data")
+        self.client.send(Request(command="SET", headers={"KEY": "a"}, content=b"content", file=file))
+        response = self.client.send(Request(command="GET", headers={"KEY": "a"}))
+        self.assertEqual((response.content, response.file.data), (b"content", b"data"))
+        self.client.send(Request(command="DELETE", headers={"KEY": "a"}))
+        response = self.client.send(Request(command="GET", headers={"KEY": "a"}))
+        self.assertEqual((response.content, response.file), (b"", None))
+
+    def test_commands(self):
+        self.assertEqual(self.client.send(Request(command="upper", content=b"abc")).content, b"ABC")
+        response = self.client.send(Request(command="MISSING"))
+        self.assertEqual(response.headers["ERROR"], "Unknown command MISSING")
+
+    def test_wire_bytes(self):
+        request = Request(command="ECHO", content=b"x" * 1000)
+        self.client.send(request)
+        # The request was counted before it was answered, the response once it was written.
+        self.assertEqual(self.server.bytes_received, len(self.client.prepare(request).generate()))
+        self.client.send(Request(command="ECHO"))
+        sent = len(Response(content=b"x" * 1000, command="ECHO").generate())
+        self.assertIn(self.server.bytes_sent, (sent, sent + len(Response(command="ECHO").generate())))
+
+class ThroughputTest(unittest.TestCase):
+
+    def test_parse_size(self):
+        self.assertEqual([parse_size(size) for size in ("10", "1K", "64k", " 16M", "1G")], [10, 1024, 65536, 16 << 20, 1 << 30])
+
+    def test_payload(self):
+        for size in (0, 1, 1000, 100_000):
+            self.assertEqual(len(payload(size)), size)
+
+    def test_cases(self):
+        names = [case["name"] for case in cases([1024], [0, 100])]
+        self.assertEqual(names, ["content-1024B-0h", "file-1024B-0h", "content-1024B-100h", "file-1024B-100h"])
+
+    def test_run_case(self):
+        with support.Server() as server:
+            for case in cases([1024], [10]):
+                with self.subTest(case=case["name"]):
+                    result = run_case(server.address, case, 5)
+                    self.assertEqual(result["requests"], 5)
+                    self.assertGreater(result["requests_per_second"], 0)
+                    self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+                    self.assertGreater(result["allocated_bytes_per_request"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+    Tests of the client-side response cache.
+"""
+import unittest
+# Client imports
+from ..pool import ClientPool
+from ..request import Request
+from ..response import Response
+from ..cache import ResponseCache
+from .support import LoopbackTest
+
+class CacheTest(LoopbackTest):
+
+    def setUp(self):
+        super().setUp()
+        self.client.cache = ResponseCache()
+        self.client.send(Request(command="SET", headers={"KEY": "a"}, content=b"value"))
+
+    def test_hit(self):
+        self.client.send(Request(command="GET", headers={"KEY": "a"}))
+        sent = len(self.server.requests)
+        response = self.client.send(Request(command="GET", headers={"KEY": "a"}))
+        self.assertEqual(response.content, b"value")
+        self.assertEqual(len(self.server.requests), sent)
+        self.assertEqual(self.client.cache.hits, 1)
+
+    def test_hits_are_not_shared(self):
+        first = self.client.send(Request(command="GET", headers={"KEY": "a"}))
+        first.content[:] = b"changed"
+        second = self.client.send(Request(command="GET", headers={"KEY": "a"}))
+        second.headers["EXTRA"] = "1"
+        third = self.client.send(Request(command="GET", headers={"KEY": "a"}))
+        self.assertEqual(third.content, b"value")
+        self.assertNotIn("EXTRA", third.headers)
+
+    def test_invalidation(self):
+        self.client.send(Request(command="GET", headers={"KEY": "a"}))
+        self.client.send(Request(command="SET", headers={"KEY": "a"}, content=b"new"))
+        self.assertEqual(self.client.send(Request(command="GET", headers={"KEY": "a"})).content, b"new")
+
+    def test_send_many(self):
+        self.client.send(Request(command="GET", headers={"KEY": "a"}))
+        sent = len(self.server.requests)
+        responses = self.client.send_many([Request(command="GET", headers={"KEY": "a"}), Request(command="GET", headers={"KEY": "b"})])
+        self.assertEqual([response.content for response in responses], [b"value", b""])
+        self.assertEqual(len(self.server.requests), sent + 1)
+        responses = self.client.send_many([
+            Request(command="SET", headers={"KEY": "a"}, content=b"new"),
+            Request(command="GET", headers={"KEY": "a"}),
+        ])
+        self.assertEqual(responses[1].content, b"new")
+
+    def test_pool_cache_set_later(self):
+        with ClientPool() as pool:
+            pool.send(*self.server.address, Request(command="GET", headers={"KEY": "a"}))
+            pool.cache = ResponseCache()
+            pool.send(*self.server.address, Request(command="GET", headers={"KEY": "a"}))
+            pool.send(*self.server.address, Request(command="GET", headers={"KEY": "a"}))
+            self.assertEqual((pool.cache.hits, pool.cache.misses), (1, 1))
+
+class CacheControlTest(unittest.TestCase):
+
+    def store(self, control: str) -> ResponseCache:
+        cache = ResponseCache()
+        request = Request(command="GET", headers={"KEY": "a"})
+        cache.store(cache.key(request), request, Response(headers={"CACHE_CONTROL": control}, content=b"value", command="GET"))
+        return cache
+
+    def test_max_age(self):
+        self.assertEqual(len(self.store("max-age=30")), 1)
+        self.assertEqual(len(self.store("max-age=0")), 0)
+        self.assertEqual(len(self.store("no-store")), 0)
+
+    def test_unparseable_max_age(self):
+        for control in ("max-age=soon", "max-age=", "max-age=inf", "max-age=nan", "public, max-age=1e999"):
+            with self.subTest(control=control):
+                self.assertEqual(len(self.store(control)), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,216 @@
+"""
+    Round trips of the clients against the loopback stand-in server.
+"""
+import io
+import os
+import unittest
+# Client imports
+from ..client import Client
+from ..request import Request
+from ..response import Response
+from ..files import File
+from ..errors import ProtocolError, ConnectionClosedError
+from .support import LoopbackTest, raw_server
+
+class ClientTest(LoopbackTest):
+
+    def test_content(self):
+        response = self.client.send(Request(command="ECHO", content=b"hello"))
+        self.assertEqual(response.content, b"hello")
+        self.assertNotIn("ERROR", response.headers)
+
+    def test_file(self):
+        data = os.urandom(100_000)
+        self.client.send(Request(command="SET", headers={"KEY": "a"}, content=b"content", file=File(filename="a.bin", data=data)))
+        response = self.client.send(Request(command="GET", headers={"KEY": "a"}))
+        self.assertEqual(response.file.filename, "a.bin")
+        self.assertEqual(response.file.data, data)
+        self.assertEqual(response.content, b"content")
+
+    def test_streamed_file(self):
+        data = os.urandom(300_000)
+        file = File().stream(self.path("a.bin", data))
+        self.addCleanup(file.close)
+        self.client.send(Request(command="SET", headers={"KEY": "a"}, file=file))
+        self.assertEqual(self.server.store["a"][1].data, data)
+        self.assertEqual(self.server.store["a"][1].filename, "a.bin")
+
+    def test_streamed_range(self):
+        data = os.urandom(10_000)
+        file = File().stream(self.path("a.bin", data), offset=1000, count=2000)
+        self.addCleanup(file.close)
+        self.client.send(Request(command="SET", headers={"KEY": "a"}, file=file))
+        self.assertEqual(self.server.store["a"][1].data, data[1000:3000])
+
+    def test_empty_streamed_file(self):
+        file = File().stream(self.path("empty.bin", b""))
+        self.addCleanup(file.close)
+        response = self.client.send(Request(command="ECHO", content=b"x", file=file))
+        self.assertEqual(response.content, b"x")
+        # The connection is still usable.
+        self.assertEqual(self.client.send(Request(command="ECHO", content=b"y")).content, b"y")
+
+    def test_file_sink(self):
+        data = os.urandom(200_000)
+        self.client.send(Request(command="SET", headers={"KEY": "a"}, file=File(filename="a.bin", data=data)))
+        path = os.path.join(self.directory, "sink.bin")
+        response = self.client.send(Request(command="GET", headers={"KEY": "a"}), file_sink=path)
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), data)
+        # No handle is opened for a path sink.
+        self.assertIsNone(response.file.fileobj)
+        self.assertFalse(response.file.has_file)
+
+        sink = io.BytesIO()
+        response = self.client.send(Request(command="GET", headers={"KEY": "a"}), file_sink=sink)
+        self.assertEqual(sink.getvalue(), data)
+        self.assertFalse(response.file.has_file)
+        self.assertEqual(response.file.filename, "a.bin")
+        self.assertEqual(response.file.size(), 0)
+
+    def test_file_object_sinks(self):
+        data = os.urandom(200_000)
+        self.client.send(Request(command="SET", headers={"KEY": "a"}, file=File(filename="a.bin", data=data)))
+        path = os.path.join(self.directory, "sink.bin")
+        # Readable, with data before the file: the response file is the range that was written.
+        with open(path, "w+b") as sink:
+            sink.write(b"PREFIX--")
+            response = self.client.send(Request(command="GET", headers={"KEY": "a"}), file_sink=sink)
+            self.assertTrue(response.file.has_file)
+            self.assertEqual(response.file.size(), len(data))
+            self.assertEqual(response.file.read_data(), data)
+        # Write only: the response file only has its name.
+        with open(path, "wb") as sink:
+            response = self.client.send(Request(command="GET", headers={"KEY": "a"}), file_sink=sink)
+            self.assertFalse(response.file.has_file)
+            self.assertEqual(response.file.filename, "a.bin")
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), data)
+
+    def test_compressed_file_sink(self):
+        self.server.compression = "zlib"
+        data = b"compressible file " * 10_000
+        self.client.send(Request(command="SET", headers={"KEY": "a"}, file=File(filename="a.txt", data=data)))
+        with open(os.path.join(self.directory, "sink.bin"), "w+b") as sink:
+            sink.write(b"PREFIX--")
+            response = self.client.send(Request(command="GET", headers={"KEY": "a"}, compression="zlib"), file_sink=sink)
+            self.assertEqual(response.headers["FILE_ENCODING"], "zlib")
+            self.assertEqual(response.file.read_data(), data)
+
+    def test_session_headers(self):
+        self.client.send(Request(command="SESSION", headers={"SET-REMEMBER-user": "alice", "SET-VAULT-token": "secret"}))
+        self.assertEqual(self.client.cookies, {"user": "alice"})
+        self.assertEqual(self.client.vault, {"token": "secret"})
+        self.client.send(Request(command="ECHO"))
+        request = self.server.requests[-1]
+        self.assertEqual(request.cookies, {"user": "alice"})
+        self.assertEqual(request.vault, {"token": "secret"})
+        self.client.send(Request(command="SESSION", headers={"SET-FORGET-0": "user"}))
+        self.assertEqual(self.client.cookies, {})
+        self.assertEqual(self.client.vault, {"token": "secret"})
+
+    def test_prepare_leaves_request_unchanged(self):
+        self.client.send(Request(command="SESSION", headers={"SET-REMEMBER-user": "alice"}))
+        request = Request(command="ECHO", headers={"KEY": "a"})
+        self.client.send(request)
+        self.client.send(request)
+        self.assertEqual(request.headers, {"KEY": "a"})
+        self.assertEqual(request.cookies, {})
+        self.assertEqual(self.server.requests[-1].cookies, {"user": "alice"})
+
+    def test_receive_buffer_is_reused(self):
+        buffer = self.client._rbuf
+        for size in (10, 1 << 20, 10):
+            content = os.urandom(size)
+            self.assertEqual(self.client.send(Request(command="ECHO", content=content)).content, content)
+        self.assertIs(self.client._rbuf, buffer)
+        self.assertEqual(len(buffer), 1 << 16)
+
+    def test_header_block_cache(self):
+        for compression in (None, "zlib"):
+            with self.subTest(compression=compression):
+                request = Request(command="ECHO", headers={"KEY": "a"}, content=b"x" * 4096, compression=compression)
+                self.client.send(request)
+                block = request._headers_cache[1]
+                self.assertIs(self.client.prepare(request).generate_headers(), block)
+                self.assertEqual(self.client.send(request).content, b"x" * 4096)
+                self.assertIs(request._headers_cache[1], block)
+                request.headers["KEY"] = "b"
+                self.assertIsNot(self.client.prepare(request).generate_headers(), block)
+                self.assertIn(b"KEY:b", request._headers_cache[1])
+                self.client.session.cookies = {"id": "1"}
+                self.assertIn(b"REMEMBER-id:1", self.client.prepare(request).generate_headers())
+                self.client.session.cookies = {}
+
+class BrokenServerTest(unittest.TestCase):
+
+    def test_eof_in_header(self):
+        client = Client(*raw_server(self, b"CONTENT_LENGTH:5\r\nCOMM"))
+        self.addCleanup(client.Close)
+        with self.assertRaises(ConnectionClosedError):
+            client.send(Request(command="GET"))
+
+    def test_eof_in_content(self):
+        client = Client(*raw_server(self, b"CONTENT_LENGTH:10\r\nCOMMAND:GET\r\n\r\nhalf"))
+        self.addCleanup(client.Close)
+        with self.assertRaises(ConnectionClosedError):
+            client.send(Request(command="GET"))
+
+    def test_eof_in_file(self):
+        reply = b"CONTENT_LENGTH:40\r\nHAS_FILE:true\r\nFILE_NAME:a\r\nFILE_SIZE:20\r\nFILE_BOUNDARY:b\r\n\r\n--b--half"
+        client = Client(*raw_server(self, reply))
+        self.addCleanup(client.Close)
+        with self.assertRaises(ConnectionClosedError):
+            client.send(Request(command="GET"), file_sink=io.BytesIO())
+
+    def test_invalid_content_length(self):
+        for reply in (b"CONTENT_LENGTH:abc\r\n\r\n", b"COMMAND:GET\r\n\r\n"):
+            with self.subTest(reply=reply):
+                client = Client(*raw_server(self, reply))
+                self.addCleanup(client.Close)
+                with self.assertRaises(ProtocolError):
+                    client.send(Request(command="GET"))
+
+class FramingTest(unittest.TestCase):
+
+    def send(self, reply: bytes, step: int=None, file_sink=None):
+        client = Client(*raw_server(self, reply, step=step))
+        self.addCleanup(client.Close)
+        return client.send(Request(command="GET"), file_sink=file_sink)
+
+    def test_byte_at_a_time(self):
+        reply = Response(content=b"after the file", file=File(filename="a.txt", data=b"file data\r\n\r\n--"), command="GET").generate()
+        for file_sink in (None, io.BytesIO()):
+            with self.subTest(file_sink=file_sink):
+                response = self.send(reply, step=1, file_sink=file_sink)
+                self.assertEqual(response.content, b"after the file")
+                data = response.file.data if file_sink is None else file_sink.getvalue()
+                self.assertEqual(data, b"file data\r\n\r\n--")
+
+    def test_file_without_size(self):
+        reply = Response(content=b"after the file", file=File(filename="a.txt", data=b"file data"), command="GET").generate()
+        reply = reply.replace(b"FILE_SIZE:9\r\n", b"")
+        for file_sink in (None, io.BytesIO()):
+            with self.subTest(file_sink=file_sink):
+                response = self.send(reply, step=5, file_sink=file_sink)
+                self.assertEqual(response.content, b"after the file")
+                data = response.file.data if file_sink is None else file_sink.getvalue()
+                self.assertEqual(data, b"file data")
+
+    def test_empty_file(self):
+        reply = b"CONTENT_LENGTH:15\r\nHAS_FILE:true\r\nFILE_NAME:a.txt\r\nFILE_SIZE:0\r\nFILE_BOUNDARY:b\r\n\r\n--b------b----x"
+        response = self.send(reply)
+        self.assertEqual(response.content, b"x")
+        self.assertEqual((response.file.filename, response.file.data), ("a.txt", b""))
+
+    def test_back_to_back(self):
+        reply = Response(content=b"first", command="GET").generate() + Response(content=b"second", command="GET").generate()
+        client = Client(*raw_server(self, reply))
+        self.addCleanup(client.Close)
+        self.assertEqual(client.send(Request(command="GET")).content, b"first")
+        self.assertFalse(client.is_alive())
+        # The second response was received with the first one, it answers the next request.
+        self.assertEqual(client.receive().content, b"second")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+    Tests of compressed messages and of the limit on what a response decompresses to.
+"""
+import io
+import unittest
+import zlib
+from unittest import mock
+# Client imports
+from .. import compression
+from ..client import Client
+from ..request import Request
+from ..response import Response
+from ..files import File
+from ..compression import CODECS, Decompressor, compress, decompress, decompress_files, register_codec
+from ..errors import DecompressedTooLargeError
+from .support import LoopbackTest, raw_server
+
+class DecompressorTest(unittest.TestCase):
+
+    def test_max_size(self):
+        for name in CODECS:
+            with self.subTest(codec=name):
+                data = compress(name, bytes(100_000))
+                self.assertEqual(decompress(name, data, 100_000), bytes(100_000))
+                with self.assertRaises(DecompressedTooLargeError):
+                    decompress(name, data, 99_999)
+
+    def test_bomb_is_not_expanded(self):
+        decompressor = Decompressor("zlib", 1000)
+        with self.assertRaises(DecompressedTooLargeError):
+            decompressor.decompress(zlib.compress(bytes(20 << 20)))
+        self.assertEqual(decompressor.size, 1001)
+
+    def test_codec_without_max_length(self):
+        class Passthrough:
+            def decompress(self, data):
+                return bytes(data)
+        register_codec("passthrough", Passthrough, Passthrough)
+        self.addCleanup(CODECS.pop, "passthrough")
+        decompressor = Decompressor("passthrough", 10)
+        self.assertEqual(decompressor.decompress(b"12345"), b"12345")
+        with self.assertRaises(DecompressedTooLargeError):
+            decompressor.decompress(b"123456")
+
+    def test_files(self):
+        files = [File(filename=name, data=compress("zlib", bytes(1000))) for name in ("a", "b")]
+        with self.assertRaises(DecompressedTooLargeError):
+            decompress_files("zlib", files, 1999)
+
+class CompressionTest(LoopbackTest):
+
+    def test_compression(self):
+        self.server.compression = "zlib"
+        self.client.compression = "zlib"
+        content = b"compressible content " * 1000
+        data = b"compressible file " * 1000
+        self.client.send(Request(command="SET", headers={"KEY": "a"}, content=content, file=File(filename="a.txt", data=data)))
+        request = self.server.requests[-1]
+        self.assertEqual(request.headers["CONTENT_ENCODING"], "zlib")
+        self.assertEqual(request.headers["FILE_ENCODING"], "zlib")
+        self.assertLess(self.server.bytes_received, len(content) + len(data))
+        response = self.client.send(Request(command="GET", headers={"KEY": "a"}))
+        self.assertEqual(response.headers["CONTENT_ENCODING"], "zlib")
+        self.assertEqual(response.content, content)
+        self.assertEqual(response.file.data, data)
+
+    def test_compressed_files(self):
+        self.server.compression = "zlib"
+        files = [File(filename="a.txt", data=b"a" * 5000), File(filename="b.txt", data=b"b" * 5000)]
+        request = Request(command="ECHO", files=files, compression="zlib")
+        response = self.client.send(request)
+        self.assertEqual(response.headers["FILE_ENCODING"], "zlib")
+        self.assertEqual([file.data for file in response.files], [b"a" * 5000, b"b" * 5000])
+
+    def test_compressed_file_is_closed(self):
+        self.client.compression = "zlib"
+        file = File().stream(self.path("a.txt", b"compressible file " * 1000))
+        self.addCleanup(file.close)
+        compressed = []
+        def compress_segment(*args):
+            compressed.append(compression_segment(*args))
+            return compressed[-1]
+        compression_segment = compression.compress_segment
+        with mock.patch.object(compression, "compress_segment", compress_segment):
+            self.client.send(Request(command="SET", headers={"KEY": "a"}, file=file))
+        self.assertEqual(len(compressed), 1)
+        self.assertTrue(compressed[0].closed)
+        # The caller's file stays open.
+        self.assertFalse(file.fileobj.closed)
+        self.assertEqual(self.server.store["a"][1].data, b"compressible file " * 1000)
+
+class DecompressionLimitTest(unittest.TestCase):
+
+    def send(self, reply: bytes, file_sink=None):
+        client = Client(*raw_server(self, reply))
+        self.addCleanup(client.Close)
+        client.max_decompressed_size = 1000
+        return client.send(Request(command="GET"), file_sink=file_sink)
+
+    def test_content(self):
+        self.assertEqual(self.send(Response(headers={"CONTENT_ENCODING": "zlib"}, content=compress("zlib", bytes(1000))).generate()).content, bytes(1000))
+        with self.assertRaises(DecompressedTooLargeError):
+            self.send(Response(headers={"CONTENT_ENCODING": "zlib"}, content=compress("zlib", bytes(1001))).generate())
+
+    def test_file(self):
+        reply = Response(headers={"FILE_ENCODING": "zlib"}, file=File(filename="a", data=compress("zlib", bytes(10_000)))).generate()
+        for file_sink in (None, io.BytesIO()):
+            with self.subTest(file_sink=file_sink):
+                with self.assertRaises(DecompressedTooLargeError):
+                    self.send(reply, file_sink)
+
+if __name__ == "__main__":
+    unittest.main()
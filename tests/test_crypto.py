@@ -0,0 +1,68 @@
+"""
+    Tests of the RSA helpers: the cached key loading and the batched client vault encryption.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+# Client imports
+from ..crypto import CiphertextCache, decrypt, encrypt_vault, load_public_key
+from .support import HAS_CRYPTOGRAPHY, key_pair
+
+@unittest.skipUnless(HAS_CRYPTOGRAPHY, "cryptography is not installed")
+class CryptoTest(unittest.TestCase):
+
+    def setUp(self):
+        self.private_key, self.public_pem = key_pair()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "public.pem")
+        with open(self.path, "wb") as f:
+            f.write(self.public_pem)
+
+    def test_key_is_cached(self):
+        key = load_public_key(self.path)
+        self.assertIs(load_public_key(self.path), key)
+        self.assertIs(load_public_key(os.path.join(self.directory, ".", "public.pem")), key)
+
+    def test_changed_key_is_loaded_again(self):
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        from cryptography.hazmat.primitives import serialization
+        key = load_public_key(self.path)
+        other = rsa.generate_private_key(public_exponent=65537, key_size=1024).public_key()
+        with open(self.path, "wb") as f:
+            f.write(other.public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo))
+        stat = os.stat(self.path)
+        # Make sure the modification time differs on coarse clocks.
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        changed = load_public_key(self.path)
+        self.assertIsNot(changed, key)
+        self.assertEqual(changed.public_numbers(), other.public_numbers())
+
+    def test_encrypt_vault(self):
+        key = load_public_key(self.path)
+        vault = {f"key{index}": f"value{index}" for index in range(5)}
+        for parallel in (False, True):
+            with self.subTest(parallel=parallel):
+                encrypted = encrypt_vault(key, vault, parallel)
+                self.assertEqual(list(encrypted), list(vault))
+                self.assertEqual({name: decrypt(self.private_key, value) for name, value in encrypted.items()}, vault)
+
+    def test_ciphertext_cache(self):
+        key = load_public_key(self.path)
+        cache = CiphertextCache()
+        first = encrypt_vault(key, {"a": "1", "b": "2"}, cache=cache)
+        second = encrypt_vault(key, {"a": "1", "b": "3"}, cache=cache)
+        self.assertEqual(second["a"], first["a"])
+        self.assertNotEqual(second["b"], first["b"])
+        self.assertEqual(decrypt(self.private_key, second["b"]), "3")
+
+    def test_ciphertext_cache_size(self):
+        cache = CiphertextCache(max_size=2)
+        for index in range(3):
+            cache.set("key", str(index), f"ciphertext{index}")
+        self.assertIsNone(cache.get("key", "0"))
+        self.assertEqual(cache.get("key", "2"), "ciphertext2")
+
+if __name__ == "__main__":
+    unittest.main()
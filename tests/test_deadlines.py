@@ -0,0 +1,54 @@
+"""
+    Tests of the request deadlines and the client timeout.
+"""
+import socket
+import unittest
+# Client imports
+from ..client import Client
+from ..request import Request
+from ..errors import DeadlineExceededError
+from .support import LoopbackTest, raw_server
+
+class DeadlineTest(LoopbackTest):
+
+    def test_deadline(self):
+        with self.assertRaises(DeadlineExceededError) as raised:
+            self.client.send(Request(command="SLEEP", headers={"SECONDS": "0.5"}), timeout=0.1)
+        self.assertEqual(raised.exception.phase, "receive")
+        # The late response is not read as the response to the next request.
+        self.assertEqual(self.client.send(Request(command="ECHO", content=b"next")).content, b"next")
+
+    def test_client_timeout(self):
+        client = self.connect(timeout=0.1)
+        with self.assertRaises(DeadlineExceededError):
+            client.send(Request(command="SLEEP", headers={"SECONDS": "0.5"}))
+        self.assertEqual(client.send(Request(command="SLEEP", headers={"SECONDS": "0"})).content, b"awake")
+
+    def test_pipeline_deadline(self):
+        requests = [Request(command="ECHO"), Request(command="SLEEP", headers={"SECONDS": "0.5"})]
+        with self.assertRaises(DeadlineExceededError):
+            self.client.send_many(requests, timeout=0.1)
+        self.assertEqual(self.client.send(Request(command="ECHO", content=b"next")).content, b"next")
+
+class StalledServerTest(unittest.TestCase):
+
+    def test_write_deadline(self):
+        # The server never reads, the request fills the socket buffers.
+        listener = socket.create_server(("127.0.0.1", 0))
+        self.addCleanup(listener.close)
+        client = Client(*listener.getsockname()[:2])
+        self.addCleanup(client.Close)
+        with self.assertRaises(DeadlineExceededError) as raised:
+            client.send(Request(command="SET", content=bytes(64 << 20)), timeout=0.2)
+        self.assertEqual(raised.exception.phase, "write")
+
+    def test_deadline_covers_the_whole_response(self):
+        # Every part arrives well within the timeout, the whole response does not.
+        reply = b"CONTENT_LENGTH:100\r\nCOMMAND:GET\r\n\r\n" + b"x" * 100
+        client = Client(*raw_server(self, reply, step=10, delay=0.05))
+        self.addCleanup(client.Close)
+        with self.assertRaises(DeadlineExceededError):
+            client.send(Request(command="GET"), timeout=0.2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+"""
+    Tests of the content-addressed upload deduplication.
+"""
+import os
+import unittest
+# Client imports
+from ..request import Request
+from ..files import File
+from ..dedup import DigestCache, file_digest, probe_request
+from .support import HAS_CRYPTOGRAPHY, LoopbackTest, key_pair
+
+class DedupTest(LoopbackTest):
+
+    def test_probe(self):
+        file = File(filename="a.txt", data=b"hello")
+        digest = file_digest(file)
+        response = self.client.send(probe_request(file, digest))
+        self.assertEqual(response.headers.get("PRESENT"), "false")
+        self.assertNotIn("ERROR", response.headers)
+        self.server.contents[digest] = b"hello"
+        response = self.client.send(probe_request(file, digest))
+        self.assertEqual(response.headers.get("PRESENT"), "true")
+        self.assertIsNone(response.file)
+
+    def test_second_upload_skips_the_file(self):
+        self.client.dedup = DigestCache()
+        path = self.path("lib.so", os.urandom(200_000))
+        for key in ("a", "b"):
+            file = File().stream(path)
+            self.addCleanup(file.close)
+            before = self.server.bytes_received
+            response = self.client.send(Request(command="SET", headers={"KEY": key}, file=file))
+            self.assertNotIn("ERROR", response.headers)
+        self.assertLess(self.server.bytes_received - before, 1000)
+        self.assertEqual(self.server.store["b"][1].data, self.server.store["a"][1].data)
+        # The file did not change, it was hashed once.
+        self.assertEqual(len(self.client.dedup), 1)
+
+    @unittest.skipUnless(HAS_CRYPTOGRAPHY, "cryptography is not installed")
+    def test_dedup_keeps_the_client_vault(self):
+        self.server.private_key, public_pem = key_pair()
+        self.client = self.connect(rsa_file=self.path("public.pem", public_pem))
+        self.client.dedup = DigestCache()
+        self.client.Lock("k", "v")
+        self.client.send(Request(command="SET", headers={"KEY": "a"}, file=File(filename="a.txt", data=b"hello")))
+        probe, upload = self.server.requests[-2:]
+        self.assertEqual(probe.command, "PROBE")
+        self.assertEqual(probe.vault, {})
+        self.assertEqual(upload.vault, {"k": "v"})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+"""
+    Tests of messages with several files.
+"""
+import os
+import unittest
+# Client imports
+from ..request import Request
+from ..response import Response
+from ..files import File
+from .support import LoopbackTest
+
+class FilesTest(LoopbackTest):
+
+    def test_files(self):
+        files = [File(filename="a.txt", data=b"first"), File(filename="b.bin", data=os.urandom(5000)), File(filename="c.txt", data=b"third")]
+        response = self.client.send(Request(command="ECHO", content=b"content", files=files))
+        self.assertEqual([(file.filename, file.data) for file in response.files], [(file.filename, file.data) for file in files])
+        self.assertEqual(response.content, b"content")
+
+    def test_file_and_files(self):
+        with self.assertRaises(ValueError):
+            Request(command="SET", file=File(filename="a.txt", data=b"a"), files=[File(filename="b.txt", data=b"b")])
+        response = Response(command="GET", files=[File(filename="b.txt", data=b"b")])
+        response.file = File(filename="a.txt", data=b"a")
+        with self.assertRaises(ValueError):
+            response.generate()
+        request = Request(command="SET", files=[File(filename="b.txt", data=b"b")])
+        request.file = File(filename="a.txt", data=b"a")
+        with self.assertRaises(ValueError):
+            self.client.send(request)
+        self.assertEqual(self.server.requests, [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+"""
+    Tests of the lazy imports of the package.
+"""
+import importlib
+import os
+import subprocess
+import sys
+import unittest
+
+# The package the tests belong to, and the directory it is imported from.
+PACKAGE = __name__.split(".")[0]
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def imported_modules(statement: str) -> set:
+    """
+    Modules imported by a statement, run in a new interpreter
+    """
+    code = f"import sys; {statement}; print(' '.join(sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return set(output.split())
+
+class ImportTest(unittest.TestCase):
+
+    def test_package(self):
+        modules = imported_modules(f"import {PACKAGE}")
+        for name in ("asyncio", "cryptography", f"{PACKAGE}.client", f"{PACKAGE}.asyncclient"):
+            self.assertNotIn(name, modules)
+
+    def test_client(self):
+        modules = imported_modules(f"from {PACKAGE} import Client")
+        self.assertIn(f"{PACKAGE}.client", modules)
+        for name in ("asyncio", "cryptography", f"{PACKAGE}.asyncclient"):
+            self.assertNotIn(name, modules)
+
+    def test_attributes(self):
+        package = importlib.import_module(PACKAGE)
+        from ..client import Client
+        self.assertIs(package.Client, Client)
+        self.assertIn("AsyncClient", dir(package))
+        with self.assertRaises(AttributeError):
+            package.Missing
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+    Tests of the instrumentation hooks, the histograms and the metric exports.
+"""
+import json
+import math
+import unittest
+# Client imports
+from ..request import Request
+from ..instrumentation import Histogram, MetricsCollector, PhaseEvent, escape
+from .support import LoopbackTest
+
+class HistogramTest(unittest.TestCase):
+
+    def test_buckets(self):
+        histogram = Histogram((1.0, 2.0))
+        for value in (0.5, 1.0, 1.5, 3.0):
+            histogram.observe(value)
+        # A value on a bound falls in that bucket, values past the last bound in the overflow count.
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual((histogram.count, histogram.sum), (4, 6.0))
+
+    def test_quantile(self):
+        histogram = Histogram((1.0, 2.0))
+        self.assertEqual(histogram.quantile(0.5), 0.0)
+        for value in (0.5, 1.5, 1.5, 1.5):
+            histogram.observe(value)
+        self.assertEqual(histogram.quantile(0.25), 1.0)
+        self.assertEqual(histogram.quantile(0.99), 2.0)
+        histogram.observe(5.0)
+        self.assertTrue(math.isinf(histogram.quantile(1.0)))
+
+    def test_merge(self):
+        first, second = Histogram((1.0, 2.0)), Histogram((1.0, 2.0))
+        first.observe(0.5)
+        second.observe(1.5)
+        second.observe(9.0)
+        first.merge(second)
+        self.assertEqual(first.counts, [1, 1, 1])
+        self.assertEqual((first.count, first.sum), (3, 11.0))
+        with self.assertRaises(ValueError):
+            first.merge(Histogram((1.0,)))
+
+    def test_dict(self):
+        histogram = Histogram((1.0, 2.0))
+        histogram.observe(1.5)
+        copy = Histogram.from_dict(json.loads(json.dumps(histogram.to_dict())))
+        self.assertEqual(copy.to_dict(), histogram.to_dict())
+        copy.merge(histogram)
+        self.assertEqual(copy.count, 2)
+
+class MetricsCollectorTest(unittest.TestCase):
+
+    def collector(self) -> MetricsCollector:
+        metrics = MetricsCollector((0.5, 1.0))
+        metrics(PhaseEvent("write", "GET", 0.0, 0.25, 100))
+        metrics(PhaseEvent("write", "GET", 1.0, 1.75, 50))
+        metrics(PhaseEvent("receive", 'say "hi"', 0.0, 2.0))
+        return metrics
+
+    def test_collect(self):
+        metrics = self.collector()
+        self.assertEqual(metrics.histograms[("GET", "write")].counts, [1, 1, 0])
+        self.assertEqual(metrics.bytes[("GET", "write")], 150)
+        snapshot = json.loads(metrics.json())
+        phases = {(phase["command"], phase["phase"]): phase for phase in snapshot["phases"]}
+        self.assertEqual(phases[("GET", "write")]["bytes"], 150)
+        self.assertEqual(phases[("GET", "write")]["count"], 2)
+
+    def test_prometheus(self):
+        lines = self.collector().prometheus(prefix="test").splitlines()
+        self.assertIn("# TYPE test_phase_seconds histogram", lines)
+        self.assertIn("# TYPE test_phase_bytes_total counter", lines)
+        labels = 'command="GET",phase="write"'
+        # The bucket counts are cumulative.
+        self.assertIn(f'test_phase_seconds_bucket{{{labels},le="0.5"}} 1', lines)
+        self.assertIn(f'test_phase_seconds_bucket{{{labels},le="1.0"}} 2', lines)
+        self.assertIn(f'test_phase_seconds_bucket{{{labels},le="+Inf"}} 2', lines)
+        self.assertIn(f"test_phase_seconds_sum{{{labels}}} 1.0", lines)
+        self.assertIn(f"test_phase_seconds_count{{{labels}}} 2", lines)
+        self.assertIn(f"test_phase_bytes_total{{{labels}}} 150", lines)
+        self.assertIn('test_phase_seconds_count{command="say \\"hi\\"",phase="receive"} 1', lines)
+
+    def test_escape(self):
+        self.assertEqual(escape('a\\b\n"c"'), 'a\\\\b\\n\\"c\\"')
+
+class HooksTest(LoopbackTest):
+
+    def test_phases(self):
+        metrics = MetricsCollector()
+        client = self.connect(hooks=[metrics])
+        content = b"x" * 1000
+        client.send(Request(command="ECHO", content=content))
+        phases = {phase for command, phase in metrics.histograms if command == "ECHO"}
+        self.assertEqual(phases, {"headers", "write", "first_byte", "receive", "parse_file"})
+        self.assertIn(("", "connect"), metrics.histograms)
+        self.assertGreater(metrics.bytes[("ECHO", "write")], len(content))
+        self.assertEqual(metrics.bytes[("ECHO", "receive")], len(content))
+        for histogram in metrics.histograms.values():
+            self.assertEqual(histogram.count, 1)
+            self.assertGreaterEqual(histogram.sum, 0.0)
+
+    def test_add_and_remove(self):
+        events = []
+        self.assertIsNone(self.client.hooks)
+        self.client.add_hook(events.append)
+        self.client.send(Request(command="ECHO"))
+        self.assertTrue(all(isinstance(event, PhaseEvent) for event in events))
+        self.assertIn("receive", [event.phase for event in events])
+        self.client.remove_hook(events.append)
+        # Without hooks nothing is timed.
+        self.assertIsNone(self.client.hooks)
+        count = len(events)
+        self.client.send(Request(command="ECHO"))
+        self.assertEqual(len(events), count)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+"""
+    Tests of the load generator, its workers are run in the test process.
+"""
+import socket
+import unittest
+# Client imports
+from ..loadgen import Worker, merge, parse_mix, report
+from .support import Server, raw_server
+
+def config(host: str, port: int, **kwargs) -> dict:
+    return dict({
+        "host": host,
+        "port": port,
+        "connections": 2,
+        "duration": 0.2,
+        "rate_per_connection": 0.0,
+        "mix": "GET=80,SET=20",
+        "keys": 10,
+        "content_size": 100,
+        "file_size": 0,
+        "timeout": 5.0,
+    }, **kwargs)
+
+def closed_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class LoadgenTest(unittest.TestCase):
+
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix("get=80, SET=20,DELETE"), [("GET", 80.0), ("SET", 20.0), ("DELETE", 1.0)])
+
+    def test_run(self):
+        server = Server()
+        server.start()
+        self.addCleanup(server.stop)
+        result = Worker(config(*server.address, file_size=1000), 0).run()
+        histograms, errors, succeeded = merge([result, result])
+        self.assertEqual(errors, {})
+        self.assertGreater(succeeded, 0)
+        summary = report(histograms, errors, 0.2, succeeded)
+        self.assertEqual(summary["total"]["requests"], succeeded)
+        self.assertEqual(summary["succeeded"], succeeded)
+
+    def test_connection_refused(self):
+        result = Worker(config("127.0.0.1", closed_port()), 0).run()
+        self.assertEqual(result["errors"], {"ConnectionRefusedError": 2})
+        self.assertEqual(result["succeeded"], 0)
+
+    def test_protocol_error(self):
+        result = Worker(config(*raw_server(self, b"CONTENT_LENGTH:abc\r\n\r\n"), connections=1, mix="GET", timeout=0.1), 0).run()
+        self.assertEqual(result["errors"].get("ProtocolError"), 1)
+        self.assertEqual(result["succeeded"], 0)
+        # The latency of the failed requests is kept.
+        self.assertGreater(result["histograms"]["GET"]["count"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
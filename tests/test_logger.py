@@ -0,0 +1,73 @@
+"""
+    Tests of the queued Logger.
+"""
+import gc
+import io
+import unittest
+import weakref
+# Client imports
+from ..logger import Logger
+
+class Failure(Exception):
+    pass
+
+class LoggerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.stdout = io.StringIO()
+        self.logger = Logger("info", stdout=self.stdout)
+        self.addCleanup(self.logger.close)
+
+    def output(self) -> str:
+        self.logger.flush()
+        return self.stdout.getvalue()
+
+    def test_levels(self):
+        self.logger.Debug("hidden %s", "debug")
+        self.logger.Info("shown %s", "info")
+        output = self.output()
+        self.assertNotIn("hidden", output)
+        self.assertIn("INFO] shown info", output)
+
+    def test_arguments_are_formatted_when_logged(self):
+        state = {"step": 1}
+        self.logger.Info("state is %s", state)
+        state["step"] = 2
+        self.assertIn("state is {'step': 1}", self.output())
+
+    def test_format_error(self):
+        self.logger.Info("count %d", "not a number")
+        self.assertIn("Could not format log message 'count %d'", self.output())
+
+    def test_except(self):
+        def fail():
+            raise Failure("missing")
+
+        value, ok = self.logger.Except(fail, [Failure])
+        self.assertFalse(ok)
+        # The queued message does not keep the exception and its frames alive.
+        reference = weakref.ref(value)
+        del value
+        gc.collect()
+        self.assertIsNone(reference())
+        self.assertIn("Exception: Failure", self.output())
+
+    def test_except_success(self):
+        self.assertEqual(self.logger.Except(lambda: 1, [KeyError]), (1, True))
+        self.assertEqual(self.output(), "")
+
+    def test_log(self):
+        self.logger.log("sent %d bytes", "info", 5)
+        self.logger.log("framed", "warning", prefix="<", suffix=">")
+        output = self.output()
+        self.assertIn("INFO] sent 5 bytes", output)
+        self.assertIn("<[", output)
+        self.assertIn("WARNING] framed>", output)
+
+    def test_json_lines(self):
+        logger = Logger("info", stdout=self.stdout, json_lines=True, background=False)
+        logger.Info("value %d", 3)
+        self.assertIn('"message": "value 3"', self.stdout.getvalue())
+
+if __name__ == "__main__":
+    unittest.main()
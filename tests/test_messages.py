@@ -0,0 +1,72 @@
+"""
+    Tests of the Request and Response objects, their sizes and header blocks.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+# Client imports
+from ..request import Request
+from ..response import Response
+from ..files import File
+from ..parsers import parse_header
+
+class SlotsTest(unittest.TestCase):
+
+    def test_slots(self):
+        for message in (Request(), Response(), File(filename="a", data=b"a")):
+            with self.subTest(message=type(message).__name__):
+                self.assertFalse(hasattr(message, "__weakref__"))
+                with self.assertRaises(AttributeError):
+                    message.unknown = 1
+
+    def test_own_dictionaries(self):
+        first, second = Request(), Request()
+        first.headers["KEY"] = "a"
+        first.cookies["user"] = "alice"
+        first.vault["token"] = "secret"
+        first.files.append(File(filename="a", data=b"a"))
+        self.assertEqual((second.headers, second.cookies, second.vault, second.files), ({}, {}, {}, []))
+
+    def test_as_dict(self):
+        request = Request(headers={"KEY": "a"}, content=b"x", file=File(filename="a", data=b"a"), command="SET")
+        data = request.__dict__()
+        self.assertEqual(data["headers"], {"KEY": "a"})
+        self.assertEqual(data["file"]["filename"], "a")
+        self.assertEqual((data["command"], data["content"], data["files"]), ("SET", b"x", []))
+
+class ContentLengthTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "a.bin")
+        with open(self.path, "wb") as f:
+            f.write(os.urandom(10_000))
+
+    def assertContentLength(self, request: Request):
+        headers, body = parse_header(request.generate())
+        self.assertEqual(int(headers["CONTENT_LENGTH"]), len(body))
+        self.assertEqual(request.content_length, len(body))
+
+    def test_content_length(self):
+        self.assertContentLength(Request(content=b"content", command="SET"))
+        self.assertContentLength(Request(content=b"content", file=File(filename="a.bin", data=b"data"), command="SET"))
+        files = [File(filename="a.bin", data=b"first"), File(filename="b.bin", data=b"second")]
+        self.assertContentLength(Request(content=b"content", files=files, command="SET"))
+        file = File().stream(self.path, offset=100, count=5000)
+        self.addCleanup(file.close)
+        self.assertContentLength(Request(content=b"content", file=file, command="SET"))
+
+    def test_streamed_file_is_not_read(self):
+        file = File().stream(self.path)
+        self.addCleanup(file.close)
+        request = Request(content=b"content", file=file, command="SET")
+        # Only the size taken when the file was opened is used, the file is not read.
+        file.fileobj.close()
+        headers, _ = parse_header(request.generate_headers())
+        self.assertEqual(headers["CONTENT_LENGTH"], str(len(b"content") + file.framed_size()))
+        self.assertEqual(headers["FILE_SIZE"], "10000")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+    Tests of the header parsing and of the header size limit of the clients.
+"""
+import unittest
+# Client imports
+from ..client import Client
+from ..request import Request
+from ..response import Response
+from ..files import File
+from ..parsers import KNOWN_KEYS, parse_header, header_size, parse_file, parse_files, parse_session_headers
+from ..errors import ProtocolError, HeaderTooLargeError
+from .support import raw_server
+
+class ParseHeaderTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        request = Request(headers={"URL": "http://host:80/a", "EMPTY": ""}, content=b"body", command="GET")
+        headers, content = parse_header(request.generate())
+        self.assertEqual(headers["URL"], "http://host:80/a")
+        self.assertEqual(headers["EMPTY"], "")
+        self.assertEqual(headers["COMMAND"], "GET")
+        self.assertEqual(content, b"body")
+
+    def test_known_keys_are_shared(self):
+        headers, _ = parse_header(b"CONTENT_LENGTH:0\r\nCOMMAND:GET\r\n\r\n")
+        for key in headers:
+            self.assertIs(key, KNOWN_KEYS[key])
+
+    def test_invalid(self):
+        with self.assertRaises(ProtocolError):
+            parse_header(b"CONTENT_LENGTH:0\r\n")
+
+    def test_header_size(self):
+        self.assertEqual(header_size({"CONTENT_LENGTH": "12"}, "CONTENT_LENGTH"), 12)
+        for headers in ({}, {"CONTENT_LENGTH": "x"}, {"CONTENT_LENGTH": "-1"}):
+            with self.subTest(headers=headers):
+                with self.assertRaises(ProtocolError):
+                    header_size(headers, "CONTENT_LENGTH")
+
+class ParseFileTest(unittest.TestCase):
+
+    def test_file(self):
+        data = Response(content=b"after", file=File(filename="a.txt", data=b"--data--"), command="GET").generate()
+        headers, body = parse_header(data)
+        file, content = parse_file(headers, body)
+        self.assertEqual((file.filename, file.data, content), ("a.txt", b"--data--", b"after"))
+
+    def test_files(self):
+        files = [File(filename="a.txt", data=b"first"), File(filename="b.txt", data=b"second")]
+        headers, body = parse_header(Response(content=b"after", files=files, command="GET").generate())
+        parsed, content = parse_files(headers, body)
+        self.assertEqual([(file.filename, file.data) for file in parsed], [("a.txt", b"first"), ("b.txt", b"second")])
+        self.assertEqual(content, b"after")
+
+    def test_invalid_border(self):
+        headers = {"HAS_FILE": "true", "FILE_NAME": "a", "FILE_BOUNDARY": "b", "FILE_SIZE": "1"}
+        with self.assertRaises(ProtocolError):
+            parse_file(headers, b"--x--a----b----")
+
+class SessionHeadersTest(unittest.TestCase):
+
+    def test_snapshots(self):
+        cookies = {"old": "1"}
+        headers = {"REMEMBER-user": "alice", "VAULT-token": "secret", "FORGET-0": "old", "KEY": "a"}
+        new_cookies, vault, client_vault = parse_session_headers(headers, cookies, {}, {})
+        self.assertEqual(new_cookies, {"user": "alice"})
+        self.assertEqual(vault, {"token": "secret"})
+        self.assertEqual(headers, {"KEY": "a"})
+        self.assertEqual(cookies, {"old": "1"})
+        # Nothing to change, nothing is copied.
+        self.assertIs(parse_session_headers({}, new_cookies, vault, client_vault)[0], new_cookies)
+
+class HeaderLimitTest(unittest.TestCase):
+
+    def test_client(self):
+        reply = b"CONTENT_LENGTH:0\r\nKEY:" + b"a" * 4096 + b"\r\n\r\n"
+        client = Client(*raw_server(self, reply, step=512))
+        self.addCleanup(client.Close)
+        client.max_header_size = 1024
+        with self.assertRaises(HeaderTooLargeError):
+            client.send(Request(command="GET"))
+
+    def test_within_limit(self):
+        reply = b"CONTENT_LENGTH:2\r\nKEY:" + b"a" * 900 + b"\r\n\r\nok"
+        client = Client(*raw_server(self, reply, step=100))
+        self.addCleanup(client.Close)
+        client.max_header_size = 1024
+        response = client.send(Request(command="GET"))
+        self.assertEqual((len(response.headers["KEY"]), response.content), (900, b"ok"))
+
+if __name__ == "__main__":
+    unittest.main()
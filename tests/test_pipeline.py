@@ -0,0 +1,56 @@
+"""
+    Tests of request pipelining with Client.send_many and Client.pipeline.
+"""
+import os
+import unittest
+# Client imports
+from ..client import Client
+from ..request import Request
+from ..files import File
+from .support import LoopbackTest, raw_server
+
+class PipelineTest(LoopbackTest):
+
+    def test_pipeline(self):
+        with self.client.pipeline() as pipe:
+            for index in range(20):
+                pipe.send(Request(command="ECHO", content=str(index).encode()))
+        self.assertEqual([response.content for response in pipe.responses], [str(index).encode() for index in range(20)])
+
+    def test_large_batch(self):
+        # More than the socket buffers hold in both directions, the server answers before it read the whole batch.
+        requests = [
+            Request(command="ECHO", content=os.urandom(100_000), file=File(filename=f"{index}.bin", data=os.urandom(50_000)))
+            for index in range(40)
+        ]
+        responses = self.client.send_many(requests)
+        self.assertEqual([response.content for response in responses], [request.content for request in requests])
+        self.assertEqual(len(self.server.requests), 40)
+
+    def test_session_in_arrival_order(self):
+        requests = [
+            Request(command="SESSION", headers={"SET-REMEMBER-user": "alice"}),
+            Request(command="SESSION", headers={"SET-REMEMBER-user": "bob"}),
+            Request(command="ECHO"),
+        ]
+        self.client.send_many(requests)
+        self.assertEqual(self.client.cookies, {"user": "bob"})
+        # The session was added to all requests before the first response arrived.
+        self.assertEqual(self.server.requests[-1].cookies, {})
+        self.client.send(Request(command="ECHO"))
+        self.assertEqual(self.server.requests[-1].cookies, {"user": "bob"})
+
+    def test_empty(self):
+        self.assertEqual(self.client.send_many([]), [])
+        self.assertEqual(self.client.send(Request(command="ECHO", content=b"x")).content, b"x")
+
+class BrokenPipelineTest(unittest.TestCase):
+
+    def test_reset_during_pipeline(self):
+        client = Client(*raw_server(self, b"", reset=True))
+        self.addCleanup(client.Close)
+        with self.assertRaises(ConnectionResetError):
+            client.send_many([Request(command="GET") for _ in range(3)])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+    Tests of the connection pool: reuse, idle timeout, liveness checks and the retry on a dropped connection.
+"""
+import json
+import os
+import shutil
+import socket
+import tempfile
+import time
+import unittest
+# Client imports
+from ..pool import ClientPool
+from ..request import Request
+from .support import HAS_CRYPTOGRAPHY, Server, key_pair
+
+class DroppingServer(Server):
+    """
+    Server which can close connections: drop closes the connection of the next requests without answering them
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.drop = 0
+        self.connections = []
+
+    def finish_request(self, request, client_address):
+        with self.lock:
+            self.connections.append(request)
+        super().finish_request(request, client_address)
+
+    def dispatch(self, request: Request):
+        with self.lock:
+            if self.drop:
+                self.drop -= 1
+                raise ConnectionAbortedError("dropped")
+        return super().dispatch(request)
+
+    def handle_error(self, request, client_address):
+        pass
+
+class PoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = DroppingServer()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.pool = ClientPool()
+        self.addCleanup(self.pool.Close)
+
+    def send(self, request: Request):
+        return self.pool.send(*self.server.address, request)
+
+    def test_reuse(self):
+        for _ in range(3):
+            self.assertEqual(self.send(Request(command="ECHO", content=b"x")).content, b"x")
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_max_size(self):
+        self.pool.max_size = 1
+        with self.pool.connection(*self.server.address):
+            with self.assertRaises(TimeoutError):
+                self.pool.acquire(*self.server.address, timeout=0.05)
+        self.assertEqual(self.send(Request(command="ECHO", content=b"x")).content, b"x")
+
+    def test_idle_timeout(self):
+        self.pool.idle_timeout = 0.05
+        with self.pool.connection(*self.server.address) as first:
+            pass
+        time.sleep(0.1)
+        with self.pool.connection(*self.server.address) as second:
+            pass
+        self.assertIsNot(first, second)
+        self.assertEqual(first.sock.fileno(), -1)
+
+    def test_dead_connection_is_replaced(self):
+        self.send(Request(command="ECHO", content=b"x"))
+        with self.pool.connection(*self.server.address) as client:
+            address = client.sock.getsockname()
+        self.server.connections[0].shutdown(socket.SHUT_RDWR)
+        time.sleep(0.05)
+        self.assertFalse(client.is_alive())
+        with self.pool.connection(*self.server.address) as replaced:
+            self.assertIs(replaced, client)
+            self.assertNotEqual(client.sock.getsockname(), address)
+        self.assertEqual(self.send(Request(command="ECHO", content=b"x")).content, b"x")
+
+    def test_retry(self):
+        self.send(Request(command="ECHO", content=b"x"))
+        self.server.drop = 1
+        self.assertEqual(self.send(Request(command="ECHO", content=b"y")).content, b"y")
+        self.assertEqual(len(self.server.connections), 2)
+
+    def test_retry_once(self):
+        self.server.drop = 2
+        with self.assertRaises(ConnectionError):
+            self.send(Request(command="ECHO", content=b"y"))
+        self.assertEqual(self.send(Request(command="ECHO", content=b"z")).content, b"z")
+
+    @unittest.skipUnless(HAS_CRYPTOGRAPHY, "cryptography is not installed")
+    def test_retry_keeps_the_client_vault(self):
+        self.server.private_key, public_pem = key_pair()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.pool.rsa_file = os.path.join(directory, "public.pem")
+        with open(self.pool.rsa_file, "wb") as f:
+            f.write(public_pem)
+        self.pool.session.lock("k", "v")
+        self.server.drop = 1
+        response = self.send(Request(command="VAULT"))
+        self.assertEqual(json.loads(response.content), {"k": "v"})
+        self.assertEqual(json.loads(self.send(Request(command="VAULT")).content), {})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+"""
+    Tests of the sans-IO Parser, fed whole messages, split messages and one byte at a time.
+"""
+import unittest
+# Client imports
+from ..response import Response
+from ..files import File
+from ..parsers import parse_files
+from ..protocol import Parser, Header, FileChunk, BodyChunk, MessageComplete
+from ..errors import ProtocolError, HeaderTooLargeError
+
+def feed(parser: Parser, chunks: list) -> list:
+    """
+    Feed chunks to a parser
+    :return: list of (headers, file data, content) per complete message, file data is None without a file
+    """
+    messages = []
+    headers = None
+    file_data = None
+    content = bytearray()
+    for chunk in chunks:
+        for event in parser.feed(chunk):
+            if isinstance(event, Header):
+                headers = event.headers
+            elif isinstance(event, FileChunk):
+                if file_data is None:
+                    file_data = bytearray()
+                file_data += event.data
+            elif isinstance(event, BodyChunk):
+                content += event.data
+            elif isinstance(event, MessageComplete):
+                messages.append((headers, file_data, bytes(content)))
+                headers = None
+                file_data = None
+                content = bytearray()
+    return messages
+
+def split(data: bytes, size: int) -> list:
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+class ParserTest(unittest.TestCase):
+
+    def setUp(self):
+        self.plain = Response(headers={"KEY": "a"}, content=b"hello world", command="GET").generate()
+        self.single = Response(content=b"after the file", file=File(filename="a.txt", data=b"file data\r\n\r\n--"), command="GET").generate()
+        self.multi = Response(
+            content=b"after the files",
+            files=[File(filename="a.txt", data=b"first"), File(filename="b.bin", data=bytes(range(256)))],
+            command="GET",
+        ).generate()
+
+    def assertSingle(self, messages: list):
+        self.assertEqual(len(messages), 1)
+        headers, file_data, content = messages[0]
+        self.assertEqual(headers["FILE_NAME"], "a.txt")
+        self.assertEqual(bytes(file_data), b"file data\r\n\r\n--")
+        self.assertEqual(content, b"after the file")
+
+    def assertMulti(self, messages: list):
+        self.assertEqual(len(messages), 1)
+        headers, file_data, content = messages[0]
+        files, _ = parse_files(headers, bytes(file_data))
+        self.assertEqual([(file.filename, file.data) for file in files], [("a.txt", b"first"), ("b.bin", bytes(range(256)))])
+        self.assertEqual(content, b"after the files")
+
+    def test_plain(self):
+        headers, file_data, content = feed(Parser(), [self.plain])[0]
+        self.assertEqual(headers["KEY"], "a")
+        self.assertEqual(headers["COMMAND"], "GET")
+        self.assertIsNone(file_data)
+        self.assertEqual(content, b"hello world")
+
+    def test_every_split(self):
+        for data in (self.plain, self.single, self.multi):
+            expected = feed(Parser(), [data])
+            for position in range(1, len(data)):
+                with self.subTest(position=position):
+                    self.assertEqual(feed(Parser(), [data[:position], data[position:]]), expected)
+
+    def test_byte_at_a_time(self):
+        self.assertSingle(feed(Parser(), split(self.single, 1)))
+        self.assertMulti(feed(Parser(), split(self.multi, 1)))
+
+    def test_chunks(self):
+        for size in (2, 3, 7, 64):
+            with self.subTest(size=size):
+                self.assertSingle(feed(Parser(), split(self.single, size)))
+                self.assertMulti(feed(Parser(), split(self.multi, size)))
+
+    def test_file_without_size(self):
+        # Without FILE_SIZE the file ends at the first ending border, so the data must not end like one.
+        data = Response(content=b"after the file", file=File(filename="a.txt", data=b"file data\r\n\r\n"), command="GET").generate()
+        data = data.replace(b"FILE_SIZE:13\r\n", b"")
+        self.assertNotIn(b"FILE_SIZE", data)
+        for size in (1, 5, len(data)):
+            with self.subTest(size=size):
+                headers, file_data, content = feed(Parser(), split(data, size))[0]
+                self.assertEqual(bytes(file_data), b"file data\r\n\r\n")
+                self.assertEqual(content, b"after the file")
+
+    def test_back_to_back(self):
+        data = self.plain + self.single + self.multi + self.plain
+        for size in (1, 13, len(data)):
+            with self.subTest(size=size):
+                messages = feed(Parser(), split(data, size))
+                self.assertEqual(len(messages), 4)
+                self.assertSingle(messages[1:2])
+                self.assertMulti(messages[2:3])
+                self.assertEqual(messages[3][2], b"hello world")
+
+    def test_empty_body(self):
+        messages = feed(Parser(), [Response(command="SET").generate()])
+        self.assertEqual(messages[0][2], b"")
+
+    def test_invalid_content_length(self):
+        for header in (b"CONTENT_LENGTH:abc\r\n\r\n", b"COMMAND:GET\r\n\r\n", b"CONTENT_LENGTH:-1\r\n\r\n"):
+            with self.subTest(header=header):
+                with self.assertRaises(ProtocolError):
+                    Parser().feed(header)
+
+    def test_invalid_file_size(self):
+        header = b"CONTENT_LENGTH:10\r\nHAS_FILE:true\r\nFILE_NAME:a\r\nFILE_SIZE:x\r\nFILE_BOUNDARY:b\r\n\r\n"
+        with self.assertRaises(ProtocolError):
+            Parser().feed(header)
+
+    def test_file_size_past_content_length(self):
+        data = self.single.replace(b"FILE_SIZE:15", b"FILE_SIZE:99")
+        with self.assertRaises(ProtocolError):
+            Parser().feed(data)
+
+    def test_invalid_border(self):
+        data = self.single.replace(b"--FILE_BORDER-a.txt-FILE_BORDER--", b"--FILE_BORDER-x.txt-FILE_BORDER--", 1)
+        with self.assertRaises(ProtocolError):
+            feed(Parser(), [data])
+
+    def test_advance(self):
+        parser = Parser()
+        events = parser.feed(self.plain[:-5])
+        self.assertEqual(bytes(events[-1].data), b"hello ")
+        self.assertEqual(parser.remaining, 5)
+        with self.assertRaises(ValueError):
+            parser.advance(6)
+        self.assertEqual(parser.advance(3), [])
+        self.assertIsInstance(parser.advance(2)[0], MessageComplete)
+        self.assertFalse(parser.pending)
+        self.assertEqual(feed(parser, [self.plain])[0][2], b"hello world")
+        with self.assertRaises(ValueError):
+            Parser().advance(1)
+
+    def test_header_too_large(self):
+        with self.assertRaises(HeaderTooLargeError):
+            feed(Parser(max_header_size=64), split(b"KEY:" + b"a" * 200, 16))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+"""
+    Tests of the scatter/gather send of requests, the buffers are written without being joined,
+    and of files streamed from disk.
+"""
+import os
+import unittest
+from unittest import mock
+# Client imports
+from ..client import IOV_MAX
+from ..bases.basefile import FileSegment
+from ..request import Request
+from ..files import File
+from .support import LoopbackTest
+
+class TrickleSocket:
+    """
+    Socket which writes at most limit bytes per sendmsg call, into data
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.data = bytearray()
+        self.calls = 0
+
+    def sendmsg(self, buffers: list) -> int:
+        assert len(buffers) <= IOV_MAX
+        self.calls += 1
+        sent = 0
+        for buffer in buffers:
+            part = bytes(buffer[:self.limit - sent])
+            self.data += part
+            sent += len(part)
+            if sent == self.limit:
+                break
+        return sent
+
+class SendTest(LoopbackTest):
+
+    def trickle(self, limit: int) -> TrickleSocket:
+        sock = TrickleSocket(limit)
+        real, self.client.sock = self.client.sock, sock
+        self.addCleanup(setattr, self.client, "sock", real)
+        return sock
+
+    def test_buffers_are_not_copied(self):
+        content = os.urandom(1000)
+        data = os.urandom(1000)
+        buffers = Request(content=content, file=File(filename="a.bin", data=data), command="SET").buffers()
+        self.assertIs(buffers[2].obj, data)
+        self.assertIs(buffers[-1].obj, content)
+
+    def test_partial_writes_are_resumed(self):
+        request = Request(headers={"KEY": "a"}, content=os.urandom(1000), file=File(filename="a.bin", data=os.urandom(1000)), command="SET")
+        for limit in (1, 7, 1000, 1 << 20):
+            with self.subTest(limit=limit):
+                sock = self.trickle(limit)
+                self.client.send_buffers(request.buffers())
+                self.assertEqual(bytes(sock.data), request.generate())
+
+    def test_more_buffers_than_iov_max(self):
+        files = [File(filename=f"{index}.txt", data=str(index).encode()) for index in range(IOV_MAX)]
+        request = Request(content=b"after the files", files=files, command="ECHO")
+        self.assertGreater(len(request.buffers()), IOV_MAX)
+        sock = self.trickle(1 << 20)
+        self.client.send_buffers(request.buffers())
+        self.assertEqual(bytes(sock.data), request.generate())
+        self.assertGreater(sock.calls, 1)
+
+    def test_round_trip(self):
+        # Three buffers per file, more than IOV_MAX in total.
+        files = [File(filename=f"{index}.txt", data=str(index).encode()) for index in range(400)]
+        response = self.client.send(Request(content=b"after the files", files=files, command="ECHO"))
+        self.assertEqual(response.content, b"after the files")
+        self.assertEqual([file.data for file in self.server.requests[-1].files], [file.data for file in files])
+
+class StreamTest(LoopbackTest):
+
+    def setUp(self):
+        super().setUp()
+        self.data = os.urandom(300_000)
+        self.file_path = self.path("a.bin", self.data)
+
+    def test_segment_chunks(self):
+        with open(self.file_path, "rb") as f:
+            segment = FileSegment(f, 1000, 250_000)
+            self.assertEqual([len(chunk) for chunk in segment.chunks(100_000)], [100_000, 100_000, 50_000])
+            self.assertEqual(segment.read(), self.data[1000:251_000])
+            self.assertEqual(list(FileSegment(f, 0, 0).chunks()), [])
+
+    def test_sources(self):
+        with open(self.file_path, "rb") as f:
+            for source in (self.file_path, f, f.fileno()):
+                with self.subTest(source=type(source).__name__):
+                    file = File().stream(source, filename="b.bin")
+                    self.client.send(Request(command="SET", headers={"KEY": "a"}, file=file))
+                    file.close()
+                    self.assertEqual(self.server.store["a"][1].data, self.data)
+            # Neither the file object nor its descriptor were closed with the streamed files.
+            self.assertFalse(f.closed)
+            os.fstat(f.fileno())
+
+    def test_range_past_the_end(self):
+        file = File().stream(self.file_path, offset=len(self.data) + 10)
+        self.addCleanup(file.close)
+        self.assertEqual(file.size(), 0)
+        file = File().stream(self.file_path, offset=len(self.data) - 10, count=100)
+        self.addCleanup(file.close)
+        self.assertEqual(file.read_data(), self.data[-10:])
+
+    def test_without_sendfile(self):
+        file = File().stream(self.file_path, offset=5, count=200_000)
+        self.addCleanup(file.close)
+        with mock.patch.object(os, "sendfile"):
+            del os.sendfile
+            self.client.send(Request(command="SET", headers={"KEY": "a"}, file=file))
+        self.assertTrue(hasattr(os, "sendfile"))
+        self.assertEqual(self.server.store["a"][1].data, self.data[5:200_005])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""
+    Tests of the session store and of clients used from several threads.
+"""
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+# Client imports
+from ..request import Request
+from ..session import SessionStore
+from .support import LoopbackTest
+
+class SessionStoreTest(unittest.TestCase):
+
+    def test_snapshots(self):
+        session = SessionStore()
+        cookies, vault = session.snapshot()
+        session.update({"REMEMBER-user": "alice", "VAULT-token": "secret"})
+        # What was handed out before the update does not change.
+        self.assertEqual((cookies, vault), ({}, {}))
+        self.assertEqual(session.snapshot(), ({"user": "alice"}, {"token": "secret"}))
+
+    def test_take_and_restore(self):
+        session = SessionStore()
+        session.lock("a", "1")
+        cookies, vault, client_vault = session.take()
+        self.assertEqual(client_vault, {"a": "1"})
+        self.assertEqual(session.client_vault, {})
+        # A value locked after the take wins over the restored one.
+        session.lock("a", "2")
+        session.lock("b", "3")
+        session.restore(client_vault)
+        self.assertEqual(session.client_vault, {"a": "2", "b": "3"})
+
+class ConcurrencyTest(LoopbackTest):
+
+    def test_threads_share_a_client(self):
+        contents = [os.urandom(size) for size in range(0, 200_000, 5_000)]
+
+        def echo(content: bytes) -> bytes:
+            return self.client.send(Request(command="ECHO", content=content)).content
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for _ in range(3):
+                self.assertEqual(list(executor.map(echo, contents)), contents)
+
+    def test_clients_share_a_session(self):
+        session = SessionStore()
+        first = self.connect(session=session)
+        second = self.connect(session=session)
+        first.send(Request(command="SESSION", headers={"SET-REMEMBER-user": "alice"}))
+        self.assertEqual(second.cookies, {"user": "alice"})
+        second.send(Request(command="ECHO"))
+        self.assertEqual(self.server.requests[-1].cookies, {"user": "alice"})
+
+        def remember(index: int):
+            client = (first, second)[index % 2]
+            client.send(Request(command="SESSION", headers={f"SET-REMEMBER-{index}": str(index)}))
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(remember, range(40)))
+        # No update was lost to another thread.
+        self.assertEqual(session.cookies, {"user": "alice", **{str(index): str(index) for index in range(40)}})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+    Tests of the chunked transfer: the round trip, checksum mismatches and resuming a failed upload.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import zlib
+# Client imports
+from ..pool import ClientPool
+from ..request import Request
+from ..files import File
+from ..transfer import ChunkedTransfer, crc32, parse_ranges
+from ..errors import TransferError
+from .support import Server
+
+class CorruptingServer(Server):
+    """
+    Server which corrupts received chunks: corrupt maps chunk offsets to the number of times their data is damaged
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.corrupt = {}
+
+    def command_CHUNK(self, request: Request):
+        offset = int(request.headers["CHUNK_OFFSET"])
+        with self.lock:
+            damage = self.corrupt.get(offset, 0)
+            if damage:
+                self.corrupt[offset] = damage - 1
+        if damage:
+            request.file.data = bytes([request.file.data[0] ^ 0xFF]) + request.file.data[1:]
+        return super().command_CHUNK(request)
+
+class TransferTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = CorruptingServer()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.pool = ClientPool(max_size=4)
+        self.addCleanup(self.pool.Close)
+        self.transfer = ChunkedTransfer(self.pool, *self.server.address, chunk_size=64 * 1024, connections=4, retries=1)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.data = os.urandom(300_000)
+        self.path = os.path.join(directory, "artifact.bin")
+        with open(self.path, "wb") as f:
+            f.write(self.data)
+
+    def chunks_sent(self) -> list:
+        return sorted(int(request.headers["CHUNK_OFFSET"]) for request in self.server.requests if request.command == "CHUNK")
+
+    def test_helpers(self):
+        self.assertEqual(parse_ranges(""), set())
+        self.assertEqual(parse_ranges("0:10,10:5"), {(0, 10), (10, 5)})
+        self.assertEqual(self.transfer.ranges(150_000), [(0, 65536), (65536, 65536), (131072, 18928)])
+        with open(self.path, "rb") as f:
+            file = File().stream(f, offset=1000, count=5000)
+            self.assertEqual(crc32(file.segment()), zlib.crc32(self.data[1000:6000]))
+
+    def test_upload(self):
+        response = self.transfer.upload(self.path, key="artifact")
+        self.assertNotIn("ERROR", response.headers)
+        self.assertEqual(self.server.store["artifact"][1].filename, "artifact.bin")
+        self.assertEqual(self.server.store["artifact"][1].data, self.data)
+        self.assertEqual(self.chunks_sent(), [offset for offset, _ in self.transfer.ranges(len(self.data))])
+
+    def test_upload_file_object(self):
+        with open(self.path, "rb") as f:
+            self.transfer.upload(f, key="artifact", filename="named.bin")
+        self.assertEqual(self.server.store["artifact"][1].filename, "named.bin")
+        self.assertEqual(self.server.store["artifact"][1].data, self.data)
+
+    def test_checksum_mismatch_is_retried(self):
+        self.server.corrupt = {65536: 1}
+        self.transfer.upload(self.path, key="artifact")
+        self.assertEqual(self.server.store["artifact"][1].data, self.data)
+        self.assertEqual(self.chunks_sent().count(65536), 2)
+
+    def test_resume(self):
+        self.server.corrupt = {65536: 2, 196608: 2}
+        with self.assertRaises(TransferError) as raised:
+            self.transfer.upload(self.path, key="artifact")
+        error = raised.exception
+        self.assertEqual(sorted(error.failed), [65536, 196608])
+        self.assertNotIn("artifact", self.server.store)
+        self.assertEqual(self.transfer.status(error.transfer_id), {(0, 65536), (131072, 65536), (262144, 37856)})
+
+        self.server.requests.clear()
+        self.transfer.upload(self.path, key="artifact", transfer_id=error.transfer_id)
+        # Only the ranges the server is missing are sent again.
+        self.assertEqual(self.chunks_sent(), [65536, 196608])
+        self.assertEqual(self.server.store["artifact"][1].data, self.data)
+
+    def test_complete_with_missing_ranges(self):
+        self.server.corrupt = {0: 2}
+        with self.assertRaises(TransferError) as raised:
+            self.transfer.upload(self.path, key="artifact")
+        headers = {"TRANSFER_ID": raised.exception.transfer_id, "TRANSFER_SIZE": str(len(self.data)), "KEY": "artifact"}
+        response = self.transfer.send(Request(headers=headers, command="TRANSFER_COMPLETE"))
+        self.assertEqual(response.headers["ERROR"], "Missing data at 0")
+        self.assertNotIn("artifact", self.server.store)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+    Tests of the client vault, one RSA ciphertext per value or sealed with a session key.
+"""
+import base64
+import json
+import unittest
+# Client imports
+from ..request import Request
+from ..crypto import SessionKey, unwrap_session_key, open_vault
+from .support import HAS_CRYPTOGRAPHY, LoopbackTest, key_pair
+
+@unittest.skipUnless(HAS_CRYPTOGRAPHY, "cryptography is not installed")
+class VaultTest(LoopbackTest):
+
+    def setUp(self):
+        super().setUp()
+        self.server.private_key, public_pem = key_pair()
+        self.client = self.connect(rsa_file=self.path("public.pem", public_pem))
+
+    def vault(self, request: Request=None) -> dict:
+        return json.loads(self.client.send(request or Request(command="VAULT")).content)
+
+    def test_client_vault(self):
+        for hybrid in (False, True):
+            with self.subTest(hybrid=hybrid):
+                self.client.hybrid_vault = hybrid
+                self.client.Lock("a", "1")
+                self.client.Lock("b", "2")
+                self.assertEqual(self.vault(), {"a": "1", "b": "2"})
+                # The client vault is sent once.
+                self.assertEqual(self.vault(), {})
+
+    def test_request_sent_twice(self):
+        request = Request(command="VAULT")
+        self.client.Lock("once", "1")
+        self.assertEqual(self.vault(request), {"once": "1"})
+        self.assertEqual(request.headers, {})
+        self.assertEqual(self.vault(request), {})
+
+    def test_session_key_is_reused(self):
+        self.client.hybrid_vault = True
+        self.client.Lock("a", "1")
+        self.assertEqual(self.vault(), {"a": "1"})
+        session_key = self.client._session_key
+        self.client.Lock("a", "2")
+        self.assertEqual(self.vault(), {"a": "2"})
+        self.assertIs(self.client._session_key, session_key)
+        # The server unwrapped the session key once.
+        self.assertEqual(len(self.server.session_keys), 1)
+
+    def test_expired_session_key(self):
+        self.client.hybrid_vault = True
+        self.client.Lock("a", "1")
+        self.vault()
+        session_key = self.client._session_key
+        session_key.max_uses = 1
+        self.client.Lock("a", "2")
+        self.assertEqual(self.vault(), {"a": "2"})
+        self.assertIsNot(self.client._session_key, session_key)
+        self.assertEqual(len(self.server.session_keys), 2)
+
+@unittest.skipUnless(HAS_CRYPTOGRAPHY, "cryptography is not installed")
+class SealTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        private_key, _ = key_pair()
+        session_key = SessionKey(private_key.public_key())
+        sealed = session_key.seal({"a": "1", "b": "x" * 10_000})
+        key = unwrap_session_key(private_key, session_key.wrapped)
+        self.assertEqual(open_vault(key, sealed), {"a": "1", "b": "x" * 10_000})
+        self.assertEqual(session_key.uses, 1)
+
+    def test_tampered(self):
+        from cryptography.exceptions import InvalidTag
+        private_key, _ = key_pair()
+        session_key = SessionKey(private_key.public_key())
+        data = bytearray(base64.b64decode(session_key.seal({"a": "1"})))
+        data[-1] ^= 1
+        with self.assertRaises(InvalidTag):
+            open_vault(unwrap_session_key(private_key, session_key.wrapped), base64.b64encode(data).decode())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+"""
+    Chunked transfer of large files over several pooled connections.
+
+    The file is split into ranges which are sent in parallel, every range as the file
+    of a CHUNK request, streamed from disk. The server reassembles them by offset.
+
+    ### Commands:
+        - CHUNK: TRANSFER_ID, TRANSFER_SIZE, CHUNK_OFFSET and CHUNK_CRC32 headers, the range as the file.
+            The server answers with an ERROR header when the CRC32 does not match.
+        - TRANSFER_STATUS: TRANSFER_ID header, answered with TRANSFER_RECEIVED,
+            the received ranges as "<offset>:<size>,<offset>:<size>".
+        - TRANSFER_COMPLETE: TRANSFER_ID, TRANSFER_SIZE, KEY and FILE_NAME headers,
+            the server joins the ranges and stores the file under KEY.
+
+    ### Usage:
+        - with ClientPool(max_size=4) as pool:
+        -     transfer = ChunkedTransfer(pool, "127.0.0.1", 22392, connections=4)
+        -     response = transfer.upload("artifact.tar", key="artifact")
+
+    A failed upload raises TransferError, upload again with its transfer_id to send only the missing ranges.
+"""
+import os
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+# Client imports
+from .request import Request
+from .response import Response
+from .files import File
+from .pool import ClientPool
+from .errors import TransferError
+
+DEFAULT_CHUNK_SIZE = 8 << 20
+
+def crc32(segment) -> int:
+    """
+    CRC32 of a FileSegment, read through a memory map
+    """
+    checksum = 0
+    for chunk in segment.chunks():
+        checksum = zlib.crc32(chunk, checksum)
+    return checksum
+
+def parse_ranges(value: str) -> set:
+    """
+    Parse a TRANSFER_RECEIVED header
+    :return: set of (offset, size)
+    """
+    ranges = set()
+    for item in value.split(","):
+        if item:
+            offset, size = item.split(":")
+            ranges.add((int(offset), int(size)))
+    return ranges
+
+class ChunkedTransfer:
+    """
+    Upload a file as ranges sent in parallel over pooled connections
+    """
+
+    def __init__(self, pool: ClientPool, host: str, port: int, chunk_size: int=DEFAULT_CHUNK_SIZE, connections: int=4, retries: int=2):
+        """
+        :param connections: ranges sent at the same time, the pool opens up to its max_size connections
+        :param retries: times a range is sent again after a dropped connection or a checksum mismatch
+        """
+        self.pool = pool
+        self.host = host
+        self.port = port
+        self.chunk_size = chunk_size
+        self.connections = connections
+        self.retries = retries
+
+    def send(self, request: Request) -> Response:
+        return self.pool.send(self.host, self.port, request)
+
+    def status(self, transfer_id: str) -> set:
+        """
+        The ranges the server has received
+        :return: set of (offset, size)
+        """
+        response = self.send(Request(headers={"TRANSFER_ID": transfer_id}, command="TRANSFER_STATUS"))
+        return parse_ranges(response.headers.get("TRANSFER_RECEIVED", ""))
+
+    def ranges(self, size: int) -> list:
+        """
+        Split a file of size bytes into (offset, size) ranges
+        """
+        return [(offset, min(self.chunk_size, size - offset)) for offset in range(0, size, self.chunk_size)]
+
+    def send_chunk(self, fileobj, transfer_id: str, total: int, offset: int, size: int) -> Response:
+        """
+        Send one range, retrying on a dropped connection or a checksum mismatch
+        """
+        chunk = File().stream(fileobj, filename=f"{offset}", offset=offset, count=size)
+        headers = {
+            "TRANSFER_ID": transfer_id,
+            "TRANSFER_SIZE": str(total),
+            "CHUNK_OFFSET": str(offset),
+            "CHUNK_CRC32": str(crc32(chunk.segment())),
+        }
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.send(Request(headers=headers, file=chunk, command="CHUNK"))
+            except (ConnectionError, OSError):
+                if attempt == self.retries:
+                    raise
+                continue
+            if "ERROR" not in response.headers:
+                return response
+        raise TransferError(f"Chunk at {offset}: {response.headers['ERROR']}", transfer_id, [offset])
+
+    def upload(self, source, key: str, filename: str=None, transfer_id: str=None) -> Response:
+        """
+        Upload a file and store it under key on the server.
+        The source is a path or a binary file object.
+        Pass the transfer_id of a failed upload to resume it.
+        :return: Response The response to TRANSFER_COMPLETE
+        """
+        if isinstance(source, (str, os.PathLike)):
+            if filename is None:
+                filename = os.path.basename(os.fspath(source))
+            with open(source, "rb") as fileobj:
+                return self.upload(fileobj, key, filename, transfer_id)
+        if filename is None:
+            filename = os.path.basename(str(getattr(source, "name", "file")))
+
+        received = set()
+        if transfer_id is None:
+            transfer_id = uuid.uuid4().hex
+        else:
+            received = self.status(transfer_id)
+        total = os.fstat(source.fileno()).st_size
+        missing = [chunk for chunk in self.ranges(total) if chunk not in received]
+
+        failed = []
+        with ThreadPoolExecutor(max_workers=self.connections, thread_name_prefix="transfer") as executor:
+            futures = {
+                offset: executor.submit(self.send_chunk, source, transfer_id, total, offset, size)
+                for offset, size in missing
+            }
+            for offset, future in futures.items():
+                try:
+                    future.result()
+                except (TransferError, ConnectionError, OSError):
+                    failed.append(offset)
+        if failed:
+            raise TransferError(f"{len(failed)} of {len(missing)} chunks failed", transfer_id, failed)
+
+        headers = {"TRANSFER_ID": transfer_id, "TRANSFER_SIZE": str(total), "KEY": key, "FILE_NAME": filename}
+        response = self.send(Request(headers=headers, command="TRANSFER_COMPLETE"))
+        if "ERROR" in response.headers:
+            raise TransferError(response.headers["ERROR"], transfer_id, [])
+        return response